@@ -93,6 +93,11 @@ def create_app(config_class=Config):
         except Exception as e:
             return f"Error in debug route: {str(e)}", 500
 
+    # Session listeners that bump table_version on every ORM write (API ETags rely on them)
+    # and capture changes of synced models for /api/changes; keep the daily rollups in step with their logs
+    from app import table_versions, change_feed
+    from app.planned_maintenance import usage_daily, checklist_daily
+
     # Import and register blueprints
     from app.planned_maintenance import bp as pm_bp
     from app.inventory import bp as inv_bp
@@ -0,0 +1,58 @@
+# tkr_system/app/api/etags.py
+"""
+Conditional GET for API endpoints: @conditional_on(ModelA, ...) sets an ETag
+from those tables' version counters and answers a matching If-None-Match
+with 304 without calling the view.
+"""
+import hashlib
+import json
+import logging
+from functools import wraps
+from flask import make_response, request
+from app import db
+from app.table_versions import get_table_versions
+
+
+def compute_etag(table_versions):
+    """ETag of the current request's response, given {table: (version, updated_at)}."""
+    parts = [
+        request.path,
+        sorted(request.args.items(multi=True)),
+        request.headers.get('Accept', ''),
+        sorted(table_versions.items()),
+    ]
+    encoded = json.dumps(parts, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_on(*models):
+    """Adds an ETag to 200 responses of the view and answers matching If-None-Match with 304."""
+    table_names = sorted({model.__table__.name for model in models})
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            try:
+                versions = get_table_versions(table_names)
+            except Exception as e:
+                logging.warning(f"Could not read table versions for {request.path}: {e}")
+                db.session.rollback()
+                versions = None
+            if versions is None:
+                return view(*args, **kwargs)
+
+            etag = compute_etag(versions)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache' # Clients may store it but must revalidate
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,216 @@
+# tkr_system/app/api/pagination.py
+"""
+Keyset (cursor) pagination and streamed output for the API list endpoints.
+
+The body is always a JSON array. Without `limit` or `cursor` it holds every
+row; with them it is one page, and the next page's URL is in a
+`Link: <...>; rel="next"` header.
+
+Query parameters understood by PageRequest / list_response():
+    limit:  Page size (default API_PAGE_DEFAULT_LIMIT, max API_PAGE_MAX_LIMIT).
+    cursor: Taken from the previous page's `Link` URL; opaque to clients.
+    stream: 'json' (one JSON array) or 'ndjson' (one object per line), every
+            remaining row (after `cursor`, up to `limit` if given).
+            An `Accept: application/x-ndjson` header also selects NDJSON.
+"""
+import base64
+import json
+import logging
+from datetime import date, datetime
+from flask import Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy import and_, or_, tuple_
+
+ASC = False
+DESC = True
+
+DEFAULT_PAGE_LIMIT = 100
+DEFAULT_MAX_PAGE_LIMIT = 1000
+DEFAULT_STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = ('json', 'ndjson')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+# --- Cursor encoding ---
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    """Converts a JSON cursor value back to the column's Python type."""
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(keys, row):
+    """Opaque cursor pointing just after `row` in the ordering given by `keys`."""
+    values = [_encode_value(getattr(row, column.key)) for column, _ in keys]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(keys, token):
+    """Key values encoded in `token`; aborts 400 if it is malformed or belongs to another ordering."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("wrong number of key values")
+        return [_decode_value(column, value) for (column, _), value in zip(keys, values)]
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        logging.debug(f"Rejected API cursor {token!r}: {e}")
+        abort(400, "Invalid cursor.")
+
+
+# --- Query building ---
+
+def keyset_order(keys):
+    """ORDER BY clauses for `keys`."""
+    return [column.desc() if descending else column.asc() for column, descending in keys]
+
+
+def _compare(columns, values, descending):
+    if len(columns) == 1:
+        return columns[0] < values[0] if descending else columns[0] > values[0]
+    return tuple_(*columns) < tuple_(*values) if descending else tuple_(*columns) > tuple_(*values)
+
+
+def keyset_after(keys, values):
+    """
+    WHERE clause selecting the rows that sort after `values`.
+
+    Consecutive keys sorting the same way are compared as one row value,
+    which PostgreSQL serves from a matching composite index. Mixed directions
+    nest: (a DESC, b ASC) -> a < :a OR (a = :a AND b > :b).
+    """
+    descending = keys[0][1]
+    run = 1
+    while run < len(keys) and keys[run][1] == descending:
+        run += 1
+    columns = [column for column, _ in keys[:run]]
+    clause = _compare(columns, values[:run], descending)
+    if run == len(keys):
+        return clause
+    if len(columns) == 1:
+        same = columns[0] == values[0]
+    else:
+        same = tuple_(*columns) == tuple_(*values[:run])
+    return or_(clause, and_(same, keyset_after(keys[run:], values[run:])))
+
+
+# --- Request handling ---
+
+def page_limit():
+    """The request's `limit` argument, defaulted and capped from config; aborts 400 if < 1."""
+    config = current_app.config
+    default_limit = config.get('API_PAGE_DEFAULT_LIMIT', DEFAULT_PAGE_LIMIT)
+    max_limit = config.get('API_PAGE_MAX_LIMIT', DEFAULT_MAX_PAGE_LIMIT)
+    limit = request.args.get('limit', default_limit, type=int)
+    if limit < 1:
+        abort(400, "'limit' must be a positive integer.")
+    return min(limit, max_limit)
+
+
+def _stream_format():
+    stream_format = request.args.get('stream')
+    if stream_format:
+        stream_format = stream_format.lower()
+        if stream_format not in STREAM_FORMATS:
+            abort(400, f"Invalid stream format. Use one of: {', '.join(STREAM_FORMATS)}.")
+        return stream_format
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+
+def _page_url(cursor):
+    """URL of the current endpoint with the same arguments and another cursor."""
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def _stream_rows(query, serialize, stream_format, resource):
+    """Yields the serialized rows as a JSON array or NDJSON, fetching in batches from a server-side cursor."""
+    batch_size = current_app.config.get('API_STREAM_BATCH_SIZE', DEFAULT_STREAM_BATCH_SIZE)
+    # yield_per streams rows from the database cursor; the session's identity map
+    # only holds weak references, so rows already written are freed.
+    rows = query.execution_options(stream_results=True).yield_per(batch_size)
+    count = 0
+    try:
+        if stream_format == 'json':
+            yield '['
+        for row in rows:
+            if stream_format == 'json':
+                yield (',' if count else '') + json.dumps(serialize(row))
+            else:
+                yield json.dumps(serialize(row)) + '\n'
+            count += 1
+        if stream_format == 'json':
+            yield ']'
+        logging.debug(f"API: Streamed {count} {resource} as {stream_format}.")
+    except Exception as e:
+        # Headers are already sent: the client sees a truncated (invalid) body
+        logging.error(f"Error streaming {resource} after {count} rows: {e}", exc_info=True)
+        raise
+
+
+class PageRequest:
+    """The pagination/streaming arguments of a list request, validated up front (aborts 400)."""
+    __slots__ = ('keys', 'after', 'limit', 'stream_format')
+
+    def __init__(self, keys):
+        self.keys = keys
+        cursor = request.args.get('cursor')
+        self.after = decode_cursor(keys, cursor) if cursor else None
+        self.stream_format = _stream_format()
+        # Unbounded unless a limit is given explicitly, or a page is followed
+        paged = cursor and self.stream_format is None
+        self.limit = page_limit() if ('limit' in request.args or paged) else None
+
+
+def list_response(query, page, serialize, resource):
+    """
+    Response for a list endpoint: one keyset page, or the whole result streamed.
+
+    Args:
+        query: Filtered (unordered) query of the rows to list.
+        page (PageRequest): Built from ((column, DESC|ASC), ...) sort keys ending in the primary key.
+        serialize: Callable turning one row into a JSON-serializable dict.
+        resource (str): Name used in log messages, e.g. 'usage logs'.
+
+    A page is a JSON array of rows, with the next page's URL (if any) in a
+    `Link: <...>; rel="next"` header. Without limit/cursor every row is
+    streamed as one JSON array.
+    """
+    keys, limit = page.keys, page.limit
+    query = query.order_by(*keyset_order(keys))
+    if page.after is not None:
+        query = query.filter(keyset_after(keys, page.after))
+
+    if page.stream_format or limit is None:
+        stream_format = page.stream_format or 'json'
+        if limit:
+            query = query.limit(limit)
+        mimetype = NDJSON_MIMETYPE if stream_format == 'ndjson' else 'application/json'
+        return Response(stream_with_context(_stream_rows(query, serialize, stream_format, resource)),
+                        mimetype=mimetype)
+
+    rows = query.limit(limit + 1).all() # One extra row tells whether there is a next page
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(keys, rows[-1]) if has_more else None
+    next_url = _page_url(next_cursor) if next_cursor else None
+
+    response = jsonify([serialize(row) for row in rows])
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -1,22 +1,101 @@
 # app/api/routes.py
+import json
 import logging
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, jsonify, request, abort, url_for, send_file, current_app
+from io import BytesIO
 from app import db
 # Import the models using the to_dict methods
 from app.models import (
     Equipment, JobCard, MaintenancePlanEntry, UsageLog, Checklist, Part,
-    JobCardPart, StockTransaction, MaintenanceTask # Ensure all needed models are imported
+    JobCardPart, StockTransaction, MaintenanceTask, # Ensure all needed models are imported
+    BackgroundJob, Supplier, ChangeLog, JOB_TYPE_MAINTENANCE, JOB_TYPE_LEGAL
 )
-from sqlalchemy import desc
 from datetime import datetime, date, timezone
 from dateutil.parser import parse as parse_datetime
 from calendar import monthrange
+from app.planned_maintenance.task_status import (
+    calculate_task_statuses, refresh_task_due_columns,
+    due_state_filter, STATE_FILTERS
+)
+from app.planned_maintenance.plan_generation import MAX_PLAN_HORIZON_MONTHS
+from app.planned_maintenance.plan_pdf import WEASYPRINT_AVAILABLE
+from app.planned_maintenance.jobs import JOB_GENERATE_PLAN, JOB_PLAN_PDF
+from app.jobs import submit_job, registered_job_types
+from app.planned_maintenance.usage_validation import (
+    UsageReading, validate_usage_reading, validate_usage_readings, insert_usage_logs
+)
+from app.planned_maintenance.job_numbers import allocate_job_number
+from app.planned_maintenance.checklist_daily import compliance_equipment, get_checklist_compliance, parse_compliance_range
+from app.planned_maintenance.missing_checklists import (
+    MISSING_CHECKLIST_MAX_DAYS, find_missing_checklists, missing_checklist_range
+)
+from app.api.pagination import PageRequest, list_response, page_limit, ASC, DESC, NDJSON_MIMETYPE
+from app.change_feed import TRACKED_MODELS
+from app.api.etags import conditional_on
 
 # Define the Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # --- Helper Functions ---
 # Removed model_to_dict helper as we'll use model methods directly
+# Read endpoints are @conditional_on the tables they read: ETag + 304 from the
+# table version counters (app/api/etags.py).
+# List endpoints are keyset-paginated (or streamed) by app/api/pagination.py;
+# each orders by indexed keys ending in the primary key.
+EQUIPMENT_LIST_KEYS = ((Equipment.code, ASC), (Equipment.id, ASC))
+JOB_CARD_LIST_KEYS = ((JobCard.id, DESC),)
+USAGE_LOG_LIST_KEYS = ((UsageLog.log_date, DESC), (UsageLog.id, DESC))
+CHECKLIST_LIST_KEYS = ((Checklist.check_date, DESC), (Checklist.id, DESC))
+PLAN_ENTRY_LIST_KEYS = (
+    (MaintenancePlanEntry.plan_year, DESC), # Most recent period first
+    (MaintenancePlanEntry.plan_month, DESC),
+    (MaintenancePlanEntry.planned_date, ASC), # Then by planned date
+    (MaintenancePlanEntry.equipment_id, ASC), # Then by equipment
+    (MaintenancePlanEntry.id, ASC),
+)
+DEFAULT_BATCH_MAX_ITEMS = 5000
+CHECKLIST_STATUSES = ["Go", "Go But", "No Go"]
+
+
+def _batch_items_from_request():
+    """
+    Items of a batch POST: a JSON array, {"items": [...]}, or NDJSON (one
+    object per line, Content-Type application/x-ndjson). Aborts 400 if the
+    body is malformed, empty or larger than API_BATCH_MAX_ITEMS.
+    """
+    max_items = current_app.config.get('API_BATCH_MAX_ITEMS', DEFAULT_BATCH_MAX_ITEMS)
+    if request.mimetype == NDJSON_MIMETYPE:
+        items = []
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                abort(400, f"Invalid JSON on line {line_number}.")
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('items')
+        if not isinstance(data, list):
+            abort(400, "Request body must be a JSON array, {\"items\": [...]}, or NDJSON.")
+        items = data
+    if not items:
+        abort(400, "The batch contains no items.")
+    if len(items) > max_items:
+        abort(400, f"Too many items in one batch ({len(items)}); the maximum is {max_items}.")
+    return items
+
+
+def _parse_item_datetime(value):
+    """ISO 8601 string -> naive UTC datetime (naive input is taken as UTC). Raises ValueError."""
+    if not isinstance(value, str):
+        raise ValueError("not a string")
+    parsed = parse_datetime(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 
 # --- Error Handlers for API ---
 # ... (Keep existing error handlers: 404, 400, 500) ...
@@ -29,6 +108,11 @@ def bad_request_error(error):
     message = str(error.description) if hasattr(error, 'description') else "Invalid input."
     return jsonify({"error": "Bad Request", "message": message}), 400
 
+@api_bp.errorhandler(409)
+def conflict_error(error):
+    message = str(error.description) if hasattr(error, 'description') else "Conflicts with existing data."
+    return jsonify({"error": "Conflict", "message": message}), 409
+
 @api_bp.errorhandler(500)
 def internal_error(error):
     logging.error(f"API Internal Error: {error}", exc_info=True)
@@ -42,17 +126,22 @@ def internal_error(error):
 # ... (Keep existing Equipment routes: GET list, GET id, POST, PUT, DELETE) ...
 # Example using model's to_dict:
 @api_bp.route('/equipment', methods=['GET'])
+@conditional_on(Equipment)
 def get_equipment_list():
-    """Returns a list of all equipment."""
+    """
+    Returns equipment ordered by code (paged with ?limit).
+    Query parameters: limit, cursor, stream (see app/api/pagination.py).
+    """
+    page = PageRequest(EQUIPMENT_LIST_KEYS)
     try:
-        all_equipment = Equipment.query.order_by(Equipment.code).all()
         # Use the model's to_dict method
-        return jsonify([eq.to_dict() for eq in all_equipment])
+        return list_response(Equipment.query, page, lambda eq: eq.to_dict(), 'equipment')
     except Exception as e:
         logging.error(f"Error retrieving equipment list: {e}", exc_info=True)
         abort(500, description="Error retrieving equipment list.")
 
 @api_bp.route('/equipment/<int:id>', methods=['GET'])
+@conditional_on(Equipment)
 def get_equipment(id):
     """Returns details for a specific equipment item."""
     equipment = Equipment.query.get_or_404(id, description=f"Equipment with ID {id} not found.")
@@ -128,13 +217,19 @@ def delete_equipment(id):
 # ==============================================================================
 
 @api_bp.route('/job_cards', methods=['GET'])
+@conditional_on(JobCard, Equipment)
 def get_job_cards():
     """
-    Returns a list of job cards.
-    Optionally filter by 'status' query parameter (e.g., /api/job_cards?status=Done).
-    Returns ALL job cards if 'status' parameter is omitted.
+    Returns job cards, newest first (paged with ?limit).
+    Optionally filter by 'status' query parameter (e.g., /api/job_cards?status=Done)
+    and/or 'job_type' (MAINT or LEGAL).
+    Query parameters: limit, cursor, stream (see app/api/pagination.py).
     """
+    page = PageRequest(JOB_CARD_LIST_KEYS)
     status_filter = request.args.get('status')
+    job_type_filter = request.args.get('job_type')
+    if job_type_filter and job_type_filter not in (JOB_TYPE_MAINTENANCE, JOB_TYPE_LEGAL):
+        abort(400, f"Invalid job_type. Use {JOB_TYPE_MAINTENANCE} or {JOB_TYPE_LEGAL}.")
     # Start base query with eager loading for efficiency
     query = JobCard.query.options(
         db.joinedload(JobCard.equipment_ref) # Eager load equipment
@@ -143,21 +238,19 @@ def get_job_cards():
     if status_filter:
         # Apply filter if status parameter is provided
         query = query.filter(JobCard.status == status_filter)
+    if job_type_filter:
+        query = query.filter(JobCard.job_type == job_type_filter)
 
     try:
-        # Consider adding pagination for large numbers of job cards
-        # Add ordering, e.g., by descending ID or due date
-        job_cards = query.order_by(desc(JobCard.id)).all()
-
         # Use the model's to_dict method, including equipment details
-        results = [jc.to_dict(include_equipment=True) for jc in job_cards]
-        return jsonify(results)
+        return list_response(query, page, lambda jc: jc.to_dict(include_equipment=True), 'job cards')
     except Exception as e:
         logging.error(f"Error retrieving job cards: {e}", exc_info=True)
         abort(500, description="Error retrieving job cards.")
 
 # ... (Keep existing GET id, POST, PUT, DELETE for Job Cards, using to_dict) ...
 @api_bp.route('/job_cards/<int:id>', methods=['GET'])
+@conditional_on(JobCard, Equipment, JobCardPart, Part, Supplier)
 def get_job_card(id):
     job_card = JobCard.query.options(
         db.joinedload(JobCard.equipment_ref),
@@ -177,23 +270,31 @@ def create_job_card():
     equipment = Equipment.query.get(data['equipment_id'])
     if not equipment: abort(404, f"Equipment with ID {data['equipment_id']} not found.")
 
+    due_date = None
+    if data.get('due_date'):
+        try:
+            due_date = parse_datetime(data['due_date'])
+            # Handle naive/aware based on model field type and app consistency
+            # Assuming model stores naive UTC if aware is passed
+            if isinstance(due_date, datetime) and due_date.tzinfo:
+                due_date = due_date.astimezone(timezone.utc).replace(tzinfo=None)
+        except (ValueError, TypeError):
+            abort(400, "Invalid due_date format. Use ISO 8601.")
+    task = None
+    task_id = data.get('task_id')
+    if task_id is not None:
+        task = MaintenanceTask.query.get(task_id) if isinstance(task_id, int) else None
+        if not task or task.equipment_id != equipment.id:
+            abort(400, f"Task {task_id} not found on equipment {equipment.id}.")
+    is_legal = data.get('is_legal_compliance', task.is_legal_compliance if task else False)
+    job_type = JOB_TYPE_LEGAL if is_legal else JOB_TYPE_MAINTENANCE
+
     try:
-        year = datetime.now(timezone.utc).year
-        count = JobCard.query.count() + 1 # Consider race condition potential
-        job_number = f"JC-{year}-{count:04d}"
-        due_date = None
-        if data.get('due_date'):
-            try:
-                due_date = parse_datetime(data['due_date'])
-                # Handle naive/aware based on model field type and app consistency
-                # Assuming model stores naive UTC if aware is passed
-                if isinstance(due_date, datetime) and due_date.tzinfo:
-                    due_date = due_date.astimezone(timezone.utc).replace(tzinfo=None)
-            except (ValueError, TypeError):
-                abort(400, "Invalid due_date format. Use ISO 8601.")
+        job_number = allocate_job_number(job_type) # Same numbering (and counter) as the web UI
 
         new_jc = JobCard(
-            job_number=job_number, equipment_id=data['equipment_id'], description=data['description'],
+            job_number=job_number, job_type=job_type, equipment_id=data['equipment_id'], task_id=task_id,
+            description=data['description'],
             technician=data.get('technician'), status=data.get('status', 'To Do'),
             oem_required=data.get('oem_required', False), kit_required=data.get('kit_required', False),
             due_date=due_date, comments=data.get('comments')
@@ -285,6 +386,7 @@ def delete_job_card(id):
 # ==============================================================================
 
 @api_bp.route('/', methods=['GET'])
+@conditional_on(MaintenancePlanEntry, Equipment)
 def get_maintenance_plan():
     """
     Returns the generated maintenance plan entries for a specific year and month.
@@ -329,38 +431,20 @@ def get_maintenance_plan():
 
 # --- NEW Endpoint for ALL Maintenance Plan Entries ---
 @api_bp.route('/maintenance_plan/all', methods=['GET'])
+@conditional_on(MaintenancePlanEntry, Equipment)
 def get_all_maintenance_plan_entries():
     """
-    Returns ALL generated maintenance plan entries across all time periods.
-    Warning: This could return a large amount of data. Consider pagination for production use.
+    Returns generated maintenance plan entries across all time periods, most
+    recent period first (paged with ?limit, or streamed with ?stream=ndjson).
+    Query parameters: limit, cursor, stream (see app/api/pagination.py).
     """
+    page = PageRequest(PLAN_ENTRY_LIST_KEYS)
     try:
-        # Query all entries, consider adding ordering
-        all_entries = MaintenancePlanEntry.query.options(
+        query = MaintenancePlanEntry.query.options(
             db.joinedload(MaintenancePlanEntry.equipment), # Eager load equipment
             # db.joinedload(MaintenancePlanEntry.task) # Optional: load task details
-        ).order_by(
-            MaintenancePlanEntry.plan_year.desc(), # Most recent year first
-            MaintenancePlanEntry.plan_month.desc(), # Most recent month first
-            MaintenancePlanEntry.planned_date, # Then by planned date
-            MaintenancePlanEntry.equipment_id # Then by equipment
-        ).all() # Use .all() for now, but add pagination later if needed
-
-        # Add pagination logic here in a real application:
-        # page = request.args.get('page', 1, type=int)
-        # per_page = request.args.get('per_page', 20, type=int)
-        # paginated_entries = query.paginate(page=page, per_page=per_page, error_out=False)
-        # results = [entry.to_dict(...) for entry in paginated_entries.items]
-        # return jsonify({
-        #     'items': results,
-        #     'total_pages': paginated_entries.pages,
-        #     'current_page': page,
-        #     'total_items': paginated_entries.total
-        # })
-
-        # For now, return all using to_dict
-        results = [entry.to_dict(include_equipment=True) for entry in all_entries]
-        return jsonify(results)
+        )
+        return list_response(query, page, lambda entry: entry.to_dict(include_equipment=True), 'plan entries')
 
     except Exception as e:
         logging.error(f"Error retrieving all maintenance plan entries: {e}", exc_info=True)
@@ -368,13 +452,78 @@ def get_all_maintenance_plan_entries():
 # --- End NEW Endpoint ---
 
 
+# ==============================================================================
+# === Maintenance Task API Routes ===
+# ==============================================================================
+
+@api_bp.route('/tasks', methods=['GET'])
+def get_tasks():
+    """
+    Returns a page of maintenance tasks with their current due status.
+
+    Query parameters:
+        status: overdue, due_soon, warning, error, never_performed, ok, unknown
+                or actionable (overdue + due soon + warning + error).
+        legal: 1/true for legal compliance tasks only, 0/false for maintenance only.
+        equipment_id: Restrict to one equipment item.
+        page, per_page: Pagination (per_page max 200, default 50).
+
+    Filtering uses the persisted next_due_date/status_rank columns (indexed).
+    """
+    status_filter = request.args.get('status')
+    legal_filter = request.args.get('legal')
+    equipment_id = request.args.get('equipment_id', type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+
+    if status_filter and status_filter.lower() not in STATE_FILTERS:
+        abort(400, f"Invalid status. Use one of: {', '.join(sorted(STATE_FILTERS))}.")
+
+    try:
+        current_time = datetime.utcnow()
+
+        query = MaintenanceTask.query.options(db.joinedload(MaintenanceTask.equipment_ref))
+        if status_filter:
+            query = query.filter(due_state_filter(STATE_FILTERS[status_filter.lower()], current_time))
+        if legal_filter is not None:
+            query = query.filter(MaintenanceTask.is_legal_compliance.is_(legal_filter.lower() in ('1', 'true', 'yes')))
+        if equipment_id:
+            query = query.filter(MaintenanceTask.equipment_id == equipment_id)
+
+        query = query.order_by(MaintenanceTask.next_due_date.asc().nullslast(), MaintenanceTask.id)
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+
+        statuses = calculate_task_statuses(pagination.items, current_time)
+        results = []
+        for task in pagination.items:
+            task_data = task.to_dict(include_equipment=True)
+            task_data['due_status'] = statuses[task.id].to_dict()
+            results.append(task_data)
+
+        return jsonify({
+            'items': results,
+            'total_pages': pagination.pages,
+            'current_page': page,
+            'total_items': pagination.total
+        })
+    except Exception as e:
+        logging.error(f"Error retrieving maintenance tasks: {e}", exc_info=True)
+        abort(500, description="Error retrieving maintenance tasks.")
+
+
 # ==============================================================================
 # === Usage Log API Routes ===
 # ==============================================================================
 # ... (Keep existing Usage Log routes: GET list, GET id, POST) ...
 # Example using model's to_dict:
 @api_bp.route('/usage_logs', methods=['GET'])
+@conditional_on(UsageLog, Equipment)
 def get_usage_logs():
+    """
+    Returns usage logs, newest first (paged with ?limit). Optional equipment_id filter.
+    Query parameters: limit, cursor, stream (see app/api/pagination.py).
+    """
+    page = PageRequest(USAGE_LOG_LIST_KEYS)
     equipment_id_filter = request.args.get('equipment_id', type=int)
     query = UsageLog.query.options(db.joinedload(UsageLog.equipment_ref))
     if equipment_id_filter:
@@ -382,15 +531,13 @@ def get_usage_logs():
             abort(404, f"Equipment with ID {equipment_id_filter} not found.")
         query = query.filter(UsageLog.equipment_id == equipment_id_filter)
     try:
-        # Add pagination if needed
-        logs = query.order_by(desc(UsageLog.log_date)).all()
-        results = [log.to_dict(include_equipment=True) for log in logs]
-        return jsonify(results)
+        return list_response(query, page, lambda log: log.to_dict(include_equipment=True), 'usage logs')
     except Exception as e:
          logging.error(f"Error retrieving usage logs: {e}", exc_info=True)
          abort(500, "Error retrieving usage logs.")
 
 @api_bp.route('/usage_logs/<int:id>', methods=['GET'])
+@conditional_on(UsageLog, Equipment)
 def get_usage_log(id):
     log = UsageLog.query.options(
              db.joinedload(UsageLog.equipment_ref)
@@ -409,26 +556,102 @@ def create_usage_log():
     try:
         usage_value = float(data['usage_value'])
     except (ValueError, TypeError): abort(400, "Invalid usage_value. Must be a number.")
+    if usage_value < 0: abort(400, "usage_value cannot be negative.")
     log_date = datetime.now(timezone.utc)
     if data.get('log_date'):
         try:
             log_date = parse_datetime(data['log_date'])
             if log_date.tzinfo: log_date = log_date.astimezone(timezone.utc)
-            # Handle naive storage if needed: log_date = log_date.replace(tzinfo=None)
         except (ValueError, TypeError): abort(400, "Invalid log_date format. Use ISO 8601.")
+    reading = UsageReading(0, data['equipment_id'], usage_value, log_date) # Stored as naive UTC
+    if validate_usage_reading(reading): # Same checks as the usage form (one query)
+        abort(400, reading.error)
+    new_log = None
     try:
-        new_log = UsageLog(
-            equipment_id=data['equipment_id'], usage_value=usage_value, log_date=log_date
-        )
-        db.session.add(new_log)
-        db.session.commit()
-        logging.info(f"API: Created Usage Log {new_log.id} for equipment {new_log.equipment_id}")
-        db.session.refresh(new_log) # Refresh to get relationships
-        return jsonify(new_log.to_dict(include_equipment=True)), 201
+        logs = insert_usage_logs([reading])
+        if logs:
+            new_log = logs[0]
+            refresh_task_due_columns(equipment_ids=[new_log.equipment_id], usage_only=True)
+            db.session.commit()
+            logging.info(f"API: Created Usage Log {new_log.id} for equipment {new_log.equipment_id}")
+            db.session.refresh(new_log) # Refresh to get relationships
     except Exception as e:
         db.session.rollback()
         logging.error(f"Database error creating usage log: {e}", exc_info=True)
         abort(500, "Database error creating usage log.")
+    if new_log is None:
+        abort(409, reading.error)
+    return jsonify(new_log.to_dict(include_equipment=True)), 201
+
+@api_bp.route('/usage_logs/batch', methods=['POST'])
+def create_usage_logs_batch():
+    """
+    Logs many usage readings in one request (e.g. telematics hour meters).
+
+    Body: JSON array (or NDJSON) of {"equipment_id", "usage_value", "log_date"?}.
+    Each reading gets the add_usage checks (no duplicate timestamp, no value
+    below an earlier or above a later log, at most
+    MAX_REASONABLE_DAILY_USAGE_INCREASE per day), against the logged readings
+    and the readings accepted earlier in the batch. Accepted readings are
+    inserted in one transaction; rejected ones are reported, not fatal.
+
+    Returns: {"accepted": n, "rejected": n, "results": [{index, status, error, ...}]}
+    """
+    items = _batch_items_from_request()
+    now = datetime.utcnow()
+    readings = []
+    for index, item in enumerate(items):
+        error = None
+        equipment_id = usage_value = None
+        log_date = now
+        if not isinstance(item, dict):
+            error = "Item must be an object."
+        else:
+            try:
+                equipment_id = int(item['equipment_id'])
+            except (KeyError, TypeError, ValueError):
+                error = "Missing or invalid equipment_id."
+            try:
+                usage_value = float(item['usage_value'])
+                if usage_value < 0:
+                    error = error or "usage_value cannot be negative."
+            except (KeyError, TypeError, ValueError):
+                error = error or "Missing or invalid usage_value. Must be a number."
+            if item.get('log_date'):
+                try:
+                    log_date = _parse_item_datetime(item['log_date'])
+                except (ValueError, TypeError, OverflowError):
+                    error = error or "Invalid log_date format. Use ISO 8601."
+        reading = UsageReading(index, equipment_id, usage_value, log_date)
+        reading.error = error
+        readings.append(reading)
+
+    requested_ids = {r.equipment_id for r in readings if r.error is None}
+    known_ids = set(db.session.scalars(db.select(Equipment.id).where(Equipment.id.in_(requested_ids)))) if requested_ids else set()
+    for reading in readings:
+        if reading.error is None and reading.equipment_id not in known_ids:
+            reading.error = f"Equipment with ID {reading.equipment_id} not found."
+
+    try:
+        accepted = validate_usage_readings(readings)
+        # One flush; SQLAlchemy batches the INSERTs (insertmanyvalues) and the
+        # flush hooks (usage rate cache, change feed) see every row
+        insert_usage_logs(accepted)
+        accepted = [r for r in accepted if r.accepted] # Readings that hit a concurrent write carry the error
+        if accepted:
+            refresh_task_due_columns(equipment_ids={r.equipment_id for r in accepted}, usage_only=True)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Database error in usage log batch: {e}", exc_info=True)
+        abort(500, "Database error logging usage batch.")
+
+    logging.info(f"API: Usage log batch of {len(readings)}: {len(accepted)} accepted, {len(readings) - len(accepted)} rejected.")
+    return jsonify({
+        'accepted': len(accepted),
+        'rejected': len(readings) - len(accepted),
+        'results': [reading.to_dict() for reading in readings],
+    })
 
 # ==============================================================================
 # === Checklist API Routes ===
@@ -436,7 +659,13 @@ def create_usage_log():
 # ... (Keep existing Checklist routes: GET list, GET id, POST) ...
 # Example using model's to_dict:
 @api_bp.route('/checklists', methods=['GET'])
+@conditional_on(Checklist, Equipment)
 def get_checklists():
+    """
+    Returns checklists, newest first (paged with ?limit). Optional equipment_id filter.
+    Query parameters: limit, cursor, stream (see app/api/pagination.py).
+    """
+    page = PageRequest(CHECKLIST_LIST_KEYS)
     equipment_id_filter = request.args.get('equipment_id', type=int)
     query = Checklist.query.options(db.joinedload(Checklist.equipment_ref))
     if equipment_id_filter:
@@ -444,33 +673,81 @@ def get_checklists():
             abort(404, f"Equipment with ID {equipment_id_filter} not found.")
         query = query.filter(Checklist.equipment_id == equipment_id_filter)
     try:
-        # Add pagination if needed
-        checklists = query.order_by(desc(Checklist.check_date)).all()
-        results = [cl.to_dict(include_equipment=True) for cl in checklists]
-        return jsonify(results)
+        return list_response(query, page, lambda cl: cl.to_dict(include_equipment=True), 'checklists')
     except Exception as e:
         logging.error(f"Error retrieving checklists: {e}", exc_info=True)
         abort(500, "Error retrieving checklists.")
 
 @api_bp.route('/checklists/<int:id>', methods=['GET'])
+@conditional_on(Checklist, Equipment)
 def get_checklist(id):
     checklist = Checklist.query.options(
             db.joinedload(Checklist.equipment_ref)
         ).get_or_404(id, description=f"Checklist with ID {id} not found.")
     return jsonify(checklist.to_dict(include_equipment=True))
 
+@api_bp.route('/checklists/compliance', methods=['GET'])
+@conditional_on(Checklist, Equipment)
+def get_checklist_compliance_api():
+    """
+    Daily checklist compliance of operational, checklist_required equipment
+    (see get_checklist_compliance() for the payload).
+    Query parameters: start, end (YYYY-MM-DD, both required), type (equipment type).
+    """
+    start_arg, end_arg = request.args.get('start'), request.args.get('end')
+    if not start_arg or not end_arg:
+        abort(400, "Both 'start' and 'end' (YYYY-MM-DD) are required.") # The ETag cannot depend on today
+    try:
+        first_day, last_day = parse_compliance_range(start_arg, end_arg, date.today())
+    except ValueError as e:
+        abort(400, str(e))
+    equipment_list = compliance_equipment(request.args.get('type'))
+    return jsonify(get_checklist_compliance(equipment_list, first_day, last_day))
+
+@api_bp.route('/checklists/missing', methods=['GET'])
+def get_missing_checklists():
+    """
+    Operational, checklist_required equipment without a checklist in a period.
+    Query parameters: period ('today', 'yesterday', 'week'; default 'today') or
+    start and end (YYYY-MM-DD, at most MISSING_CHECKLIST_MAX_DAYS days), type.
+    Not ETagged: the default period moves with the date, not with the tables.
+    """
+    start_arg, end_arg = request.args.get('start'), request.args.get('end')
+    if start_arg or end_arg:
+        try:
+            first_day, last_day = date.fromisoformat(start_arg or ''), date.fromisoformat(end_arg or '')
+        except ValueError:
+            abort(400, "Invalid date format. Use YYYY-MM-DD for both 'start' and 'end'.")
+    else:
+        try:
+            first_day, last_day = missing_checklist_range(request.args.get('period', 'today'), date.today())
+        except ValueError as e:
+            abort(400, str(e))
+    if not 0 <= (last_day - first_day).days < MISSING_CHECKLIST_MAX_DAYS:
+        abort(400, f"'start' must be on or before 'end', at most {MISSING_CHECKLIST_MAX_DAYS} days apart.")
+
+    missing = find_missing_checklists(first_day, last_day, request.args.get('type'))
+    return jsonify({
+        'start': first_day.isoformat(),
+        'end': last_day.isoformat(),
+        'count': len(missing),
+        'equipment': [item.to_dict() for item in missing],
+    })
+
 @api_bp.route('/checklists', methods=['POST'])
 def create_checklist():
     if not request.json: abort(400, "Request must be JSON.")
     data = request.get_json()
-    required_fields = ['equipment_id', 'status']
+    required_fields = ['equipment_id', 'status', 'operator']
     if not all(field in data for field in required_fields):
         abort(400, f"Missing required fields: {', '.join(required_fields)}")
     if not Equipment.query.get(data['equipment_id']):
          abort(404, f"Equipment with ID {data['equipment_id']} not found.")
-    valid_statuses = ["Go", "Go But", "No Go"]
-    if data['status'] not in valid_statuses:
-        abort(400, f"Invalid status '{data['status']}'. Must be one of: {', '.join(valid_statuses)}")
+    if data['status'] not in CHECKLIST_STATUSES:
+        abort(400, f"Invalid status '{data['status']}'. Must be one of: {', '.join(CHECKLIST_STATUSES)}")
+    operator = (data['operator'] or '').strip() if isinstance(data['operator'], str) else ''
+    if not operator:
+        abort(400, "'operator' must be a non-empty string.")
     check_date = datetime.now(timezone.utc)
     if data.get('check_date'):
         try:
@@ -481,7 +758,7 @@ def create_checklist():
     try:
         new_checklist = Checklist(
             equipment_id=data['equipment_id'], status=data['status'],
-            issues=data.get('issues'), check_date=check_date
+            issues=data.get('issues'), check_date=check_date, operator=operator
         )
         db.session.add(new_checklist)
         db.session.commit()
@@ -493,4 +770,230 @@ def create_checklist():
         logging.error(f"Database error creating checklist: {e}", exc_info=True)
         abort(500, "Database error creating checklist.")
 
+@api_bp.route('/checklists/batch', methods=['POST'])
+def create_checklists_batch():
+    """
+    Logs many checklists in one request (e.g. a gate tablet syncing a shift).
+
+    Body: JSON array (or NDJSON) of {"equipment_id", "status", "operator",
+    "check_date"?, "issues"?, "usage_value"?}. As with the checklist form, a
+    usage_value is logged at the check time if it passes the usage checks
+    (validated set-wise for the whole batch); a rejected reading does not
+    reject its checklist. Everything accepted is inserted in one transaction.
+
+    Returns: {"accepted": n, "rejected": n, "usage_logged": n,
+              "results": [{index, status, error, usage: {status, error}|null, ...}]}
+    """
+    items = _batch_items_from_request()
+    now = datetime.utcnow()
+    results = []
+    readings = []
+    for index, item in enumerate(items):
+        result = {'index': index, 'equipment_id': None, 'check_date': None, 'status': 'rejected', 'error': None, 'usage': None}
+        results.append(result)
+        if not isinstance(item, dict):
+            result['error'] = "Item must be an object."
+            continue
+        try:
+            result['equipment_id'] = int(item['equipment_id'])
+        except (KeyError, TypeError, ValueError):
+            result['error'] = "Missing or invalid equipment_id."
+            continue
+        if item.get('status') not in CHECKLIST_STATUSES:
+            result['error'] = f"Invalid status '{item.get('status')}'. Must be one of: {', '.join(CHECKLIST_STATUSES)}"
+            continue
+        operator = item.get('operator').strip() if isinstance(item.get('operator'), str) else ''
+        if not operator:
+            result['error'] = "Missing operator."
+            continue
+        check_date = now
+        if item.get('check_date'):
+            try:
+                check_date = _parse_item_datetime(item['check_date'])
+            except (ValueError, TypeError, OverflowError):
+                result['error'] = "Invalid check_date format. Use ISO 8601."
+                continue
+        result['check_date'] = check_date
+        result['row'] = {
+            'equipment_id': result['equipment_id'], 'status': item['status'], 'operator': operator,
+            'issues': item.get('issues'), 'check_date': check_date,
+        }
+        if item.get('usage_value') not in (None, ''):
+            try:
+                usage_value = float(item['usage_value'])
+                usage_error = "Usage value cannot be negative." if usage_value < 0 else None
+            except (TypeError, ValueError):
+                usage_value, usage_error = None, "Invalid usage_value. Must be a number."
+            reading = UsageReading(index, result['equipment_id'], usage_value, check_date)
+            reading.error = usage_error
+            result['reading'] = reading
+
+    requested_ids = {r['equipment_id'] for r in results if 'row' in r}
+    known_ids = set(db.session.scalars(db.select(Equipment.id).where(Equipment.id.in_(requested_ids)))) if requested_ids else set()
+    for result in results:
+        if 'row' in result and result['equipment_id'] not in known_ids:
+            result['error'] = f"Equipment with ID {result['equipment_id']} not found."
+            del result['row']
+            result.pop('reading', None)
+        elif 'row' in result:
+            result['status'] = 'accepted'
+            if 'reading' in result:
+                readings.append(result['reading'])
+
+    checklist_rows = [r.pop('row') for r in results if 'row' in r]
+    try:
+        accepted_readings = validate_usage_readings(readings)
+        db.session.add_all([Checklist(**row) for row in checklist_rows])
+        insert_usage_logs(accepted_readings) # Batched INSERTs; flush hooks see every row
+        accepted_readings = [r for r in accepted_readings if r.accepted] # Concurrent conflicts: checklists still logged
+        if accepted_readings:
+            refresh_task_due_columns(equipment_ids={r.equipment_id for r in accepted_readings}, usage_only=True)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Database error in checklist batch: {e}", exc_info=True)
+        abort(500, "Database error logging checklist batch.")
+
+    for result in results:
+        reading = result.pop('reading', None)
+        if reading is not None:
+            result['usage'] = {'usage_value': reading.usage_value, 'status': 'logged' if reading.accepted else 'rejected', 'error': reading.error}
+        if result['check_date']:
+            result['check_date'] = result['check_date'].isoformat()
+
+    logging.info(f"API: Checklist batch of {len(results)}: {len(checklist_rows)} accepted, "
+                 f"{len(results) - len(checklist_rows)} rejected, {len(accepted_readings)} usage reading(s) logged.")
+    return jsonify({
+        'accepted': len(checklist_rows),
+        'rejected': len(results) - len(checklist_rows),
+        'usage_logged': len(accepted_readings),
+        'results': results,
+    })
+
+# ==============================================================================
+# === Change Feed API Routes ===
+# ==============================================================================
+
+@api_bp.route('/changes', methods=['GET'])
+@conditional_on(*TRACKED_MODELS) # Nothing new in the feed unless one of these tables changed
+def get_changes():
+    """
+    Incremental sync: inserts, updates and deletes of equipment, job cards,
+    tasks, usage logs, checklists, parts and stock transactions, in commit
+    order (see app/change_feed.py).
+
+    Query parameters:
+        since: `next_since` of the previous response (omit or 0 to start from the beginning).
+        limit: Maximum changes returned (same defaults as the list endpoints).
+        tables: Optional comma-separated filter, e.g. job_card,usage_log.
+
+    Returns {"items": [...], "next_since": id, "has_more": bool, "next": url|null}.
+    Deletes have "operation": "delete"; "data" is null for removed rows and
+    holds the row for soft-deleted job cards.
+    """
+    since = request.args.get('since', 0, type=int)
+    if since < 0:
+        abort(400, "'since' must be a non-negative integer.")
+    limit = page_limit()
+    tracked_tables = {model.__table__.name for model in TRACKED_MODELS}
+    tables = [name.strip() for name in request.args.get('tables', '').split(',') if name.strip()]
+    unknown_tables = set(tables) - tracked_tables
+    if unknown_tables:
+        abort(400, f"Unknown table(s): {', '.join(sorted(unknown_tables))}. Use: {', '.join(sorted(tracked_tables))}.")
+
+    try:
+        query = ChangeLog.query.filter(ChangeLog.id > since) # Keyset on the primary key
+        if tables:
+            query = query.filter(ChangeLog.table_name.in_(tables))
+        changes = query.order_by(ChangeLog.id).limit(limit + 1).all()
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        next_since = changes[-1].id if changes else since
+        args = request.args.to_dict()
+        args['since'] = next_since
+        return jsonify({
+            'items': [change.to_dict() for change in changes],
+            'next_since': next_since,
+            'has_more': has_more,
+            'next': url_for('api.get_changes', **args) if has_more else None,
+        })
+    except Exception as e:
+        logging.error(f"Error retrieving change feed: {e}", exc_info=True)
+        abort(500, description="Error retrieving change feed.")
+
+# ==============================================================================
+# === Background Job API Routes ===
+# ==============================================================================
+
+def _job_params_from_request(job_type, data):
+    """Validates and normalises the params for a job submission; aborts 400 on bad input."""
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        abort(400, "'params' must be an object.")
+    if job_type in (JOB_GENERATE_PLAN, JOB_PLAN_PDF):
+        try:
+            year, month = int(params['year']), int(params['month'])
+        except (KeyError, TypeError, ValueError):
+            abort(400, "Integer 'year' and 'month' params are required.")
+        if not (1 <= month <= 12):
+            abort(400, "Invalid 'month' param. Must be between 1 and 12.")
+        current_year = date.today().year
+        if not (current_year - 5 <= year <= current_year + 5):
+            abort(400, "Invalid 'year' param. Seems out of reasonable range.")
+        if job_type == JOB_PLAN_PDF:
+            if not WEASYPRINT_AVAILABLE:
+                abort(400, "PDF generation library (WeasyPrint) is not installed on the server.")
+            return {'year': year, 'month': month}
+        try:
+            months = int(params.get('months', 1))
+        except (TypeError, ValueError):
+            abort(400, "'months' param must be an integer.")
+        if not (1 <= months <= MAX_PLAN_HORIZON_MONTHS):
+            abort(400, f"'months' must be between 1 and {MAX_PLAN_HORIZON_MONTHS}.")
+        return {'year': year, 'month': month, 'months': months, 'full': bool(params.get('full', False))}
+    return params
+
+
+@api_bp.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queues a background job and returns immediately (202) with its id.
+    Body: {"job_type": "generate_plan" | "plan_pdf", "params": {...}}
+    Poll GET /api/jobs/<id>; download the result from GET /api/jobs/<id>/download.
+    """
+    if not request.json: abort(400, "Request must be JSON.")
+    data = request.get_json()
+    job_type = data.get('job_type')
+    if job_type not in registered_job_types():
+        abort(400, f"Invalid job_type '{job_type}'. Must be one of: {', '.join(registered_job_types())}")
+    params = _job_params_from_request(job_type, data)
+    try:
+        job = submit_job(job_type, params)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error submitting background job: {e}", exc_info=True)
+        abort(500, "Database error submitting job.")
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.get_job', job_id=job.id)
+    return response
+
+
+@api_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@conditional_on(BackgroundJob)
+def get_job(job_id):
+    """Returns the status (and result summary, once done) of a background job."""
+    job = BackgroundJob.query.get_or_404(job_id, description=f"Job with ID {job_id} not found.")
+    return jsonify(job.to_dict())
+
+
+@api_bp.route('/jobs/<int:job_id>/download', methods=['GET'])
+def download_job(job_id):
+    """Returns the file produced by a finished job (404 until there is one)."""
+    job = BackgroundJob.query.get_or_404(job_id, description=f"Job with ID {job_id} not found.")
+    if not job.has_download:
+        abort(404, f"Job {job_id} has no downloadable result (status: {job.status}).")
+    return send_file(BytesIO(job.result_data), mimetype=job.result_mimetype or 'application/octet-stream',
+                     as_attachment=True, download_name=job.result_filename or f"job_{job.id}")
+
 # --- (Optional) Add other API endpoints for Supplier, Part, MaintenanceTask etc. if needed ---
\ No newline at end of file
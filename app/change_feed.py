@@ -0,0 +1,90 @@
+# tkr_system/app/change_feed.py
+"""
+Change data capture for /api/changes: ORM writes to the synced models are
+written to `change_log`, one coalesced entry per row, when the transaction
+commits.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import event, func, inspect, insert, select
+from sqlalchemy.orm import Session
+from app.models import (
+    ChangeLog, Equipment, JobCard, MaintenanceTask, UsageLog, Checklist, Part, StockTransaction
+)
+from app.table_versions import table_exists, is_savepoint_rollback
+
+TRACKED_MODELS = (Equipment, JobCard, MaintenanceTask, UsageLog, Checklist, Part, StockTransaction)
+# Models whose status column marks a soft delete, and the status value that does
+SOFT_DELETE_STATUS = {JobCard: 'Deleted'}
+
+CHANGE_LOG_TABLE = ChangeLog.__table__
+CHANGE_FEED_LOCK_KEY = 0x43444331 # pg_advisory_xact_lock key serialising change_log writers
+_SESSION_KEY = 'change_feed'
+
+
+def _is_soft_delete(obj):
+    status_value = SOFT_DELETE_STATUS.get(type(obj))
+    if status_value is None:
+        return False
+    history = inspect(obj).attrs.status.history
+    return history.has_changes() and obj.status == status_value
+
+
+def _capture(pending, obj, operation):
+    """Records `operation` ('insert', 'update', 'soft_delete', 'delete') of `obj`, merged with earlier ones."""
+    state = inspect(obj)
+    key = (obj.__table__.name, state.mapper.primary_key_from_instance(obj)[0]) # identity is set only after after_flush
+    previous = pending.get(key)
+    if previous is None:
+        pending[key] = (operation, obj)
+    elif previous[0] == 'insert':
+        if operation == 'delete':
+            del pending[key] # Created and removed in the same transaction
+    elif operation in ('delete', 'soft_delete'):
+        pending[key] = (operation, obj)
+    # Otherwise keep the earlier operation; the snapshot is taken at commit anyway
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = [(obj, 'insert') for obj in session.new if isinstance(obj, TRACKED_MODELS)]
+    changes += [
+        (obj, 'soft_delete' if _is_soft_delete(obj) else 'update') for obj in session.dirty
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj, include_collections=False)
+    ]
+    changes += [(obj, 'delete') for obj in session.deleted if isinstance(obj, TRACKED_MODELS)]
+    if changes:
+        pending = session.info.setdefault(_SESSION_KEY, {})
+        for obj, operation in changes:
+            _capture(pending, obj, operation)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_change_log(session):
+    session.flush() # Commit would flush after this hook; capture those changes too
+    pending = session.info.pop(_SESSION_KEY, None)
+    if not pending:
+        return
+    connection = session.connection()
+    if not table_exists(connection, CHANGE_LOG_TABLE.name):
+        return
+    now = datetime.utcnow()
+    rows = []
+    for (table_name, row_id), (operation, obj) in pending.items():
+        rows.append({
+            'table_name': table_name,
+            'row_id': row_id,
+            'operation': 'delete' if operation == 'soft_delete' else operation,
+            'changed_at': now,
+            'data': None if operation == 'delete' else obj.to_dict(), # Soft deletes keep the row
+        })
+    if connection.dialect.name == 'postgresql':
+        connection.execute(select(func.pg_advisory_xact_lock(CHANGE_FEED_LOCK_KEY))) # Released at commit
+    connection.execute(insert(CHANGE_LOG_TABLE), rows)
+    logging.debug(f"Captured {len(rows)} change(s) for the change feed.")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    if not is_savepoint_rollback(session):
+        session.info.pop(_SESSION_KEY, None)
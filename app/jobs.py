@@ -0,0 +1,237 @@
+# tkr_system/app/jobs.py
+"""
+Database-backed background jobs.
+
+submit_job() queues a job in the background_job table for the worker
+(`python manage.py run-worker`) when JOBS_ENABLED is set; otherwise the job
+runs inside the submitting request.
+
+Handlers are plain functions registered with @job_handler('type'). They take
+the job params as keyword arguments and return a dict with any of:
+    'result'   - small JSON-serialisable summary shown on the status page
+    'data'     - bytes offered for download (e.g. a PDF)
+    'filename', 'mimetype' - for the download
+"""
+import logging
+import os
+import socket
+import time as time_module
+from datetime import datetime, timedelta
+from flask import current_app, has_request_context
+from sqlalchemy import update
+from app import db
+from app.models import BackgroundJob
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)
+
+# Defaults, overridable in config.py
+DEFAULT_POLL_INTERVAL_SECONDS = 2
+DEFAULT_JOB_TIMEOUT_SECONDS = 30 * 60
+DEFAULT_RESULT_RETENTION_DAYS = 7
+HOUSEKEEPING_INTERVAL_SECONDS = 60
+
+_handlers = {}
+
+
+def job_handler(job_type):
+    """Registers the decorated function as the handler for `job_type`."""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def registered_job_types():
+    return sorted(_handlers)
+
+
+def jobs_enabled():
+    """False (the default) runs submitted jobs inside the submitting request (no worker needed)."""
+    return current_app.config.get('JOBS_ENABLED', False)
+
+
+def submit_job(job_type, params=None, user_id=None):
+    """
+    Queues a job and commits. When background jobs are disabled in config the
+    job is run immediately instead, so callers can treat both cases the same.
+
+    Returns:
+        BackgroundJob: The new job.
+    Raises:
+        ValueError: Unknown job type.
+    """
+    if job_type not in _handlers:
+        raise ValueError(f"Unknown job type '{job_type}'.")
+    job = BackgroundJob(job_type=job_type, status=JOB_QUEUED, params=params or {}, created_by_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+    logging.info(f"Queued background job {job.id} ({job_type}) with params {job.params}.")
+
+    if not jobs_enabled():
+        logging.debug(f"Background jobs disabled; running job {job.id} inline.")
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        job.attempts = 1
+        job.worker_id = 'inline'
+        db.session.commit()
+        run_job(job)
+        purge_finished_jobs() # No worker does the housekeeping
+    return job
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically marks the oldest queued job as running for this worker and commits.
+
+    The claim is a conditional UPDATE (status still 'queued'), so two workers can
+    never run the same job; on PostgreSQL the candidate row is also picked with
+    FOR UPDATE SKIP LOCKED so workers do not queue up behind each other.
+
+    Returns:
+        BackgroundJob or None.
+    """
+    while True:
+        query = BackgroundJob.query.filter(
+            BackgroundJob.status == JOB_QUEUED
+        ).order_by(BackgroundJob.created_at, BackgroundJob.id)
+        if db.session.get_bind().dialect.name == 'postgresql':
+            query = query.with_for_update(skip_locked=True)
+        candidate_id = query.with_entities(BackgroundJob.id).limit(1).scalar()
+        if candidate_id is None:
+            db.session.commit() # End the read transaction
+            return None
+
+        claimed = db.session.execute(
+            update(BackgroundJob).where(
+                BackgroundJob.id == candidate_id,
+                BackgroundJob.status == JOB_QUEUED
+            ).values(
+                status=JOB_RUNNING,
+                started_at=datetime.utcnow(),
+                worker_id=worker_id,
+                attempts=BackgroundJob.attempts + 1
+            )
+        ).rowcount
+        db.session.commit()
+        if claimed == 1:
+            return db.session.get(BackgroundJob, candidate_id, populate_existing=True)
+        # Another worker got there first; try the next one
+
+
+def _finish_job(job_id, **values):
+    """
+    Records a job's outcome, only if it is still 'running' (fail_stale_jobs may
+    have given up on it meanwhile). Commits. Returns True if recorded.
+    """
+    finished = db.session.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.id == job_id,
+            BackgroundJob.status == JOB_RUNNING
+        ).values(finished_at=datetime.utcnow(), **values)
+    ).rowcount
+    db.session.commit()
+    if not finished:
+        logging.warning(f"Background job {job_id} was no longer running (timed out?); outcome '{values['status']}' discarded.")
+    return finished == 1
+
+
+def run_job(job):
+    """Runs a claimed job's handler and records the outcome (commits)."""
+    handler = _handlers.get(job.job_type)
+    job_id = job.id
+    started = time_module.perf_counter()
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job type '{job.job_type}'.")
+        params = dict(job.params or {})
+        if has_request_context():
+            output = handler(**params) or {}
+        else:
+            # Handlers may render templates that use url_for/current_user
+            with current_app.test_request_context('/'):
+                output = handler(**params) or {}
+
+        if _finish_job(job_id, status=JOB_DONE, result=output.get('result'), result_data=output.get('data'),
+                       result_filename=output.get('filename'), result_mimetype=output.get('mimetype'), error=None):
+            logging.info(f"Background job {job_id} done in {time_module.perf_counter() - started:.2f}s.")
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Background job {job_id} failed: {e}", exc_info=True)
+        _finish_job(job_id, status=JOB_FAILED, error=str(e) or e.__class__.__name__)
+    return db.session.get(BackgroundJob, job_id, populate_existing=True)
+
+
+def fail_stale_jobs(timeout_seconds=None):
+    """Marks jobs left 'running' longer than the timeout (worker killed/crashed) as failed. Commits."""
+    timeout_seconds = timeout_seconds or current_app.config.get('JOB_TIMEOUT_SECONDS', DEFAULT_JOB_TIMEOUT_SECONDS)
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    count = db.session.execute(
+        update(BackgroundJob).where(
+            BackgroundJob.status == JOB_RUNNING,
+            BackgroundJob.started_at < cutoff
+        ).values(
+            status=JOB_FAILED,
+            error=f"Timed out or worker lost after {timeout_seconds} seconds.",
+            finished_at=datetime.utcnow()
+        )
+    ).rowcount
+    db.session.commit()
+    if count:
+        logging.warning(f"Marked {count} stale background job(s) as failed.")
+    return count
+
+
+def purge_finished_jobs(retention_days=None):
+    """Deletes finished jobs (and their stored results) older than the retention period. Commits."""
+    retention_days = retention_days or current_app.config.get('JOB_RESULT_RETENTION_DAYS', DEFAULT_RESULT_RETENTION_DAYS)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    count = BackgroundJob.query.filter(
+        BackgroundJob.status.in_((JOB_DONE, JOB_FAILED)),
+        BackgroundJob.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    if count:
+        logging.info(f"Purged {count} finished background job(s) older than {retention_days} days.")
+    return count
+
+
+def run_worker(poll_interval=None, once=False, worker_id=None):
+    """
+    Worker loop: claims and runs queued jobs one at a time, sleeping when idle.
+    Must be called inside an application context.
+
+    Args:
+        poll_interval (float, optional): Seconds to sleep when the queue is empty.
+        once (bool): Drain the queue and return instead of polling forever.
+        worker_id (str, optional): Recorded on claimed jobs. Defaults to host:pid.
+
+    Returns:
+        int: Number of jobs processed.
+    """
+    poll_interval = poll_interval or current_app.config.get('JOB_POLL_INTERVAL_SECONDS', DEFAULT_POLL_INTERVAL_SECONDS)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    logging.info(f"Background worker {worker_id} started (job types: {', '.join(registered_job_types())}).")
+
+    processed = 0
+    last_housekeeping = None
+    while True:
+        now = time_module.monotonic()
+        if last_housekeeping is None or now - last_housekeeping >= HOUSEKEEPING_INTERVAL_SECONDS:
+            fail_stale_jobs()
+            purge_finished_jobs()
+            last_housekeeping = now
+
+        job = claim_next_job(worker_id)
+        if job is not None:
+            run_job(job)
+            processed += 1
+            db.session.remove() # Fresh session (and identity map) per job
+            continue
+        if once:
+            break
+        time_module.sleep(poll_interval)
+    return processed
@@ -98,11 +98,24 @@ class MaintenanceTask(db.Model):
     plan_entries = db.relationship('MaintenancePlanEntry', backref='task', lazy='dynamic') # Added relationship
     is_legal_compliance = db.Column(db.Boolean, default=False, nullable=False, index=True)
 
+    # --- Derived due status, maintained by planned_maintenance/task_status.py ---
+    # Refreshed on usage log changes, job card completion and task edits;
+    # rebuild with `python manage.py rebuild-task-due-status`.
+    next_due_date = db.Column(db.DateTime, nullable=True, index=True) # Due (days) or estimated due (hours/km), naive UTC
+    next_due_usage = db.Column(db.Float, nullable=True, index=True) # Usage reading the task is due at (hours/km)
+    status_rank = db.Column(db.Integer, nullable=True, index=True) # STATE_PRIORITY at last refresh; NULL = never computed
+    # Bumped on any change to the row (incl. the derived columns above); plan regeneration
+    # skips tasks not updated since the plan was last generated.
+    updated_at = db.Column(db.DateTime, nullable=True, index=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
     # --- REMOVED explicit ForeignKeyConstraint here as it's now inline ---
     # __table_args__ = (
     #     db.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], name='fk_maintenance_task_equipment_id'),
     # )
     # --- END REMOVAL ---
+    __table_args__ = (
+        db.Index('ix_maintenance_task_legal_rank_due', 'is_legal_compliance', 'status_rank', 'next_due_date'),
+    )
 
     def __repr__(self):
         task_type = "[Legal]" if self.is_legal_compliance else "[Maint]"
@@ -121,17 +134,27 @@ class MaintenanceTask(db.Model):
             'last_performed': format_datetime_iso(self.last_performed),
             'last_performed_usage_value': self.last_performed_usage_value,
             'is_legal_compliance': self.is_legal_compliance,
+            'next_due_date': format_datetime_iso(self.next_due_date),
+            'next_due_usage': self.next_due_usage,
+            'status_rank': self.status_rank,
         }
         if include_equipment and self.equipment_ref:
             data['equipment'] = self.equipment_ref.to_dict()
         return data
 
+# JobCard.job_type values (also select the job number prefix, see planned_maintenance/job_numbers.py)
+JOB_TYPE_MAINTENANCE = 'MAINT'
+JOB_TYPE_LEGAL = 'LEGAL'
+
 class JobCard(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     job_number = db.Column(db.String(20), nullable=False, unique=True)
+    job_type = db.Column(db.String(10), nullable=False, default=JOB_TYPE_MAINTENANCE, server_default=JOB_TYPE_MAINTENANCE)
     # --- IMPORTANT: Changed equipment_id foreign key ---
     equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id', name='fk_job_card_equipment_id'), nullable=False)
     # --- END CHANGE ---
+    # Task the job card was raised for (None for ad-hoc job cards)
+    task_id = db.Column(db.Integer, db.ForeignKey('maintenance_task.id', name='fk_job_card_task_id', ondelete='SET NULL'), nullable=True)
     description = db.Column(db.Text, nullable=False)
     technician = db.Column(db.String(100))
     status = db.Column(db.String(20), default='To Do')
@@ -142,13 +165,26 @@ class JobCard(db.Model):
     end_datetime = db.Column(db.DateTime)
     comments = db.Column(db.Text, nullable=True)
     parts_used = db.relationship('JobCardPart', back_populates='job_card', lazy='dynamic', cascade='all, delete-orphan')
+    task = db.relationship('MaintenanceTask')
+
+    __table_args__ = (
+        # API listing: optional status filter, newest first (keyset on id)
+        Index('ix_job_card_status_id', 'status', 'id'),
+        # Reports/list filters: job type and status, then the due (overdue, To Do) or completion date
+        Index('ix_job_card_job_type_status_due_date', 'job_type', 'status', 'due_date'),
+        Index('ix_job_card_job_type_status_end_datetime', 'job_type', 'status', 'end_datetime'),
+        # Per-technician reports
+        Index('ix_job_card_technician_job_type_status', 'technician', 'job_type', 'status'),
+        # Task lookups: open job card for a task, plan vs. actual
+        Index('ix_job_card_task_id_status', 'task_id', 'status'),
+    )
 
     @property
     def is_legal_compliance(self):
-        """Determine if this is a legal compliance job card based on job number prefix."""
-        if self.job_number and self.job_number.startswith('LC-'):
-            return True
-        return False
+        """Determine if this is a legal compliance job card."""
+        if self.job_type is None: # Not flushed yet and created without a type
+            return bool(self.job_number and self.job_number.startswith('LC-'))
+        return self.job_type == JOB_TYPE_LEGAL
 
     @property
     def job_type_display(self):
@@ -164,6 +200,7 @@ class JobCard(db.Model):
             'id': self.id,
             'job_number': self.job_number,
             'equipment_id': self.equipment_id,
+            'task_id': self.task_id,
             'description': self.description,
             'technician': self.technician,
             'status': self.status,
@@ -173,6 +210,7 @@ class JobCard(db.Model):
             'start_datetime': format_datetime_iso(self.start_datetime),
             'end_datetime': format_datetime_iso(self.end_datetime),
             'comments': self.comments,
+            'job_type': self.job_type,
             'is_legal_compliance': self.is_legal_compliance,
             'job_type_display': self.job_type_display,
         }
@@ -186,6 +224,15 @@ class JobCard(db.Model):
              ]
         return data
 
+class JobNumberCounter(db.Model):
+    """Last job number issued per prefix (type + year, e.g. 'JC-25-'); see planned_maintenance/job_numbers.py."""
+    __tablename__ = 'job_number_counter'
+    prefix = db.Column(db.String(16), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<JobNumberCounter {self.prefix}{self.last_value:04d}>'
+
 class Checklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # --- IMPORTANT: Changed equipment_id foreign key ---
@@ -203,6 +250,11 @@ class Checklist(db.Model):
     #     db.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], name='fk_checklist_equipment_id'),
     # )
     # --- END REMOVAL ---
+    __table_args__ = (
+        # API listing (keyset on check_date, id), overall and per equipment
+        Index('ix_checklist_check_date_id', 'check_date', 'id'),
+        Index('ix_checklist_equipment_id_check_date_id', 'equipment_id', 'check_date', 'id'),
+    )
 
     def __repr__(self):
         # Updated repr to include operator
@@ -222,6 +274,21 @@ class Checklist(db.Model):
              data['equipment'] = self.equipment_ref.to_dict()
         return data
 
+
+class ChecklistDaily(db.Model):
+    """Per-equipment, per-UTC-day rollup of checklist; maintained by planned_maintenance/checklist_daily.py."""
+    __tablename__ = 'checklist_daily'
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id', name='fk_checklist_daily_equipment_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    go_count = db.Column(db.Integer, nullable=False, default=0)
+    go_but_count = db.Column(db.Integer, nullable=False, default=0)
+    no_go_count = db.Column(db.Integer, nullable=False, default=0)
+    latest_status = db.Column(db.String(20), nullable=False) # Status of the day's last checklist
+    latest_check_date = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ChecklistDaily {self.equipment_id} {self.day}: {self.latest_status}>'
+
 class Supplier(db.Model):
     __tablename__ = 'supplier'
     id = db.Column(db.Integer, primary_key=True)
@@ -345,6 +412,12 @@ class UsageLog(db.Model):
     #     db.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], name='fk_usage_log_equipment_id'),
     # )
     # --- END REMOVAL ---
+    __table_args__ = (
+        # API listing per equipment (keyset on log_date, id); the overall listing uses ix_usage_log_log_date
+        Index('ix_usage_log_equipment_id_log_date_id', 'equipment_id', 'log_date', 'id'),
+        # One reading per equipment and timestamp; also the index for neighbour seeks (usage_validation.py)
+        db.UniqueConstraint('equipment_id', 'log_date', name='uq_usage_log_equipment_id_log_date'),
+    )
 
     def __repr__(self):
         return f'<UsageLog {self.id} for Equipment ID:{self.equipment_id}>'
@@ -361,6 +434,32 @@ class UsageLog(db.Model):
              data['equipment'] = self.equipment_ref.to_dict()
         return data
 
+
+class UsageDaily(db.Model):
+    """Per-equipment, per-UTC-day rollup of usage_log; maintained by planned_maintenance/usage_daily.py."""
+    __tablename__ = 'usage_daily'
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.id', name='fk_usage_daily_equipment_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    reading_count = db.Column(db.Integer, nullable=False)
+    last_value = db.Column(db.Float, nullable=False) # Reading with the latest timestamp that day
+    last_log_date = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<UsageDaily {self.equipment_id} {self.day}: {self.last_value} ({self.reading_count})>'
+
+    def to_dict(self):
+        return {
+            'equipment_id': self.equipment_id,
+            'day': self.day.isoformat(),
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+            'reading_count': self.reading_count,
+            'last_value': self.last_value,
+            'last_log_date': format_datetime_iso(self.last_log_date),
+        }
+
 class MaintenancePlanEntry(db.Model):
     __tablename__ = 'maintenance_plan_entry'
     id = db.Column(db.Integer, primary_key=True)
@@ -383,6 +482,9 @@ class MaintenancePlanEntry(db.Model):
     __table_args__ = (
         # --- REMOVED explicit ForeignKeyConstraints here as they are now inline ---
         Index('ix_maintenance_plan_entry_year_month', 'plan_year', 'plan_month'),
+        # /api/maintenance_plan/all keyset order: newest period first, then date, equipment
+        Index('ix_maintenance_plan_entry_listing', plan_year.desc(), plan_month.desc(), planned_date, equipment_id, id),
+        db.UniqueConstraint('task_id', 'planned_date', name='uq_maintenance_plan_entry_task_id_planned_date'),
     )
 
     def __repr__(self):
@@ -413,4 +515,119 @@ class MaintenancePlanEntry(db.Model):
              }
         return data
 
-# Note: Removed the duplicate MaintenancePlanEntry class definition
\ No newline at end of file
+# Note: Removed the duplicate MaintenancePlanEntry class definition
+
+class MaintenancePlanMonth(db.Model):
+    """
+    When each plan month was last brought up to date by plan generation, even if
+    it ended up with no entries. The oldest stamp across a horizon is the point
+    after which changed tasks must be re-predicted.
+    """
+    __tablename__ = 'maintenance_plan_month'
+    plan_year = db.Column(db.Integer, primary_key=True)
+    plan_month = db.Column(db.Integer, primary_key=True)
+    generated_at = db.Column(db.DateTime, nullable=False) # Naive UTC
+
+    def __repr__(self):
+        return f'<MaintenancePlanMonth {self.plan_year}-{self.plan_month:02d} generated {self.generated_at}>'
+
+class BackgroundJob(db.Model):
+    """A unit of long-running work (plan generation, PDF rendering) executed by `manage.py run-worker`."""
+    __tablename__ = 'background_job'
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON, nullable=True) # Small JSON summary returned by the handler
+    result_data = db.Column(db.LargeBinary, nullable=True) # Downloadable output (e.g. PDF bytes)
+    result_filename = db.Column(db.String(255), nullable=True)
+    result_mimetype = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker_id = db.Column(db.String(100), nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_background_job_created_by_id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    created_by = db.relationship('User')
+
+    __table_args__ = (
+        # The worker polls for the oldest queued job
+        Index('ix_background_job_status_created_at', 'status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} {self.status}>'
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    @property
+    def has_download(self):
+        return self.status == 'done' and self.result_data is not None
+
+    def to_dict(self):
+        """Returns a dictionary representation for API usage (without the result bytes)."""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'has_download': self.has_download,
+            'result_filename': self.result_filename,
+            'created_by_id': self.created_by_id,
+            'created_at': format_datetime_iso(self.created_at),
+            'started_at': format_datetime_iso(self.started_at),
+            'finished_at': format_datetime_iso(self.finished_at),
+        }
+
+class TableVersion(db.Model):
+    """
+    Change counter per table, bumped in the same transaction as every ORM write
+    to that table (see app/table_versions.py). API ETags are derived from these
+    counters, so conditional GETs never have to read the data tables.
+    """
+    __tablename__ = 'table_version'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TableVersion {self.table_name} v{self.version}>'
+
+class ChangeLog(db.Model):
+    """
+    Captured insert/update/delete of a synced model (see app/change_feed.py),
+    served by /api/changes. Ids increase in commit order.
+    """
+    __tablename__ = 'change_log'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True) # SQLite only autoincrements INTEGER
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False) # insert, update, delete
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    data = db.Column(db.JSON, nullable=True) # Row snapshot (to_dict) after the change; null for hard deletes
+
+    __table_args__ = (
+        # /api/changes?tables=... keyset on id
+        Index('ix_change_log_table_name_id', 'table_name', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.operation} {self.table_name}:{self.row_id}>'
+
+    def to_dict(self):
+        """Returns a dictionary representation for API usage."""
+        return {
+            'id': self.id,
+            'table': self.table_name,
+            'row_id': self.row_id,
+            'operation': self.operation,
+            'changed_at': format_datetime_iso(self.changed_at),
+            'data': self.data,
+        }
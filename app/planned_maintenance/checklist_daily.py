@@ -0,0 +1,129 @@
+# tkr_system/app/planned_maintenance/checklist_daily.py
+"""
+Daily checklist rollup (`checklist_daily`): one row per equipment and UTC day
+with checklists - Go / Go But / No Go counts and the last status. Kept current
+by daily_rollups.py.
+"""
+import logging
+from datetime import date, timedelta
+from sqlalchemy import and_, case, func
+from app import db
+from app.models import Checklist, ChecklistDaily, Equipment
+from app.planned_maintenance.daily_rollups import register_daily_rollup
+
+# Checklist status -> rollup count column (other statuses only count towards latest_status)
+CHECKLIST_STATUS_COLUMNS = {'Go': 'go_count', 'Go But': 'go_but_count', 'No Go': 'no_go_count'}
+CHECKLIST_STATUSES = tuple(CHECKLIST_STATUS_COLUMNS)
+# Range the compliance view shows by default (days ending today), and the longest it returns
+CHECKLIST_COMPLIANCE_DEFAULT_DAYS = 90
+CHECKLIST_COMPLIANCE_MAX_DAYS = 366
+
+
+class _DayAggregate:
+    """Accumulates one (equipment, day) rollup row from checklists in check_date order."""
+    __slots__ = ('counts', 'latest_status', 'latest_check_date')
+
+    def __init__(self):
+        self.counts = dict.fromkeys(CHECKLIST_STATUS_COLUMNS.values(), 0)
+        self.latest_status = None
+        self.latest_check_date = None
+
+    def add(self, check_date, status):
+        column = CHECKLIST_STATUS_COLUMNS.get(status)
+        if column:
+            self.counts[column] += 1
+        self.latest_status = status
+        self.latest_check_date = check_date
+
+    def values(self):
+        return {**self.counts, 'latest_status': self.latest_status, 'latest_check_date': self.latest_check_date}
+
+
+CHECKLIST_DAILY_ROLLUP = register_daily_rollup(Checklist, Checklist.check_date, Checklist.status, ChecklistDaily, _DayAggregate)
+
+
+def parse_compliance_range(start_arg, end_arg, today):
+    """
+    (first_day, last_day) from ISO date arguments; a missing end is today, a
+    missing start CHECKLIST_COMPLIANCE_DEFAULT_DAYS before the end.
+
+    Raises:
+        ValueError: Unparseable dates, start after end, or a range longer
+            than CHECKLIST_COMPLIANCE_MAX_DAYS.
+    """
+    try:
+        last_day = date.fromisoformat(end_arg) if end_arg else today
+        first_day = date.fromisoformat(start_arg) if start_arg else last_day - timedelta(days=CHECKLIST_COMPLIANCE_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+    if first_day > last_day:
+        raise ValueError("Start date must not be after the end date.")
+    if (last_day - first_day).days + 1 > CHECKLIST_COMPLIANCE_MAX_DAYS:
+        raise ValueError(f"Date range too long; at most {CHECKLIST_COMPLIANCE_MAX_DAYS} days.")
+    return first_day, last_day
+
+
+def compliance_equipment(equipment_type=None):
+    """Equipment the compliance view covers: operational and checklist_required, by code."""
+    query = Equipment.query.filter(Equipment.checklist_required == True, Equipment.status == 'Operational')
+    if equipment_type:
+        query = query.filter(Equipment.type == equipment_type)
+    return query.order_by(Equipment.code).all()
+
+
+def get_checklist_compliance(equipment_list, first_day, last_day):
+    """
+    Compact compliance payload of the equipment between first_day and
+    last_day (inclusive), for the heatmap and the API.
+
+    Returns:
+        dict: 'start', 'end', 'days' (length of the range), 'statuses'
+              (CHECKLIST_STATUSES), 'equipment' (one entry per item with its
+              totals: days_checked, go, go_but, no_go, no_go_days) and
+              'cells': [equipment index, day offset, go, go_but, no_go,
+              index of the day's latest status in 'statuses' or -1].
+    """
+    days = (last_day - first_day).days + 1
+    payload = {
+        'start': first_day.isoformat(), 'end': last_day.isoformat(), 'days': days,
+        'statuses': list(CHECKLIST_STATUSES), 'equipment': [], 'cells': [],
+    }
+    if not equipment_list:
+        return payload
+    index_of = {eq.id: i for i, eq in enumerate(equipment_list)}
+    in_range = and_(
+        ChecklistDaily.equipment_id.in_(list(index_of)),
+        ChecklistDaily.day >= first_day,
+        ChecklistDaily.day <= last_day,
+    )
+
+    totals = {
+        equipment_id: (days_checked, int(go), int(go_but), int(no_go), int(no_go_days))
+        for equipment_id, days_checked, go, go_but, no_go, no_go_days in db.session.query(
+            ChecklistDaily.equipment_id,
+            func.count(),
+            func.sum(ChecklistDaily.go_count),
+            func.sum(ChecklistDaily.go_but_count),
+            func.sum(ChecklistDaily.no_go_count),
+            func.sum(case((ChecklistDaily.no_go_count > 0, 1), else_=0)),
+        ).filter(in_range).group_by(ChecklistDaily.equipment_id)
+    }
+
+    for eq in equipment_list:
+        days_checked, go, go_but, no_go, no_go_days = totals.get(eq.id, (0, 0, 0, 0, 0))
+        payload['equipment'].append({
+            'id': eq.id, 'code': eq.code, 'name': eq.name, 'type': eq.type,
+            'days_checked': days_checked, 'go': go, 'go_but': go_but, 'no_go': no_go, 'no_go_days': no_go_days,
+        })
+
+    status_index = {status: i for i, status in enumerate(CHECKLIST_STATUSES)}
+    for row in db.session.query(
+        ChecklistDaily.equipment_id, ChecklistDaily.day, ChecklistDaily.go_count,
+        ChecklistDaily.go_but_count, ChecklistDaily.no_go_count, ChecklistDaily.latest_status,
+    ).filter(in_range).order_by(ChecklistDaily.equipment_id, ChecklistDaily.day):
+        payload['cells'].append([
+            index_of[row.equipment_id], (row.day - first_day).days,
+            row.go_count, row.go_but_count, row.no_go_count, status_index.get(row.latest_status, -1),
+        ])
+    logging.debug(f"Checklist compliance: {len(equipment_list)} equipment, {days} day(s), {len(payload['cells'])} cell(s).")
+    return payload
@@ -0,0 +1,198 @@
+# tkr_system/app/planned_maintenance/daily_rollups.py
+"""
+Per-equipment, per-UTC-day rollup tables kept in step with a log table
+(usage_daily from usage_log, checklist_daily from checklist).
+
+A rollup is registered with register_daily_rollup(): the log model, its
+date and value columns, the rollup model (primary key equipment_id, day)
+and an aggregate class. The aggregate is fed a day's (log date, value)
+pairs in log order through add() and returns the rollup row's remaining
+columns from values().
+
+One after_flush listener serves every rollup: the (equipment, day) pairs
+touched by flushed inserts, edits and deletes are recomputed from the log
+table (one range query per rollup and flush) and updated, inserted or
+removed in the same transaction, so readers in the same request already
+see them. Writes that bypass the ORM flush are not seen; rebuild the
+rollup after those (rebuild-usage-daily / rebuild-checklist-daily).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, delete, event, inspect, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+from app import db
+from app.planned_maintenance.loaders import _to_naive_utc
+from app.table_versions import table_exists
+
+DEFAULT_REBUILD_BATCH_SIZE = 1000
+
+_rollups = []
+
+
+class DailyRollup:
+    """
+    One registered rollup (see register_daily_rollup).
+
+    Attributes:
+        log_model: Mapped log class (e.g. UsageLog).
+        date_key (str): Name of the log's timestamp column.
+        value_key (str): Name of the log column fed to the aggregate.
+        rollup_table (Table): The rollup table.
+        aggregate_class: Per-day accumulator with add(log_date, value) and values().
+    """
+    __slots__ = ('log_model', 'log_table', 'date_key', 'value_key', 'rollup_table', 'aggregate_class')
+
+    def __init__(self, log_model, date_column, value_column, rollup_model, aggregate_class):
+        self.log_model = log_model
+        self.log_table = log_model.__table__
+        self.date_key = date_column.key
+        self.value_key = value_column.key
+        self.rollup_table = rollup_model.__table__
+        self.aggregate_class = aggregate_class
+
+    def _log_select(self):
+        columns = self.log_table.c
+        return select(columns.equipment_id, columns[self.date_key], columns[self.value_key])
+
+    def refresh_days(self, connection, pairs):
+        """
+        Recomputes the rollup rows of `pairs` ({(equipment_id, day)}) from the
+        log table on `connection`: one read of the touched days, then the
+        changed rows are updated, inserted or deleted.
+        """
+        if not pairs:
+            return
+        log_date = self.log_table.c[self.date_key]
+        days_by_equipment = defaultdict(list)
+        for equipment_id, day in pairs:
+            days_by_equipment[equipment_id].append(day)
+        ranges = [
+            and_(
+                self.log_table.c.equipment_id == equipment_id,
+                log_date >= datetime.combine(min(days), time.min),
+                log_date < datetime.combine(max(days) + timedelta(days=1), time.min),
+            )
+            for equipment_id, days in days_by_equipment.items()
+        ]
+        aggregates = defaultdict(self.aggregate_class)
+        for equipment_id, logged_at, value in connection.execute(
+            self._log_select().where(or_(*ranges)).order_by(log_date, self.log_table.c.id)
+        ):
+            logged_at = _to_naive_utc(logged_at)
+            aggregates[(equipment_id, logged_at.date())].add(logged_at, value)
+
+        rollup = self.rollup_table
+        existing = set(connection.execute(
+            select(rollup.c.equipment_id, rollup.c.day)
+            .where(tuple_(rollup.c.equipment_id, rollup.c.day).in_(list(pairs)))
+        ).tuples())
+        emptied = [pair for pair in pairs if pair in existing and pair not in aggregates]
+        inserts = []
+        for pair in pairs:
+            aggregate = aggregates.get(pair)
+            if aggregate is None:
+                continue
+            if pair in existing:
+                connection.execute(
+                    update(rollup)
+                    .where(rollup.c.equipment_id == pair[0], rollup.c.day == pair[1])
+                    .values(**aggregate.values())
+                )
+            else:
+                inserts.append({'equipment_id': pair[0], 'day': pair[1], **aggregate.values()})
+        if inserts:
+            connection.execute(insert(rollup), inserts)
+        if emptied:
+            connection.execute(
+                delete(rollup).where(tuple_(rollup.c.equipment_id, rollup.c.day).in_(emptied))
+            )
+
+    def rebuild(self, batch_size=DEFAULT_REBUILD_BATCH_SIZE):
+        """
+        Rebuilds the whole rollup from the log table in one transaction,
+        streaming the logs per equipment and inserting `batch_size` rows at a
+        time. Commits.
+
+        Returns:
+            int: Rollup rows written.
+        """
+        connection = db.session.connection()
+        connection.execute(delete(self.rollup_table))
+        rows = connection.execute(
+            self._log_select().order_by(self.log_table.c.equipment_id, self.log_table.c[self.date_key], self.log_table.c.id),
+            execution_options={'stream_results': True, 'yield_per': batch_size},
+        )
+        written = 0
+        pending = []
+        current_key, aggregate = None, None
+        for equipment_id, logged_at, value in rows:
+            logged_at = _to_naive_utc(logged_at)
+            key = (equipment_id, logged_at.date())
+            if key != current_key:
+                if aggregate is not None:
+                    pending.append({'equipment_id': current_key[0], 'day': current_key[1], **aggregate.values()})
+                current_key, aggregate = key, self.aggregate_class()
+            aggregate.add(logged_at, value)
+            if len(pending) >= batch_size:
+                connection.execute(insert(self.rollup_table), pending)
+                written += len(pending)
+                pending = []
+        if aggregate is not None:
+            pending.append({'equipment_id': current_key[0], 'day': current_key[1], **aggregate.values()})
+        if pending:
+            connection.execute(insert(self.rollup_table), pending)
+            written += len(pending)
+        db.session.commit()
+        logging.info(f"Rebuilt {self.rollup_table.name}: {written} row(s).")
+        return written
+
+    def touched_days(self, obj):
+        """(equipment_id, day) pairs a flushed log affects: its old and new position."""
+        state = inspect(obj)
+        equipment_ids = [v for v in state.attrs.equipment_id.history.sum() if v is not None] or [obj.equipment_id]
+        log_dates = [v for v in state.attrs[self.date_key].history.sum() if v is not None] or [getattr(obj, self.date_key)]
+        return {(eq_id, _to_naive_utc(log_date).date()) for eq_id in equipment_ids for log_date in log_dates}
+
+
+def register_daily_rollup(log_model, date_column, value_column, rollup_model, aggregate_class):
+    """
+    Registers a rollup of `log_model` into `rollup_model`, kept current from
+    after_flush. Call once, at import of the rollup's module.
+
+    Returns:
+        DailyRollup
+    """
+    rollup = DailyRollup(log_model, date_column, value_column, rollup_model, aggregate_class)
+    # Load the old value when these are reassigned on an expired object, so the
+    # flush history still names the day the row moved away from
+    for attribute in (log_model.equipment_id, date_column):
+        event.listen(attribute, 'set', _keep_old_value, active_history=True)
+    _rollups.append(rollup)
+    return rollup
+
+
+# --- Session events ---
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_after_flush(session, flush_context):
+    if not _rollups:
+        return
+    pairs_by_rollup = defaultdict(set)
+    flushed = [(obj, True) for obj in session.new] + [(obj, True) for obj in session.deleted]
+    flushed += [(obj, False) for obj in session.dirty] # Dirty only counts if a column actually changed
+    for obj, changed in flushed:
+        for rollup in _rollups:
+            if isinstance(obj, rollup.log_model) and (changed or session.is_modified(obj, include_collections=False)):
+                pairs_by_rollup[rollup] |= rollup.touched_days(obj)
+    if not pairs_by_rollup:
+        return
+    connection = session.connection()
+    for rollup, pairs in pairs_by_rollup.items():
+        if table_exists(connection, rollup.rollup_table.name):
+            rollup.refresh_days(connection, pairs)
+            logging.debug(f"Refreshed {len(pairs)} {rollup.rollup_table.name} row(s).")
@@ -0,0 +1,117 @@
+# tkr_system/app/planned_maintenance/job_card_metrics.py
+"""
+Job card report metrics (compute_job_card_metrics: named counters over a
+filtered JobCard query, in one aggregate query) and filter facets
+(get_facets: cached until their tables' version counters move).
+"""
+import logging
+import threading
+from datetime import datetime, time
+from sqlalchemy import and_, case, func
+from app import db
+from app.models import Equipment, JobCard
+from app.table_versions import get_table_versions
+
+CLOSED_JOB_CARD_STATUSES = ('Done', 'Deleted')
+
+
+def job_card_counters(today, completed_start, completed_end):
+    """
+    The report dashboard's counters as {name: SQL condition}.
+
+    Args:
+        today (date): Job cards due before this day are overdue.
+        completed_start, completed_end (datetime): Period of the 'completed_in_period' counter.
+    """
+    overdue_threshold = datetime.combine(today, time.min)
+    return {
+        'todo': JobCard.status == 'To Do',
+        'in_progress': JobCard.status == 'In Progress',
+        'overdue': and_(JobCard.due_date < overdue_threshold, JobCard.status.notin_(CLOSED_JOB_CARD_STATUSES)),
+        'completed_in_period': and_(
+            JobCard.status == 'Done',
+            JobCard.end_datetime >= completed_start,
+            JobCard.end_datetime <= completed_end,
+        ),
+    }
+
+
+def _count_where(condition, dialect_name):
+    if dialect_name in ('postgresql', 'sqlite'):
+        return func.count().filter(condition)
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_job_card_metrics(query, counters):
+    """
+    Evaluates `counters` ({name: condition}) over the rows of `query` (a
+    JobCard query with any joins and filters applied) in one query.
+
+    Returns:
+        dict: {name: int}.
+    """
+    if not counters:
+        return {}
+    dialect_name = db.session.get_bind().dialect.name
+    row = query.order_by(None).with_entities(*[
+        _count_where(condition, dialect_name).label(name) for name, condition in counters.items()
+    ]).one()
+    return {name: int(row[i] or 0) for i, name in enumerate(counters)}
+
+
+# --- Facets ---
+
+def _load_equipment_types():
+    rows = db.session.query(Equipment.type).distinct().order_by(Equipment.type)
+    return [equipment_type for (equipment_type,) in rows if equipment_type]
+
+
+def _load_technicians():
+    rows = db.session.query(JobCard.technician).distinct().order_by(JobCard.technician)
+    return [technician for (technician,) in rows if technician and technician.strip()]
+
+
+# {facet name: (models the values are read from, loader)}
+FACETS = {
+    'equipment_types': ((Equipment,), _load_equipment_types),
+    'technicians': ((JobCard,), _load_technicians),
+}
+
+_facet_cache = {} # {(engine url, facet name): (table versions, values)}
+_facet_cache_lock = threading.Lock()
+
+
+def get_facets(*names):
+    """
+    Returns {name: sorted list of values} for the requested FACETS, from the
+    cache unless their tables changed (one table_version query for all).
+    Without the table_version table every call reloads.
+    """
+    tables = {name: sorted(model.__table__.name for model in FACETS[name][0]) for name in names}
+    try:
+        versions = get_table_versions({table for table_names in tables.values() for table in table_names})
+    except Exception as e:
+        logging.warning(f"Could not read table versions for facets: {e}")
+        db.session.rollback()
+        versions = None
+
+    engine_url = str(db.engine.url)
+    facets = {}
+    for name in names:
+        loader = FACETS[name][1]
+        if versions is None:
+            facets[name] = loader()
+            continue
+        key = (engine_url, name)
+        facet_versions = [versions[table] for table in tables[name]]
+        with _facet_cache_lock:
+            cached = _facet_cache.get(key)
+        if cached and cached[0] == facet_versions:
+            facets[name] = cached[1]
+            continue
+        values = loader()
+        with _facet_cache_lock:
+            _facet_cache[key] = (facet_versions, values)
+        facets[name] = values
+        logging.debug(f"Reloaded facet '{name}' ({len(values)} values).")
+    return facets
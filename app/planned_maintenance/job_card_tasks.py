@@ -0,0 +1,85 @@
+# tkr_system/app/planned_maintenance/job_card_tasks.py
+"""
+Linking job cards to the maintenance task they were raised for.
+
+Job cards created from a task carry JobCard.task_id. Older job cards were
+only related to their task by equipment and an identical description;
+link_job_cards_to_tasks() (CLI: flask link-job-card-tasks) fills in task_id
+for those, and match_task_by_description() is the fallback for any still
+unlinked when they are completed. find_open_job_card() applies the same
+fallback the other way round, before a new job card is raised for a task.
+"""
+import logging
+import time
+from collections import defaultdict
+from app import db
+from app.models import JobCard, MaintenanceTask
+from app.planned_maintenance.job_card_metrics import CLOSED_JOB_CARD_STATUSES
+
+
+def match_task_by_description(job_card):
+    """The task on the job card's equipment with exactly its description, or None."""
+    return MaintenanceTask.query.filter_by(
+        equipment_id=job_card.equipment_id,
+        description=job_card.description
+    ).order_by(MaintenanceTask.id).first()
+
+
+def find_open_job_card(task):
+    """
+    An open job card for the task: one linked by task_id, else an unlinked
+    (older) one on the task's equipment with exactly its description. None if
+    neither exists.
+    """
+    open_cards = JobCard.query.filter(JobCard.status.notin_(CLOSED_JOB_CARD_STATUSES))
+    linked = open_cards.filter(JobCard.task_id == task.id).order_by(JobCard.id).first()
+    if linked is not None:
+        return linked
+    return open_cards.filter(
+        JobCard.task_id.is_(None),
+        JobCard.equipment_id == task.equipment_id,
+        JobCard.description == task.description
+    ).order_by(JobCard.id).first()
+
+
+def link_job_cards_to_tasks(batch_size=500):
+    """
+    Sets task_id on job cards without one, where exactly one task on the same
+    equipment has the job card's description. Commits every `batch_size` job
+    cards.
+
+    Returns:
+        dict: 'scanned', 'linked', 'ambiguous' (several tasks match),
+              'unmatched' (no task matches) and 'seconds'.
+    """
+    started = time.monotonic()
+    tasks_by_key = defaultdict(list)
+    for task_id, equipment_id, description in db.session.query(
+        MaintenanceTask.id, MaintenanceTask.equipment_id, MaintenanceTask.description
+    ):
+        tasks_by_key[(equipment_id, description)].append(task_id)
+
+    result = {'scanned': 0, 'linked': 0, 'ambiguous': 0, 'unmatched': 0}
+    last_id = 0
+    while True:
+        batch = JobCard.query.filter(
+            JobCard.task_id.is_(None), JobCard.id > last_id
+        ).order_by(JobCard.id).limit(batch_size).all()
+        if not batch:
+            break
+        for job_card in batch:
+            candidates = tasks_by_key.get((job_card.equipment_id, job_card.description), [])
+            if len(candidates) == 1:
+                job_card.task_id = candidates[0]
+                result['linked'] += 1
+            elif candidates:
+                result['ambiguous'] += 1
+                logging.warning(f"Job Card {job_card.job_number} matches {len(candidates)} tasks; left unlinked.")
+            else:
+                result['unmatched'] += 1
+        result['scanned'] += len(batch)
+        db.session.commit()
+        last_id = batch[-1].id
+    result['seconds'] = time.monotonic() - started
+    logging.info(f"Linked {result['linked']} of {result['scanned']} unlinked job card(s) to tasks.")
+    return result
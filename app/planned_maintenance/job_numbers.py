@@ -0,0 +1,83 @@
+# tkr_system/app/planned_maintenance/job_numbers.py
+"""
+Job number allocation ("JC-25-0042", "LC-25-0007") from one counter row per
+prefix in `job_number_counter`, seeded from existing job cards on first use.
+"""
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import insert, select, update
+from app import db
+from app.models import JobCard, JobNumberCounter, JOB_TYPE_MAINTENANCE, JOB_TYPE_LEGAL
+
+JOB_NUMBER_PREFIXES = {JOB_TYPE_MAINTENANCE: 'JC', JOB_TYPE_LEGAL: 'LC'} # Job Card (maintenance), Legal Compliance
+COUNTERS_TABLE = JobNumberCounter.__table__
+
+
+def job_number_prefix(job_type='MAINT', when=None):
+    """'JC-25-' / 'LC-25-' for the job type and the (UTC) year of `when` (default now)."""
+    job_type = (job_type or 'MAINT').upper()
+    if job_type not in JOB_NUMBER_PREFIXES:
+        logging.warning(f"Invalid job_type '{job_type}'. Defaulting to 'MAINT'.")
+        job_type = 'MAINT'
+    year = (when or datetime.now(timezone.utc)).strftime('%y')
+    return f"{JOB_NUMBER_PREFIXES[job_type]}-{year}-"
+
+
+def _highest_issued(prefix):
+    """Highest sequence number among existing job numbers with `prefix` (0 if none)."""
+    highest = 0
+    for job_number in db.session.scalars(select(JobCard.job_number).where(JobCard.job_number.like(f"{prefix}%"))):
+        try:
+            highest = max(highest, int(job_number[len(prefix):]))
+        except ValueError:
+            logging.warning(f"Ignoring job number '{job_number}' with an unparseable sequence part.")
+    return highest
+
+
+def _increment(connection, prefix):
+    """Next value of the counter (row locked until commit), or None if it does not exist yet."""
+    counter = COUNTERS_TABLE.c
+    if connection.dialect.update_returning:
+        return connection.execute(
+            update(COUNTERS_TABLE).where(counter.prefix == prefix)
+            .values(last_value=counter.last_value + 1).returning(counter.last_value)
+        ).scalar()
+    current = connection.execute(
+        select(counter.last_value).where(counter.prefix == prefix).with_for_update()
+    ).scalar()
+    if current is None:
+        return None
+    connection.execute(update(COUNTERS_TABLE).where(counter.prefix == prefix).values(last_value=current + 1))
+    return current + 1
+
+
+def _create_counter(connection, prefix, last_value):
+    """Creates the counter row unless a concurrent transaction just did."""
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        connection.execute(upsert(COUNTERS_TABLE).values(prefix=prefix, last_value=last_value).on_conflict_do_nothing())
+    else:
+        connection.execute(insert(COUNTERS_TABLE).values(prefix=prefix, last_value=last_value))
+
+
+def allocate_job_number(job_type='MAINT'):
+    """
+    Issues the next job number for the job type ('MAINT' or 'LEGAL') in the
+    current transaction. Commit (or roll back) soon after: the prefix's
+    counter stays locked until then.
+
+    Returns:
+        str: e.g. "JC-25-0001" or "LC-25-0001".
+    """
+    prefix = job_number_prefix(job_type)
+    connection = db.session.connection()
+    value = _increment(connection, prefix)
+    if value is None:
+        _create_counter(connection, prefix, _highest_issued(prefix))
+        value = _increment(connection, prefix)
+        logging.info(f"Started job number counter for prefix {prefix}.")
+    return f"{prefix}{value:04d}"
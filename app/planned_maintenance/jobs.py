@@ -0,0 +1,52 @@
+# tkr_system/app/planned_maintenance/jobs.py
+# Background job handlers for planned maintenance (see app/jobs.py).
+from datetime import date
+from app.jobs import job_handler
+from app.planned_maintenance.plan_generation import generate_plan_horizon
+from app.planned_maintenance.plan_pdf import build_maintenance_plan_pdf, plan_pdf_filename
+
+JOB_GENERATE_PLAN = 'generate_plan'
+JOB_PLAN_PDF = 'plan_pdf'
+
+
+def plan_period_label(year, month, months=1):
+    """'April 2026' or 'April 2026 to March 2027'."""
+    label = date(year, month, 1).strftime("%B %Y")
+    if months > 1:
+        last_index = year * 12 + month - 1 + months - 1
+        label += f" to {date(last_index // 12, last_index % 12 + 1, 1).strftime('%B %Y')}"
+    return label
+
+
+@job_handler(JOB_GENERATE_PLAN)
+def generate_plan_job(year, month, months=1, full=False):
+    result = generate_plan_horizon(year, month, months, full=full)
+    message = (f"Maintenance plan for {plan_period_label(year, month, months)} generated/updated successfully "
+               f"({result['entries']} entries; {result['inserted']} added, {result['updated']} updated, "
+               f"{result['deleted']} removed; {result['tasks_skipped']} of {result['tasks']} tasks unchanged; "
+               f"{result['seconds']:.2f}s).")
+    return {'result': {
+        'message': message,
+        'entries': result['entries'],
+        'inserted': result['inserted'],
+        'updated': result['updated'],
+        'deleted': result['deleted'],
+        'tasks': result['tasks'],
+        'tasks_skipped': result['tasks_skipped'],
+        'seconds': result['seconds'],
+        'entries_per_month': [
+            {'year': y, 'month': m, 'entries': count}
+            for (y, m), count in result['entries_per_month'].items()
+        ],
+    }}
+
+
+@job_handler(JOB_PLAN_PDF)
+def plan_pdf_job(year, month):
+    pdf_file = build_maintenance_plan_pdf(year, month)
+    return {
+        'result': {'message': f"PDF for {plan_period_label(year, month)} is ready ({len(pdf_file) // 1024} KB)."},
+        'data': pdf_file,
+        'filename': plan_pdf_filename(year, month),
+        'mimetype': 'application/pdf',
+    }
@@ -0,0 +1,87 @@
+# tkr_system/app/planned_maintenance/loaders.py
+import logging
+from datetime import timezone
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import UsageLog, Checklist
+
+
+def _to_naive_utc(dt):
+    """Converts an aware datetime to naive UTC. Naive values are returned unchanged."""
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _dialect_name():
+    """Returns the name of the SQL dialect the session is bound to (e.g. 'postgresql', 'sqlite')."""
+    return db.session.get_bind().dialect.name
+
+
+def _latest_rows_by_equipment(model, date_column, equipment_ids):
+    """
+    Fetches the most recent row of `model` for each equipment id in a single query.
+
+    On PostgreSQL this uses DISTINCT ON (equipment_id) with an index-friendly
+    ORDER BY. Other databases (SQLite) fall back to a correlated MAX() subquery.
+
+    Returns:
+        dict: {equipment_id: model_instance}
+    """
+    if not equipment_ids:
+        return {}
+    equipment_ids = list(set(equipment_ids))
+    date_attr = getattr(model, date_column)
+
+    if _dialect_name() == 'postgresql':
+        rows = model.query.filter(
+            model.equipment_id.in_(equipment_ids)
+        ).distinct(
+            model.equipment_id
+        ).order_by(
+            model.equipment_id, date_attr.desc(), model.id.desc()
+        ).all()
+    else:
+        inner = aliased(model)
+        latest_date = select(
+            func.max(getattr(inner, date_column))
+        ).where(
+            inner.equipment_id == model.equipment_id
+        ).correlate(model).scalar_subquery()
+
+        rows = model.query.filter(
+            model.equipment_id.in_(equipment_ids),
+            date_attr == latest_date
+        ).order_by(model.equipment_id, model.id).all()
+
+    latest = {}
+    for row in rows:
+        # Ties on the same timestamp keep the highest id (last one written)
+        latest[row.equipment_id] = row
+    return latest
+
+
+def load_latest_usage_logs(equipment_ids):
+    """Returns {equipment_id: latest UsageLog} for the given equipment ids."""
+    return _latest_rows_by_equipment(UsageLog, 'log_date', equipment_ids)
+
+
+def load_latest_checklists(equipment_ids):
+    """Returns {equipment_id: latest Checklist} for the given equipment ids."""
+    return _latest_rows_by_equipment(Checklist, 'check_date', equipment_ids)
+
+
+def attach_latest_logs(equipment_list):
+    """
+    Sets `latest_usage` and `latest_checklist` on every equipment object in
+    the list, with one query for each.
+    """
+    equipment_ids = [eq.id for eq in equipment_list]
+    latest_usage = load_latest_usage_logs(equipment_ids)
+    latest_checklists = load_latest_checklists(equipment_ids)
+    logging.debug(f"Loaded latest usage for {len(latest_usage)} and latest checklist for {len(latest_checklists)} of {len(equipment_ids)} equipment.")
+    for eq in equipment_list:
+        eq.latest_usage = latest_usage.get(eq.id)
+        eq.latest_checklist = latest_checklists.get(eq.id)
+    return equipment_list
@@ -0,0 +1,89 @@
+# tkr_system/app/planned_maintenance/missing_checklists.py
+"""
+Operational, checklist_required equipment without a checklist in a period
+(dashboard panel, GET /api/checklists/missing and the shift report).
+"""
+import logging
+from datetime import datetime, time, timedelta
+from sqlalchemy import exists, func, select
+from app import db
+from app.models import Checklist, Equipment
+from app.planned_maintenance.loaders import _to_naive_utc
+
+# period name -> (first day, last day) relative to today
+MISSING_CHECKLIST_PERIODS = {
+    'today': lambda today: (today, today),
+    'yesterday': lambda today: (today - timedelta(days=1), today - timedelta(days=1)),
+    'week': lambda today: (today - timedelta(days=today.weekday()), today), # Since Monday
+}
+MISSING_CHECKLIST_PERIOD_LABELS = {'today': 'Today', 'yesterday': 'Yesterday', 'week': 'This Week'}
+MISSING_CHECKLIST_MAX_DAYS = 31
+
+
+class MissingChecklist:
+    """
+    One machine without a checklist in the period.
+
+    Attributes:
+        equipment (Equipment): The machine.
+        last_check_date (datetime|None): Naive UTC time of its last checklist ever, None if never checked.
+    """
+    __slots__ = ('equipment', 'last_check_date')
+
+    def __init__(self, equipment, last_check_date):
+        self.equipment = equipment
+        self.last_check_date = last_check_date
+
+    def to_dict(self):
+        return {
+            'equipment_id': self.equipment.id,
+            'code': self.equipment.code,
+            'name': self.equipment.name,
+            'type': self.equipment.type,
+            'last_check_date': self.last_check_date.isoformat() if self.last_check_date else None,
+        }
+
+
+def missing_checklist_range(period, today):
+    """
+    (first_day, last_day) of a named period (MISSING_CHECKLIST_PERIODS).
+
+    Raises:
+        ValueError: Unknown period.
+    """
+    if period not in MISSING_CHECKLIST_PERIODS:
+        raise ValueError(f"Invalid period '{period}'. Use one of: {', '.join(MISSING_CHECKLIST_PERIODS)}.")
+    return MISSING_CHECKLIST_PERIODS[period](today)
+
+
+def find_missing_checklists(first_day, last_day, equipment_type=None):
+    """
+    Operational, checklist_required equipment with no checklist between
+    first_day and last_day (inclusive, UTC days), by type and code, in one
+    query.
+
+    Returns:
+        list[MissingChecklist]
+    """
+    checked_in_period = exists().where(
+        Checklist.equipment_id == Equipment.id,
+        Checklist.check_date >= datetime.combine(first_day, time.min),
+        Checklist.check_date < datetime.combine(last_day + timedelta(days=1), time.min),
+    )
+    last_check_date = select(func.max(Checklist.check_date)).where(
+        Checklist.equipment_id == Equipment.id
+    ).correlate(Equipment).scalar_subquery()
+
+    query = db.session.query(Equipment, last_check_date.label('last_check_date')).filter(
+        Equipment.checklist_required == True,
+        Equipment.status == 'Operational',
+        ~checked_in_period,
+    )
+    if equipment_type:
+        query = query.filter(Equipment.type == equipment_type)
+    missing = [
+        MissingChecklist(equipment, _to_naive_utc(checked_at) if checked_at else None)
+        for equipment, checked_at in query.order_by(Equipment.type, Equipment.code)
+    ]
+    logging.debug(f"Missing checklists {first_day} - {last_day}: {len(missing)} machine(s).")
+    return missing
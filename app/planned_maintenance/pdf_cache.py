@@ -0,0 +1,93 @@
+# tkr_system/app/planned_maintenance/pdf_cache.py
+# On-disk cache of rendered PDFs, addressed by a hash of everything that went into them.
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from flask import current_app
+
+PDF_CACHE_DIRNAME = 'pdf_cache'
+DEFAULT_PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+def cache_key(*parts):
+    """SHA-256 hex digest of the JSON encoding of `parts` (dates etc. via str())."""
+    encoded = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def cache_dir():
+    """<instance folder>/pdf_cache, created on first use."""
+    path = os.path.join(current_app.instance_path, PDF_CACHE_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _path_for(key):
+    return os.path.join(cache_dir(), f"{key}.pdf")
+
+
+def get_cached_pdf(key):
+    """
+    Returns the file path of the cached PDF for `key`, or None on a miss.
+    A hit refreshes the file's mtime, which eviction uses as "last used".
+    """
+    path = _path_for(key)
+    try:
+        os.utime(path, None)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def store_pdf(key, data):
+    """Writes the PDF atomically (temp file + rename), evicts if over budget, returns the path."""
+    path = _path_for(key)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logging.debug(f"Stored PDF {key[:12]} ({len(data)} bytes) in cache.")
+    evict_pdfs(keep=path)
+    return path
+
+
+def evict_pdfs(max_bytes=None, keep=None):
+    """
+    Deletes least recently used PDFs until the cache is within max_bytes
+    (config PDF_CACHE_MAX_BYTES). Returns the number of files removed.
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config.get('PDF_CACHE_MAX_BYTES', DEFAULT_PDF_CACHE_MAX_BYTES)
+    entries = []
+    total = 0
+    with os.scandir(cache_dir()) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.endswith('.pdf'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass # Another worker evicted it first
+        total -= size
+        removed += 1
+    logging.info(f"Evicted {removed} cached PDF(s); cache now {total} bytes.")
+    return removed
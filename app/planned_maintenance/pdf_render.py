@@ -0,0 +1,129 @@
+# tkr_system/app/planned_maintenance/pdf_render.py
+"""
+HTML-to-PDF rendering in separate processes, each under an address-space
+limit and a timeout. The HTML comes in chunks that are laid out separately
+and joined into one PDF.
+"""
+import logging
+import multiprocessing
+import threading
+import time as time_module
+from flask import current_app
+
+try:
+    import resource # POSIX only
+except ImportError:
+    resource = None
+
+DEFAULT_RENDER_PROCESSES = 2
+DEFAULT_RENDER_TIMEOUT_SECONDS = 300
+DEFAULT_RENDER_MEMORY_LIMIT_MB = 1024
+DEFAULT_CHUNK_ROWS = 40
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+class PdfRenderError(RuntimeError):
+    """The renderer failed, ran out of its memory budget, or timed out."""
+
+
+def _render_chunks(html_chunks, base_url):
+    """Lays out each chunk separately and writes all pages as one PDF."""
+    from weasyprint import HTML
+    documents = [HTML(string=html, base_url=base_url).render() for html in html_chunks]
+    pages = [page for document in documents for page in document.pages]
+    return documents[0].copy(pages).write_pdf()
+
+
+def _render_child(html_chunks, base_url, memory_limit_mb, conn):
+    """Child process entry point: sends ('ok', pdf_bytes) or ('error', message)."""
+    try:
+        if resource is not None and memory_limit_mb:
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        conn.send(('ok', _render_chunks(html_chunks, base_url)))
+    except MemoryError:
+        conn.send(('error', f"PDF render exceeded its memory budget ({memory_limit_mb} MB)."))
+    except Exception as e:
+        conn.send(('error', f"PDF render failed: {e.__class__.__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _render_slots(processes):
+    """Process-wide semaphore bounding concurrent render processes."""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(processes)
+        return _slots
+
+
+def _mp_context():
+    # fork starts fastest (weasyprint is already imported); spawn where fork is unavailable
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def render_pdf(html_chunks, base_url=None):
+    """
+    Renders HTML chunks into a single PDF in a child process.
+
+    Limits come from config: PDF_RENDER_PROCESSES (0 renders in the calling
+    process, without limits), PDF_RENDER_TIMEOUT_SECONDS and
+    PDF_RENDER_MEMORY_LIMIT_MB.
+
+    Args:
+        html_chunks (list[str]): HTML documents; their pages appear in order.
+        base_url (str, optional): Base URL for relative links/resources.
+
+    Returns:
+        bytes: The PDF document.
+    Raises:
+        PdfRenderError: On render failure, memory budget or timeout.
+    """
+    if not html_chunks:
+        raise PdfRenderError("Nothing to render.")
+    config = current_app.config
+    processes = config.get('PDF_RENDER_PROCESSES', DEFAULT_RENDER_PROCESSES)
+    timeout = config.get('PDF_RENDER_TIMEOUT_SECONDS', DEFAULT_RENDER_TIMEOUT_SECONDS)
+    memory_limit_mb = config.get('PDF_RENDER_MEMORY_LIMIT_MB', DEFAULT_RENDER_MEMORY_LIMIT_MB)
+    started = time_module.perf_counter()
+
+    if not processes:
+        pdf_file = _render_chunks(html_chunks, base_url)
+        logging.debug(f"Rendered {len(html_chunks)} chunk(s) in-process in {time_module.perf_counter() - started:.2f}s.")
+        return pdf_file
+
+    slots = _render_slots(processes)
+    if not slots.acquire(timeout=timeout):
+        raise PdfRenderError(f"No PDF render slot became free within {timeout} seconds.")
+    try:
+        context = _mp_context()
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_render_child, args=(html_chunks, base_url, memory_limit_mb, child_conn),
+                                  name='pdf-render', daemon=True)
+        process.start()
+        child_conn.close() # Parent keeps only the reading end, so EOF is seen if the child dies
+
+        remaining = timeout - (time_module.perf_counter() - started)
+        if not parent_conn.poll(max(remaining, 0)):
+            process.terminate()
+            process.join(5)
+            raise PdfRenderError(f"PDF render timed out after {timeout} seconds.")
+        try:
+            status, payload = parent_conn.recv()
+        except EOFError:
+            process.join(5)
+            raise PdfRenderError(f"PDF render process exited unexpectedly (exit code {process.exitcode}).")
+        finally:
+            parent_conn.close()
+        process.join(5)
+    finally:
+        slots.release()
+
+    if status != 'ok':
+        raise PdfRenderError(payload)
+    logging.info(f"Rendered {len(html_chunks)} chunk(s) to {len(payload)} bytes in {time_module.perf_counter() - started:.2f}s.")
+    return payload
@@ -0,0 +1,378 @@
+# tkr_system/app/planned_maintenance/plan_generation.py
+import logging
+import math
+import time as time_module
+from datetime import datetime, timedelta, date, time
+from calendar import monthrange
+from collections import defaultdict
+from sqlalchemy import insert, update, and_, or_
+from app import db
+from app.models import MaintenanceTask, MaintenancePlanEntry, MaintenancePlanMonth
+from app.planned_maintenance.task_status import (
+    calculate_task_statuses, DueState, USAGE_INTERVAL_TYPES, _to_naive_utc
+)
+
+# --- Optional NumPy for usage projection ---
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    logging.info("NumPy not found. Usage-based plan prediction will use the pure Python path.")
+# --- End NumPy ---
+
+MAX_PLAN_HORIZON_MONTHS = 24
+INSERT_BATCH_SIZE = 1000
+# Safety cap on projected occurrences per task (very high rate vs. a tiny interval)
+MAX_USAGE_OCCURRENCES_PER_TASK = 1000
+
+
+def _projectable(status):
+    """True when a usage-based status carries everything needed to project crossings."""
+    return (status is not None
+            and status.interval_type in USAGE_INTERVAL_TYPES
+            and not status.is_first
+            and status.state != DueState.ERROR
+            and status.remaining is not None
+            and status.usage_rate is not None
+            and status.interval_value)
+
+
+def _usage_offsets_python(remaining, interval, rate, lo_days, hi_days):
+    """Days from now of every crossing remaining + j*interval (j >= 0) with offset in (0, hi_days), offset >= lo_days."""
+    j_lo = max(0, math.ceil((max(lo_days, 0.0) * rate - remaining) / interval))
+    j_hi = min(math.floor((hi_days * rate - remaining) / interval), j_lo + MAX_USAGE_OCCURRENCES_PER_TASK - 1)
+    offsets = []
+    for j in range(j_lo, j_hi + 1):
+        offset = (remaining + j * interval) / rate
+        if offset > 0:
+            offsets.append(offset)
+    return offsets
+
+
+def predict_usage_due_dates(statuses, start_date, end_date, current_time=None):
+    """
+    Projects every usage-based due date of the given tasks inside a date range.
+
+    For each hours/km task the meter is assumed to keep running at the equipment's
+    average daily usage (TaskDueStatus.usage_rate). The task falls due each time the
+    meter crosses last_performed_usage_value + k * interval_value, so a short-interval
+    task can appear several times in a month. Crossings already behind the current
+    reading are not planned (they show up as overdue instead).
+
+    All tasks are projected together with NumPy when it is installed; otherwise a
+    pure Python loop produces the same dates.
+
+    Args:
+        statuses (iterable): TaskDueStatus objects (from calculate_task_statuses).
+            Tasks that cannot be projected (first service, no rate, days-based) are skipped.
+        start_date (date): Start of the range (inclusive).
+        end_date (date): End of the range (inclusive).
+        current_time (datetime, optional): Reference time (naive UTC). Defaults to now.
+
+    Returns:
+        dict: {task_id: [date, ...]} in ascending order, only for tasks with dates in range.
+    """
+    current_time = _to_naive_utc(current_time) or datetime.utcnow()
+    if isinstance(start_date, datetime): start_date = start_date.date()
+    if isinstance(end_date, datetime): end_date = end_date.date()
+
+    projectable = [s for s in statuses if _projectable(s)]
+    if not projectable or end_date < start_date:
+        return {}
+
+    # Range bounds as (fractional) days from current_time; dates are re-checked after conversion
+    lo_days = (datetime.combine(start_date, time.min) - current_time).total_seconds() / 86400
+    hi_days = (datetime.combine(end_date + timedelta(days=1), time.min) - current_time).total_seconds() / 86400
+    if hi_days <= 0:
+        return {}
+
+    result = defaultdict(list)
+    if NUMPY_AVAILABLE:
+        task_ids = np.array([s.task_id for s in projectable])
+        remaining = np.array([s.remaining for s in projectable], dtype=float)
+        interval = np.array([s.interval_value for s in projectable], dtype=float)
+        rate = np.array([s.usage_rate for s in projectable], dtype=float)
+
+        # Crossing j (0 = next due) is (remaining + j*interval) / rate days away
+        j_lo = np.maximum(0, np.ceil((max(lo_days, 0.0) * rate - remaining) / interval))
+        j_hi = np.floor((hi_days * rate - remaining) / interval)
+        counts = np.clip(j_hi - j_lo + 1, 0, MAX_USAGE_OCCURRENCES_PER_TASK).astype(np.int64)
+        if counts.sum() == 0:
+            return {}
+
+        # One row per (task, crossing): repeat each task and number its crossings
+        idx = np.repeat(np.arange(len(projectable)), counts)
+        starts = np.cumsum(counts) - counts
+        j = j_lo[idx] + (np.arange(idx.size) - np.repeat(starts, counts))
+        offsets = (remaining[idx] + j * interval[idx]) / rate[idx]
+        keep = offsets > 0
+        idx, offsets = idx[keep], offsets[keep]
+
+        due = (np.datetime64(current_time, 'us') + np.round(offsets * 86400e6).astype('timedelta64[us]')).astype('datetime64[D]')
+        in_range = (due >= np.datetime64(start_date, 'D')) & (due <= np.datetime64(end_date, 'D'))
+        for task_id, due_date_val in zip(task_ids[idx[in_range]].tolist(), due[in_range].tolist()):
+            result[task_id].append(due_date_val)
+    else:
+        for s in projectable:
+            for offset in _usage_offsets_python(s.remaining, s.interval_value, s.usage_rate, lo_days, hi_days):
+                due_date_val = (current_time + timedelta(days=offset)).date()
+                if start_date <= due_date_val <= end_date:
+                    result[s.task_id].append(due_date_val)
+
+    logging.debug(f"Projected usage due dates for {len(result)} of {len(projectable)} usage-based tasks "
+                  f"between {start_date} and {end_date} (numpy={NUMPY_AVAILABLE}).")
+    return dict(result)
+
+
+def predict_task_due_dates_in_range(task, start_date, end_date, due_status=None, current_time=None):
+    """
+    Predicts specific dates a task might be due within a given date range.
+
+    Args:
+        task (MaintenanceTask): The task object.
+        start_date (date): The start date of the planning period (inclusive).
+        end_date (date): The end date of the planning period (inclusive).
+        due_status (TaskDueStatus, optional): Precomputed status for this task
+            from calculate_task_statuses. Computed on demand if omitted.
+        current_time (datetime, optional): Reference time (naive UTC). Defaults to now.
+
+    Returns:
+        list: A list of date objects when the task is predicted to be due
+              within the range. Returns an empty list if prediction isn't
+              possible or no due dates fall within the range.
+    """
+    due_dates = []
+    current_time = _to_naive_utc(current_time) or datetime.utcnow() # Use consistent naive UTC
+
+    # --- Ensure dates are naive for comparison ---
+    if isinstance(start_date, datetime): start_date = start_date.date()
+    if isinstance(end_date, datetime): end_date = end_date.date()
+
+    last_performed_dt = _to_naive_utc(task.last_performed)
+
+    # --- DAYS BASED TASKS ---
+    if task.interval_type == 'days':
+        if not last_performed_dt:
+            # Cannot predict accurately if never performed based on days
+            logging.debug(f"Task {task.id} ('days') never performed, cannot predict for plan.")
+            return []
+
+        next_due = last_performed_dt # Start from last performed
+        while True:
+            # Calculate the next potential due date
+            next_due = next_due + timedelta(days=task.interval_value)
+            next_due_date_only = next_due.date() # Compare dates only
+
+            # Stop if we've gone past the planning period
+            if next_due_date_only > end_date:
+                break
+
+            # Add if it falls within the planning period
+            if next_due_date_only >= start_date:
+                due_dates.append(next_due_date_only)
+
+        logging.debug(f"Task {task.id} ('days'): Predicted due dates in range: {due_dates}")
+        return due_dates
+
+    # --- HOURS/KM BASED TASKS (Estimation) ---
+    elif task.interval_type in USAGE_INTERVAL_TYPES:
+        # Projected from the equipment's average daily usage; every crossing of
+        # last_performed_usage_value + k * interval_value inside the range counts.
+        try:
+            if due_status is None:
+                due_status = calculate_task_statuses([task], current_time)[task.id]
+
+            if not _projectable(due_status):
+                # No usage rate, first service or error state - cannot plot reliably
+                logging.debug(f"Task {task.id} ('{task.interval_type}'): Cannot project usage ({due_status!r}). Skipping for plan.")
+                return []
+
+            due_dates = predict_usage_due_dates([due_status], start_date, end_date, current_time).get(task.id, [])
+            logging.debug(f"Task {task.id} ('{task.interval_type}'): Estimated due dates in range: {due_dates}")
+            return due_dates
+
+        except Exception as calc_err:
+            logging.error(f"Error calculating status for Task {task.id} during planning: {calc_err}", exc_info=True)
+            return []
+
+    else: # Unknown interval type
+        logging.warning(f"Task {task.id}: Unknown interval type '{task.interval_type}' for planning.")
+        return []
+
+
+def plan_months(start_year, start_month, months):
+    """Returns [(year, month), ...] for `months` consecutive months starting at start_year/start_month."""
+    result = []
+    year, month = start_year, start_month
+    for _ in range(months):
+        result.append((year, month))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return result
+
+
+# Entry columns compared when diffing desired against stored entries
+_DIFF_COLUMNS = ('equipment_id', 'task_description', 'interval_type', 'is_estimate', 'plan_year', 'plan_month')
+
+
+def _month_filter(month_list, model=MaintenancePlanEntry):
+    return or_(*[
+        and_(model.plan_year == y, model.plan_month == m)
+        for y, m in month_list
+    ])
+
+
+def generate_plan_horizon(start_year, start_month, months=1, current_time=None, full=False):
+    """
+    Brings the maintenance plan for a run of consecutive months up to date.
+
+    Rather than deleting and reinserting, the desired entry set is computed and
+    diffed against the stored entries (keyed by task and planned date); only the
+    resulting inserts, updates and deletes are written, in a single transaction,
+    so readers never see a partially built plan. Commits on success.
+
+    A 'days' task is only re-predicted if it changed (MaintenanceTask.updated_at)
+    after the plan was last generated - the oldest MaintenancePlanMonth stamp
+    across the horizon. Hours/km tasks are always re-predicted: their dates are
+    projected from the current usage rate, which moves with new usage logs and
+    with the generation time. Every horizon month is stamped on success,
+    including months left without entries. A month never generated, or
+    full=True, re-predicts every task. Entries whose task no longer exists are
+    always removed.
+
+    Args:
+        start_year (int), start_month (int): First month of the horizon.
+        months (int): Number of months (1..MAX_PLAN_HORIZON_MONTHS).
+        current_time (datetime, optional): Reference time (naive UTC).
+        full (bool): Re-predict all tasks regardless of updated_at.
+
+    Returns:
+        dict: {'months': [(year, month), ...], 'tasks': int, 'tasks_skipped': int,
+               'entries': int, 'inserted': int, 'updated': int, 'deleted': int,
+               'entries_per_month': {(year, month): int}, 'seconds': float}
+    """
+    if not (1 <= months <= MAX_PLAN_HORIZON_MONTHS):
+        raise ValueError(f"Plan horizon must be between 1 and {MAX_PLAN_HORIZON_MONTHS} months.")
+
+    started = time_module.perf_counter()
+    generation_time = _to_naive_utc(current_time) or datetime.utcnow()
+    month_list = plan_months(start_year, start_month, months)
+    horizon_start = date(month_list[0][0], month_list[0][1], 1)
+    last_year, last_month = month_list[-1]
+    horizon_end = date(last_year, last_month, monthrange(last_year, last_month)[1])
+    logging.info(f"Generating plan for {months} month(s): {horizon_start} to {horizon_end} (full={full})")
+
+    try:
+        # 1. Stored entries for the horizon and the per-month generation stamps
+        existing_entries = MaintenancePlanEntry.query.filter(_month_filter(month_list)).all()
+        month_stamps = {
+            (stamp.plan_year, stamp.plan_month): stamp
+            for stamp in MaintenancePlanMonth.query.filter(_month_filter(month_list, MaintenancePlanMonth))
+        }
+        since = None
+        if not full and len(month_stamps) == len(month_list):
+            since = min(_to_naive_utc(stamp.generated_at) for stamp in month_stamps.values())
+
+        # 2. Tasks to re-predict: usage-based ones and those changed since the watermark (or all)
+        all_tasks = MaintenanceTask.query.all()
+        all_task_ids = {task.id for task in all_tasks}
+        if since is None:
+            changed_tasks = all_tasks
+        else:
+            changed_tasks = [
+                t for t in all_tasks
+                if t.interval_type in USAGE_INTERVAL_TYPES or t.updated_at is None or _to_naive_utc(t.updated_at) > since
+            ]
+        changed_task_ids = {task.id for task in changed_tasks}
+        logging.debug(f"Plan generation: {len(changed_tasks)} of {len(all_tasks)} tasks changed since {since}.")
+
+        # 3. Desired entries for the changed tasks, keyed by (task_id, planned_date)
+        task_statuses = calculate_task_statuses(changed_tasks, generation_time)
+        # Usage-based tasks are projected in one pass; days-based ones per task
+        usage_dates = predict_usage_due_dates(task_statuses.values(), horizon_start, horizon_end, generation_time)
+        desired = {}
+        for task in changed_tasks:
+            if task.interval_type in USAGE_INTERVAL_TYPES:
+                predicted_dates = usage_dates.get(task.id, [])
+            else:
+                predicted_dates = predict_task_due_dates_in_range(task, horizon_start, horizon_end,
+                                                                  due_status=task_statuses.get(task.id),
+                                                                  current_time=generation_time)
+            is_estimate_flag = task.interval_type in USAGE_INTERVAL_TYPES # Mark estimates
+            for due_date_val in predicted_dates:
+                desired[(task.id, due_date_val)] = {
+                    'equipment_id': task.equipment_id,
+                    'task_description': task.description,
+                    'planned_date': due_date_val,
+                    'interval_type': task.interval_type,
+                    'is_estimate': is_estimate_flag,
+                    'generated_at': generation_time,
+                    'plan_year': due_date_val.year,
+                    'plan_month': due_date_val.month,
+                    'task_id': task.id,
+                }
+
+        # 4. Diff against stored entries ((task_id, planned_date) is unique)
+        delete_ids, update_rows = [], []
+        seen_keys = set()
+        for entry in existing_entries:
+            if entry.task_id is None or entry.task_id not in all_task_ids:
+                delete_ids.append(entry.id) # Orphaned (task deleted)
+                continue
+            if entry.task_id not in changed_task_ids:
+                continue # Unchanged task: keep as is
+            key = (entry.task_id, entry.planned_date)
+            wanted = desired.get(key)
+            if wanted is None:
+                delete_ids.append(entry.id) # No longer predicted
+                continue
+            seen_keys.add(key)
+            if any(getattr(entry, col) != wanted[col] for col in _DIFF_COLUMNS):
+                update_rows.append(dict(wanted, id=entry.id))
+        insert_rows = [row for key, row in desired.items() if key not in seen_keys]
+
+        # Entry counts per month after the change
+        entries_per_month = defaultdict(int)
+        deleted_set = set(delete_ids)
+        for entry in existing_entries:
+            if entry.id not in deleted_set and (entry.task_id not in changed_task_ids or (entry.task_id, entry.planned_date) in seen_keys):
+                entries_per_month[(entry.plan_year, entry.plan_month)] += 1
+        for row in insert_rows:
+            entries_per_month[(row['plan_year'], row['plan_month'])] += 1
+
+        # 5. Apply only the changes
+        for batch_start in range(0, len(delete_ids), INSERT_BATCH_SIZE):
+            MaintenancePlanEntry.query.filter(
+                MaintenancePlanEntry.id.in_(delete_ids[batch_start:batch_start + INSERT_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+        if update_rows:
+            db.session.execute(update(MaintenancePlanEntry), update_rows) # Bulk UPDATE by primary key
+        for batch_start in range(0, len(insert_rows), INSERT_BATCH_SIZE):
+            db.session.execute(insert(MaintenancePlanEntry), insert_rows[batch_start:batch_start + INSERT_BATCH_SIZE])
+        for ym in month_list:
+            if ym in month_stamps:
+                month_stamps[ym].generated_at = generation_time
+            else:
+                db.session.add(MaintenancePlanMonth(plan_year=ym[0], plan_month=ym[1], generated_at=generation_time))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time_module.perf_counter() - started
+    logging.info(f"Plan generation done: {len(changed_tasks)}/{len(all_tasks)} tasks evaluated, "
+                 f"{len(insert_rows)} inserted, {len(update_rows)} updated, {len(delete_ids)} deleted in {elapsed:.2f}s.")
+    return {
+        'months': month_list,
+        'tasks': len(all_tasks),
+        'tasks_skipped': len(all_tasks) - len(changed_tasks),
+        'entries': sum(entries_per_month.values()),
+        'inserted': len(insert_rows),
+        'updated': len(update_rows),
+        'deleted': len(delete_ids),
+        'entries_per_month': {ym: entries_per_month.get(ym, 0) for ym in month_list},
+        'seconds': elapsed,
+    }
@@ -0,0 +1,172 @@
+# tkr_system/app/planned_maintenance/plan_pdf.py
+import hashlib
+import logging
+from datetime import date, timedelta, timezone
+from calendar import monthrange
+from flask import render_template, current_app
+from app import db
+from app.models import Equipment, MaintenancePlanEntry
+from app.planned_maintenance.pdf_cache import cache_key, get_cached_pdf, store_pdf
+from app.planned_maintenance.pdf_render import render_pdf, DEFAULT_CHUNK_ROWS
+
+# --- PDF Generation ---
+try:
+    import weasyprint # Used by the render processes (pdf_render.py)
+    WEASYPRINT_AVAILABLE = True
+except ImportError:
+    WEASYPRINT_AVAILABLE = False
+    logging.warning("WeasyPrint not found. PDF generation will be disabled.")
+# --- End PDF Generation ---
+
+PLAN_PDF_TEMPLATE = 'maintenance_plan_pdf.html'
+# Bump to invalidate every cached plan PDF when rendering changes outside the template
+PLAN_PDF_RENDER_VERSION = 1
+
+_template_digests = {}
+
+
+def plan_pdf_filename(year, month):
+    return f"maintenance_plan_{year}_{month:02d}.pdf"
+
+
+def _template_version():
+    """Digest of the PDF template source, so editing the template invalidates cached PDFs."""
+    env = current_app.jinja_env
+    source, filename, _ = env.loader.get_source(env, PLAN_PDF_TEMPLATE)
+    digest = _template_digests.get(filename)
+    if digest is None or digest[0] != source:
+        digest = (source, hashlib.sha256(source.encode('utf-8')).hexdigest()[:16])
+        _template_digests[filename] = digest
+    return f"{PLAN_PDF_RENDER_VERSION}:{digest[1]}"
+
+
+class PlanPdfSource:
+    """
+    Everything the plan PDF of one month is rendered from, loaded in two queries.
+
+    `key` addresses the rendered output: it changes whenever the plan entries,
+    the equipment shown, or the template change, and is used as the cache key
+    and the HTTP ETag. `last_modified` is the newest entry's generated_at (UTC).
+    """
+
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        plan_start_date = date(year, month, 1) # ValueError for an invalid month
+        days_in_month = monthrange(year, month)[1]
+        self.month_name = plan_start_date.strftime("%B %Y")
+        self.dates_in_month = [plan_start_date + timedelta(days=d) for d in range(days_in_month)]
+        self.filters = {} # Reserved for row filters (e.g. equipment type); part of the key
+
+        # 1. Equipment rows
+        self.equipment_list = Equipment.query.order_by(Equipment.code).all()
+
+        # 2. Stored plan entries for the month (plain columns, no ORM objects)
+        entry_rows = db.session.query(
+            MaintenancePlanEntry.equipment_id,
+            MaintenancePlanEntry.planned_date,
+            MaintenancePlanEntry.task_description,
+            MaintenancePlanEntry.is_estimate,
+            MaintenancePlanEntry.generated_at,
+        ).filter(
+            MaintenancePlanEntry.plan_year == year,
+            MaintenancePlanEntry.plan_month == month
+        ).order_by(
+            MaintenancePlanEntry.equipment_id,
+            MaintenancePlanEntry.planned_date,
+            MaintenancePlanEntry.id
+        ).all()
+        logging.debug(f"Plan PDF source {year}-{month}: {len(self.equipment_list)} equipment, {len(entry_rows)} entries.")
+
+        self.plan_data = {} # {eq_id: {date_obj: [task_label1, task_label2]}}
+        generated = [row.generated_at for row in entry_rows if row.generated_at]
+        self.latest_generated_at = max(generated) if generated else None
+        for row in entry_rows:
+            task_label = row.task_description + (" (Est.)" if row.is_estimate else "")
+            self.plan_data.setdefault(row.equipment_id, {}).setdefault(row.planned_date, []).append(task_label)
+
+        if self.latest_generated_at:
+            self.generation_info = f"Plan generated on: {self.latest_generated_at.strftime('%Y-%m-%d %H:%M:%S UTC')}"
+        else:
+            self.generation_info = "Plan not generated for this period."
+
+        # Content address: every input of the render
+        self.key = cache_key(
+            'maintenance_plan', year, month, self.filters, self.latest_generated_at, _template_version(),
+            [(eq.id, eq.code) for eq in self.equipment_list],
+            [(row.equipment_id, row.planned_date, row.task_description, row.is_estimate) for row in entry_rows],
+        )
+
+    @property
+    def last_modified(self):
+        if self.latest_generated_at is None:
+            return None
+        if self.latest_generated_at.tzinfo is None:
+            return self.latest_generated_at.replace(tzinfo=timezone.utc)
+        return self.latest_generated_at
+
+    @property
+    def filename(self):
+        return plan_pdf_filename(self.year, self.month)
+
+    def cached_path(self):
+        """Path of the cached PDF for this exact content, or None."""
+        return get_cached_pdf(self.key)
+
+    def render_html_chunks(self, chunk_rows):
+        """
+        The plan as a list of HTML documents of at most `chunk_rows` equipment
+        rows each, rendered and joined page by page (see pdf_render.py).
+        """
+        total = len(self.equipment_list)
+        starts = range(0, total, chunk_rows) if total else [0]
+        chunks = []
+        for start in starts:
+            equipment_chunk = self.equipment_list[start:start + chunk_rows]
+            rows_label = f"equipment {start + 1}-{start + len(equipment_chunk)} of {total}" if total else "no equipment"
+            chunks.append(render_template(
+                PLAN_PDF_TEMPLATE,
+                title=f"Maintenance Plan - {self.month_name}",
+                month_name=self.month_name,
+                equipment_list=equipment_chunk,
+                equipment_total=total,
+                footer_text=f"{self.month_name} - {rows_label}",
+                dates_in_month=self.dates_in_month,
+                plan_data=self.plan_data,
+                generation_info=self.generation_info,
+            ))
+        return chunks
+
+
+def build_maintenance_plan_pdf(year, month):
+    """
+    Returns the maintenance plan PDF of one month, from the on-disk cache when
+    the plan, equipment and template are unchanged, otherwise rendered with
+    WeasyPrint and stored in the cache.
+
+    Needs an application context; the job runner provides one when called
+    from the worker. Rendering happens in a child process (pdf_render.py).
+
+    Returns:
+        bytes: The PDF document.
+    Raises:
+        RuntimeError: If a render is needed and WeasyPrint is not available.
+        PdfRenderError: If the render fails, times out or exceeds its memory budget.
+        ValueError: If year/month do not form a valid date.
+    """
+    source = PlanPdfSource(year, month)
+    cached = source.cached_path()
+    if cached:
+        logging.info(f"Plan PDF {source.month_name}: cache hit ({source.key[:12]}).")
+        with open(cached, 'rb') as cached_file:
+            return cached_file.read()
+
+    if not WEASYPRINT_AVAILABLE:
+        raise RuntimeError("PDF generation library (WeasyPrint) is not installed or configured correctly.")
+
+    chunk_rows = current_app.config.get('PDF_RENDER_CHUNK_ROWS', DEFAULT_CHUNK_ROWS)
+    html_chunks = source.render_html_chunks(chunk_rows)
+    logging.info(f"Generating PDF for plan: {source.month_name} ({len(source.equipment_list)} equipment, {len(html_chunks)} chunk(s))")
+    pdf_file = render_pdf(html_chunks) # Separate, resource-limited process
+    store_pdf(source.key, pdf_file)
+    return pdf_file
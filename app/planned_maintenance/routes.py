@@ -1,7 +1,7 @@
 
 import logging
 # Corrected Flask imports
-from flask import render_template, request, redirect, url_for, flash, make_response, session, jsonify
+from flask import render_template, request, redirect, url_for, flash, make_response, session, jsonify, send_file
 from flask_login import login_required, current_user
 from urllib.parse import urlencode
 # Corrected datetime imports
@@ -15,12 +15,36 @@ from app.planned_maintenance import bp
 from app import db
 from sqlalchemy import cast, Date # Add Date cast
 from app.forms import ChecklistEditForm, UsageLogEditForm 
+from app.planned_maintenance.loaders import attach_latest_logs, _to_naive_utc
+from app.planned_maintenance.task_status import (
+    calculate_task_statuses, DueState, STATE_PRIORITY, ACTIONABLE_STATES,
+    STATE_FILTERS, STATE_BY_PRIORITY, refresh_task_due_columns, due_state_filter, equipment_min_ranks
+)
+
+from app.planned_maintenance.plan_generation import MAX_PLAN_HORIZON_MONTHS
+from app.planned_maintenance.jobs import JOB_GENERATE_PLAN, JOB_PLAN_PDF, plan_period_label
+from app.planned_maintenance.usage_validation import UsageReading, validate_usage_reading, insert_usage_logs
+from app.planned_maintenance.job_numbers import allocate_job_number
+from app.planned_maintenance.job_card_tasks import match_task_by_description, find_open_job_card
+from app.planned_maintenance.job_card_metrics import compute_job_card_metrics, job_card_counters, get_facets
+from app.planned_maintenance.usage_daily import get_usage_days, get_usage_history
+from app.planned_maintenance.missing_checklists import (
+    MISSING_CHECKLIST_PERIOD_LABELS, find_missing_checklists, missing_checklist_range
+)
+from app.planned_maintenance.checklist_daily import (
+    CHECKLIST_COMPLIANCE_MAX_DAYS, compliance_equipment, get_checklist_compliance, parse_compliance_range
+)
+from app.jobs import submit_job, jobs_enabled
+from app.api.etags import conditional_on
+
+TASKS_PER_PAGE = 50 # Task list pagination (tasks, not equipment groups)
 
 from app.models import (
     User,
     Equipment, JobCard, Checklist, StockTransaction,
     JobCardPart, Part, MaintenanceTask, UsageLog,
-    MaintenancePlanEntry # <-- Added import
+    MaintenancePlanEntry, # <-- Added import
+    BackgroundJob, JOB_TYPE_MAINTENANCE, JOB_TYPE_LEGAL
 )
 from itertools import zip_longest
 # Corrected SQLAlchemy imports (added extract)
@@ -28,14 +52,8 @@ from sqlalchemy import desc, func, extract, and_, or_
 import traceback
 from collections import defaultdict
 
-# --- PDF Generation (Ensure this is near the top, after imports) ---
-try:
-    from weasyprint import HTML # <-- Define HTML here
-    WEASYPRINT_AVAILABLE = True
-except ImportError:
-    WEASYPRINT_AVAILABLE = False
-    HTML = None # Define HTML as None if import fails
-    logging.warning("WeasyPrint not found. PDF generation will be disabled.")
+# --- PDF Generation (WeasyPrint is optional; see plan_pdf.py) ---
+from app.planned_maintenance.plan_pdf import WEASYPRINT_AVAILABLE, PlanPdfSource, build_maintenance_plan_pdf
 # --- End PDF Generation ---
 
 # --- Configure Logging (add this near the top) ---
@@ -46,10 +64,18 @@ logging.basicConfig(level=logging.DEBUG,
                     datefmt='%Y-%m-%d %H:%M:%S')
 
 # --- Planned Maintenance Routes ---
-DUE_SOON_ESTIMATED_DAYS_THRESHOLD = 7
 EQUIPMENT_STATUSES = ['Operational', 'At OEM', 'Sold', 'Broken Down', 'Under Repair', 'Awaiting Spares']
 JOB_CARD_STATUSES = ['To Do', 'In Progress', 'Done', 'Deleted']
-MAX_REASONABLE_DAILY_USAGE_INCREASE = 500
+JOB_TYPE_FILTERS = {'Maintenance': JOB_TYPE_MAINTENANCE, 'Legal': JOB_TYPE_LEGAL} # Report/list filter -> JobCard.job_type
+
+def job_cards_by_task(*job_card_lists):
+    """{task_id: job card} for plan vs. actual; the first linked job card wins, so pass completed ones first."""
+    by_task = {}
+    for job_cards in job_card_lists:
+        for jc in job_cards:
+            if jc.task_id is not None:
+                by_task.setdefault(jc.task_id, jc)
+    return by_task
 
 def generate_whatsapp_share_url(job_card):
     """Generates a WhatsApp share URL for a given job card."""
@@ -89,99 +115,6 @@ def generate_whatsapp_share_url(job_card):
         logging.error(f"Error generating WhatsApp URL for JC {getattr(job_card, 'id', 'N/A')}: {e}", exc_info=True)
         return None
 
-def predict_task_due_dates_in_range(task, start_date, end_date):
-    """
-    Predicts specific dates a task might be due within a given date range.
-
-    Args:
-        task (MaintenanceTask): The task object.
-        start_date (date): The start date of the planning period (inclusive).
-        end_date (date): The end date of the planning period (inclusive).
-
-    Returns:
-        list: A list of date objects when the task is predicted to be due
-              within the range. Returns an empty list if prediction isn't
-              possible or no due dates fall within the range.
-    """
-    due_dates = []
-    current_time = datetime.utcnow() # Use consistent naive UTC
-
-    # --- Ensure dates are naive for comparison ---
-    if isinstance(start_date, datetime): start_date = start_date.date()
-    if isinstance(end_date, datetime): end_date = end_date.date()
-
-    # --- Timezone handling for last_performed ---
-    last_performed_dt = task.last_performed
-    if last_performed_dt and last_performed_dt.tzinfo is not None:
-        last_performed_dt = last_performed_dt.astimezone(timezone.utc).replace(tzinfo=None)
-
-    # --- DAYS BASED TASKS ---
-    if task.interval_type == 'days':
-        if not last_performed_dt:
-            # Cannot predict accurately if never performed based on days
-            logging.debug(f"Task {task.id} ('days') never performed, cannot predict for plan.")
-            return []
-
-        next_due = last_performed_dt # Start from last performed
-        while True:
-            # Calculate the next potential due date
-            next_due = next_due + timedelta(days=task.interval_value)
-            next_due_date_only = next_due.date() # Compare dates only
-
-            # Stop if we've gone past the planning period
-            if next_due_date_only > end_date:
-                break
-
-            # Add if it falls within the planning period
-            if next_due_date_only >= start_date:
-                due_dates.append(next_due_date_only)
-
-        logging.debug(f"Task {task.id} ('days'): Predicted due dates in range: {due_dates}")
-        return due_dates
-
-    # --- HOURS/KM BASED TASKS (Estimation) ---
-    elif task.interval_type in ['hours', 'km']:
-        # We use the *estimated* days until due from calculate_task_due_status
-        # This is an approximation for planning purposes.
-        try:
-            status, due_info, calc_due_date, lp_info, nd_info, est_days_info = \
-                calculate_task_due_status(task, current_time) # Use naive UTC
-
-            # We only plot if the task is NOT overdue and has an estimated days calculation
-            if status != "Overdue" and est_days_info and "~" in est_days_info and "days" in est_days_info:
-                 # Extract the numeric part of the estimate
-                 try:
-                      # Find number like "~5.2 days" or "~10 days"
-                      numeric_part = ''.join(filter(lambda x: x.isdigit() or x == '.', est_days_info.split('~')[-1].split(' ')[0]))
-                      estimated_days_until = float(numeric_part)
-
-                      # Calculate the estimated due date based on *today*
-                      estimated_due_date = (current_time + timedelta(days=estimated_days_until)).date()
-
-                      # If this single estimated date falls within the range, add it
-                      if start_date <= estimated_due_date <= end_date:
-                           logging.debug(f"Task {task.id} ('{task.interval_type}'): Estimated due date {estimated_due_date} falls in range.")
-                           # NOTE: We only add ONE estimated date for usage-based tasks in this simplified model
-                           return [estimated_due_date]
-                      else:
-                           logging.debug(f"Task {task.id} ('{task.interval_type}'): Estimated due date {estimated_due_date} OUTSIDE range.")
-                           return []
-                 except (ValueError, IndexError) as parse_err:
-                      logging.warning(f"Task {task.id} ('{task.interval_type}'): Could not parse estimated days from '{est_days_info}': {parse_err}")
-                      return []
-            else:
-                # Cannot reliably estimate or it's already overdue (handled elsewhere)
-                 logging.debug(f"Task {task.id} ('{task.interval_type}'): Cannot estimate days or is overdue/error state ('{status}', '{est_days_info}'). Skipping for plan.")
-                 return []
-
-        except Exception as calc_err:
-            logging.error(f"Error calculating status for Task {task.id} during planning: {calc_err}", exc_info=True)
-            return []
-
-    else: # Unknown interval type
-        logging.warning(f"Task {task.id}: Unknown interval type '{task.interval_type}' for planning.")
-        return []
-
 # ==============================================================================
 # === Maintenance Plan Generation Route ===
 # ==============================================================================
@@ -211,58 +144,24 @@ def generate_maintenance_plan():
             flash(f"Invalid year or month selected: {ve}", "warning")
             return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
 
-        # Calculate Date Range for the selected month
-        try:
-            plan_start_date = date(year, month, 1)
-            days_in_month = monthrange(year, month)[1]
-            plan_end_date = date(year, month, days_in_month)
-            month_name_full = plan_start_date.strftime("%B %Y")
-        except ValueError:
-             flash(f"Invalid date combination for {month}/{year}.", "danger")
-             return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
-
-        logging.info(f"Generating plan for {month_name_full} ({plan_start_date} to {plan_end_date})")
-
-        # 1. Clear existing entries for this month/year
-        logging.debug(f"Deleting existing plan entries for {year}-{month}...")
-        deleted_count = MaintenancePlanEntry.query.filter_by(plan_year=year, plan_month=month).delete()
-        db.session.commit() # Commit deletion before adding new ones
-        logging.debug(f"Deleted {deleted_count} existing entries.")
-
-        # 2. Fetch Tasks
-        all_tasks = MaintenanceTask.query.all()
-        generation_time = datetime.utcnow()
-        new_entries_count = 0
-
-        # 3. Predict and Save New Entries
-        for task in all_tasks:
-            predicted_dates = predict_task_due_dates_in_range(task, plan_start_date, plan_end_date)
-
-            if predicted_dates:
-                 is_estimate_flag = task.interval_type in ['hours', 'km'] # Mark estimates
-                 for due_date_val in predicted_dates: # Renamed variable to avoid clash
-                     entry = MaintenancePlanEntry(
-                         equipment_id=task.equipment_id,
-                         task_description=task.description, # Store description
-                         planned_date=due_date_val,             # Store the specific date
-                         interval_type=task.interval_type,  # Store type at generation
-                         is_estimate=is_estimate_flag,
-                         generated_at=generation_time,
-                         plan_year=year,
-                         plan_month=month,
-                         task_id=task.id # Link back to original task
-                     )
-                     db.session.add(entry)
-                     new_entries_count += 1
-
-        # 4. Commit new entries
-        db.session.commit()
-        logging.info(f"Successfully generated plan for {month_name_full}. Added {new_entries_count} entries.")
-        flash(f"Maintenance plan for {month_name_full} generated/updated successfully ({new_entries_count} entries).", "success")
+        # Number of consecutive months to generate, starting at year/month
+        months = request.form.get('months', 1, type=int) or 1
+        if not (1 <= months <= MAX_PLAN_HORIZON_MONTHS):
+            flash(f"Plan horizon must be between 1 and {MAX_PLAN_HORIZON_MONTHS} months.", "warning")
+            return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
+
+        logging.info(f"Queueing plan generation for {months} month(s) starting {date(year, month, 1).strftime('%B %Y')}")
+
+        # Runs in the background worker: only tasks changed since the last generation
+        # are re-predicted (unless 'full'), and only the differences are written
+        job = submit_job(JOB_GENERATE_PLAN,
+                         {'year': year, 'month': month, 'months': months, 'full': 'full' in request.form},
+                         user_id=current_user.id if current_user.is_authenticated else None)
+        return redirect(url_for('planned_maintenance.job_status', job_id=job.id))
 
     except Exception as e:
         db.session.rollback()
-        logging.error(f"--- Error generating maintenance plan: {e} ---", exc_info=True)
+        logging.error(f"--- Error submitting maintenance plan generation: {e} ---", exc_info=True)
         flash(f"An error occurred while generating the plan: {e}", "danger")
     return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
 
@@ -271,11 +170,6 @@ def generate_maintenance_plan():
 # ==============================================================================
 @bp.route('/maintenance_plan/pdf') # Keep GET method
 def maintenance_plan_pdf():
-    if not WEASYPRINT_AVAILABLE:
-        flash("PDF generation library (WeasyPrint) is not installed or configured correctly.", "danger")
-        # Decide: redirect to dashboard or maybe a dedicated plan view page?
-        return redirect(url_for('planned_maintenance.dashboard'))
-
     logging.debug("--- Request for Maintenance Plan PDF ---")
     try:
         # 1. Get Target Month/Year from Query Parameters
@@ -295,90 +189,66 @@ def maintenance_plan_pdf():
             year = default_date_val.year
             month = default_date_val.month
 
-        # Calculate Date Range and Month Name
-        try:
-            plan_start_date = date(year, month, 1)
-            days_in_month = monthrange(year, month)[1]
-            plan_end_date = date(year, month, days_in_month)
-            month_name = plan_start_date.strftime("%B %Y")
-        except ValueError:
-             flash(f"Cannot generate PDF for invalid date {month}/{year}.", "danger")
-             return redirect(url_for('planned_maintenance.dashboard'))
-
-        logging.info(f"Generating PDF for plan: {month_name}")
-
-        # 2. Fetch Equipment List (for rows)
-        # Eager load equipment to avoid N+1 queries in the template if accessing eq details
-        equipment_list = Equipment.query.order_by(Equipment.code).all()
-
-
-        # 3. Fetch Stored Plan Entries for the selected month/year
-        logging.debug(f"Querying stored plan entries for {year}-{month}...")
-        plan_entries = MaintenancePlanEntry.query.filter(
-            MaintenancePlanEntry.plan_year == year,
-            MaintenancePlanEntry.plan_month == month
-        ).options(
-            db.joinedload(MaintenancePlanEntry.equipment) # Eager load equipment data if needed
-        ).order_by(
-            MaintenancePlanEntry.equipment_id,
-            MaintenancePlanEntry.planned_date
-        ).all()
-        logging.debug(f"Found {len(plan_entries)} stored entries.")
-
-        # 4. Structure Data for the Template
-        plan_data = {} # Structure: {eq_id: {date_obj: [task_label1, task_label2]}}
-        generation_info = "Plan not generated for this period." # Default message
-        if plan_entries:
-            # Find the latest generation time for this batch
-            latest_generation_time = max(entry.generated_at for entry in plan_entries if entry.generated_at)
-            generation_info = f"Plan generated on: {latest_generation_time.strftime('%Y-%m-%d %H:%M:%S UTC') if latest_generation_time else 'N/A'}"
-
-            for entry in plan_entries:
-                eq_id = entry.equipment_id
-                due_date_val = entry.planned_date # Already a date object
-
-                if eq_id not in plan_data:
-                    plan_data[eq_id] = {}
-                if due_date_val not in plan_data[eq_id]:
-                    plan_data[eq_id][due_date_val] = []
-
-                task_label = entry.task_description
-                if entry.is_estimate:
-                    task_label += " (Est.)"
-                plan_data[eq_id][due_date_val].append(task_label)
-
-        # Generate list of dates for the header
-        dates_in_month = [plan_start_date + timedelta(days=d) for d in range(days_in_month)]
-
-        # 5. Render HTML Template
-        logging.debug("Rendering maintenance_plan_template.html for PDF")
-        html_string = render_template(
-            'maintenance_plan_template.html', # Use the same template
-            title=f"Maintenance Plan - {month_name}",
-            month_name=month_name,
-            equipment_list=equipment_list,
-            dates_in_month=dates_in_month,
-            plan_data=plan_data, # Pass the structured data from the DB
-            date_today=date.today(),
-            generation_info=generation_info # Pass generation info
-        )
-
-        # 6. Generate PDF using WeasyPrint
-        logging.debug("Generating PDF with WeasyPrint...")
-        pdf_file = HTML(string=html_string).write_pdf()
-        logging.debug("PDF generation complete.")
-
-        # 7. Create Response
-        response = make_response(pdf_file)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename="maintenance_plan_{year}_{month:02d}.pdf"'
-        return response
+        # 2. Unchanged plan: serve the cached render (304 if the client already has it)
+        source = PlanPdfSource(year, month)
+        cached_path = source.cached_path()
+        if cached_path:
+            logging.debug(f"Serving cached plan PDF {source.key[:12]} for {year}-{month}")
+            return send_file(cached_path, mimetype='application/pdf', as_attachment=True,
+                             download_name=source.filename, conditional=True,
+                             etag=source.key, last_modified=source.last_modified, max_age=0)
+
+        if not WEASYPRINT_AVAILABLE:
+            flash("PDF generation library (WeasyPrint) is not installed or configured correctly.", "danger")
+            return redirect(url_for('planned_maintenance.dashboard'))
+
+        # 3. No worker: render in this request and send it (the cache keeps the copy)
+        if not jobs_enabled():
+            pdf_file = build_maintenance_plan_pdf(year, month)
+            return send_file(BytesIO(pdf_file), mimetype='application/pdf', as_attachment=True,
+                             download_name=source.filename, etag=source.key, max_age=0)
+
+        # 4. Render in the background worker; the status page downloads it when ready
+        job = submit_job(JOB_PLAN_PDF, {'year': year, 'month': month},
+                         user_id=current_user.id if current_user.is_authenticated else None)
+        return redirect(url_for('planned_maintenance.job_status', job_id=job.id))
 
     except Exception as e:
-        logging.error(f"--- Error generating maintenance plan PDF: {e} ---", exc_info=True)
+        db.session.rollback()
+        logging.error(f"--- Error submitting maintenance plan PDF: {e} ---", exc_info=True)
         flash(f"An error occurred while generating the PDF plan: {e}", "danger")
         return redirect(url_for('planned_maintenance.dashboard'))
 
+# ==============================================================================
+# === Background Job Status / Download ===
+# ==============================================================================
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+def job_status(job_id):
+    """Shows the progress of a background job; polls /api/jobs/<id> until it finishes."""
+    job = BackgroundJob.query.get_or_404(job_id)
+    params = job.params or {}
+    if job.job_type == JOB_GENERATE_PLAN:
+        title = f"Generating Plan: {plan_period_label(params['year'], params['month'], params.get('months', 1))}"
+    elif job.job_type == JOB_PLAN_PDF:
+        title = f"Plan PDF: {plan_period_label(params['year'], params['month'])}"
+    else:
+        title = f"Job #{job.id}"
+    return render_template('pm_job_status.html', title=title, job=job,
+                           back_url=url_for('planned_maintenance.maintenance_plan_list_view'))
+
+
+@bp.route('/jobs/<int:job_id>/download', methods=['GET'])
+def download_job_result(job_id):
+    """Sends the file produced by a finished background job."""
+    job = BackgroundJob.query.get_or_404(job_id)
+    if not job.has_download:
+        flash("This job has no downloadable result (yet).", "warning")
+        return redirect(url_for('planned_maintenance.job_status', job_id=job.id))
+    response = make_response(job.result_data)
+    response.headers['Content-Type'] = job.result_mimetype or 'application/octet-stream'
+    response.headers['Content-Disposition'] = f'attachment; filename="{job.result_filename or f"job_{job.id}"}"'
+    return response
+
 # ==============================================================================
 # === NEW Route: List Generated Maintenance Plans ===
 # ==============================================================================
@@ -436,8 +306,7 @@ def maintenance_plan_detail_view():
         logging.info(f"Displaying plan detail view for: {month_name_str}, Type Filter: '{equipment_type_filter}'")
 
         # 3. Fetch Equipment Types for Filter Dropdown
-        equipment_types_query = db.session.query(Equipment.type).distinct().order_by(Equipment.type).all()
-        equipment_types = [t[0] for t in equipment_types_query if t[0]] # Get non-empty types
+        equipment_types = get_facets('equipment_types')['equipment_types']
 
         # 4. Fetch Data: Planned Entries, Completed JCs, ToDo JCs
 
@@ -508,6 +377,7 @@ def maintenance_plan_detail_view():
             else:
                  generation_info = "Plan generated (time unknown)"
 
+            actual_by_task = job_cards_by_task(completed_job_cards, todo_job_cards)
             for entry in plan_entries:
                 day_date = entry.planned_date # Key is the date object
                 # Determine if legal from original task
@@ -517,7 +387,8 @@ def maintenance_plan_detail_view():
                     'equipment': entry.equipment, # Pass equipment object
                     'is_legal': is_legal,
                     'is_estimate': entry.is_estimate,
-                    'description': entry.task_description
+                    'description': entry.task_description,
+                    'job_card': actual_by_task.get(entry.task_id) # Actual: this month's job card for the task
                 })
 
         # Process completed job cards
@@ -525,8 +396,7 @@ def maintenance_plan_detail_view():
             # Group by the DATE part of the end_datetime
             if jc.end_datetime:
                  day_date = jc.end_datetime.date() # Key is the date object
-                 # Determine if legal from job number prefix
-                 is_legal = jc.job_number and jc.job_number.startswith('LC-')
+                 is_legal = jc.is_legal_compliance
                  daily_plan_data[day_date]['completed'].append({
                     'job_card': jc,
                     'equipment': jc.equipment_ref, # Pass equipment object
@@ -541,7 +411,7 @@ def maintenance_plan_detail_view():
             # Group by the DATE part of the due_date
             if jc.due_date:
                  day_date = jc.due_date.date() # Key is the date object
-                 is_legal = jc.job_number and jc.job_number.startswith('LC-')
+                 is_legal = jc.is_legal_compliance
                  daily_plan_data[day_date]['todo'].append({
                     'job_card': jc,
                     'equipment': jc.equipment_ref, # Pass equipment object
@@ -682,19 +552,21 @@ def print_maintenance_plan_detail():
         daily_plan_data = defaultdict(lambda: {'planned': [], 'completed': [], 'todo': []})
 
         # Process planned entries
+        actual_by_task = job_cards_by_task(completed_job_cards, todo_job_cards)
         for entry in plan_entries:
             day_date = entry.planned_date
             is_legal = entry.original_task.is_legal_compliance if entry.original_task else False
             daily_plan_data[day_date]['planned'].append({
                 'entry': entry, 'equipment': entry.equipment, 'is_legal': is_legal,
-                'is_estimate': entry.is_estimate, 'description': entry.task_description
+                'is_estimate': entry.is_estimate, 'description': entry.task_description,
+                'job_card': actual_by_task.get(entry.task_id)
             })
 
         # Process completed job cards
         for jc in completed_job_cards:
             if jc.end_datetime:
                  day_date = jc.end_datetime.date()
-                 is_legal = jc.job_number and jc.job_number.startswith('LC-')
+                 is_legal = jc.is_legal_compliance
                  daily_plan_data[day_date]['completed'].append({
                     'job_card': jc, 'equipment': jc.equipment_ref, 'is_legal': is_legal,
                     'description': jc.description
@@ -704,7 +576,7 @@ def print_maintenance_plan_detail():
         for jc in todo_job_cards:
             if jc.due_date:
                  day_date = jc.due_date.date()
-                 is_legal = jc.job_number and jc.job_number.startswith('LC-')
+                 is_legal = jc.is_legal_compliance
                  daily_plan_data[day_date]['todo'].append({
                     'job_card': jc,
                     'equipment': jc.equipment_ref,
@@ -831,14 +703,12 @@ def dashboard():
         today_str = today_date_obj.strftime('%Y-%m-%d') 
 
         logging.debug("Fetching latest usage/checklist for equipment...")
+        attach_latest_logs(equipment_for_display) # Two set-based queries for the whole fleet
         for eq in equipment_for_display:
-            latest_usage = UsageLog.query.filter_by(equipment_id=eq.id).order_by(desc(UsageLog.log_date)).first()
-            latest_checklist = Checklist.query.filter_by(equipment_id=eq.id).order_by(desc(Checklist.check_date)).first()
-            eq.latest_usage = latest_usage
-            eq.latest_checklist = latest_checklist
             last_check_date_obj = eq.latest_checklist.check_date if eq.latest_checklist else None
             last_check_date_str = last_check_date_obj.strftime('%Y-%m-%d') if last_check_date_obj else None
             eq.checked_today = last_check_date_str == today_str
+        missing_checklists = find_missing_checklists(today_date_obj, today_date_obj) # One anti-join query
 
         # 2. Fetch Open Job Cards
         logging.debug("Fetching open job cards...")
@@ -859,11 +729,13 @@ def dashboard():
         current_time = datetime.utcnow() 
         logging.debug(f"Dashboard processing tasks using current_time (naive UTC): {current_time}")
         
-        actionable_statuses_keywords = ["Overdue", "Due Soon", "Warning", "Error"]
+        actionable_filter = due_state_filter(ACTIONABLE_STATES, current_time) # Indexed on next_due_date/status_rank
 
-        # 3.1 Process regular maintenance tasks (is_legal_compliance=False or NULL)
-        all_maintenance_tasks = MaintenanceTask.query.filter(
-            MaintenanceTask.is_legal_compliance.is_(False)
+        # 3.1 Process regular maintenance tasks (is_legal_compliance=False), operational equipment only
+        tasks_with_status_filtered = MaintenanceTask.query.join(Equipment).filter(
+            MaintenanceTask.is_legal_compliance.is_(False),
+            Equipment.status == 'Operational',
+            actionable_filter
         ).options(
             db.joinedload(MaintenanceTask.equipment_ref)
         ).order_by(
@@ -871,52 +743,11 @@ def dashboard():
              MaintenanceTask.id
         ).all()
 
-        tasks_with_status_filtered = [] 
-        logging.debug("Calculating task statuses for dashboard (Maintenance Tasks)...")
-        for task in all_maintenance_tasks:
-            if not task.equipment_ref:
-                logging.debug(f"MAINT: Skipping task {task.id} due to missing equipment reference.")
-                continue
-            
-            equipment_status = task.equipment_ref.status
-            equipment_code = task.equipment_ref.code
-
-            if equipment_status == 'Sold':
-                logging.debug(f"MAINT: Skipping task {task.id} for SOLD equipment {equipment_code}")
-                continue 
-
-            status_str, due_info, due_date_val, last_performed_info, next_due_info, estimated_days_info = \
-                calculate_task_due_status(task, current_time)
-
-            task.due_status = status_str
-            task.due_info = due_info
-            task.due_date = due_date_val 
-            task.last_performed_info = last_performed_info
-            task.next_due_info = next_due_info
-            task.estimated_days_info = estimated_days_info
-
-            is_actionable = False
-            if isinstance(status_str, str):
-                for keyword in actionable_statuses_keywords:
-                    if keyword in status_str:
-                        is_actionable = True
-                        break
-            
-            include_task_on_dashboard = False
-            if is_actionable: 
-                if equipment_status == 'Operational':
-                    include_task_on_dashboard = True
-                    logging.debug(f"MAINT: Including ACTIONABLE task {task.id} ('{status_str}') for OPERATIONAL equipment {equipment_code}")
-                else:
-                    logging.debug(f"MAINT: Excluding ACTIONABLE task {task.id} ('{status_str}') for NON-OPERATIONAL equipment {equipment_code} (status: {equipment_status})")
-            
-            if include_task_on_dashboard:
-                tasks_with_status_filtered.append(task)
-
         # 3.2 Process legal compliance tasks (is_legal_compliance=True)
-        all_legal_tasks = MaintenanceTask.query.join(Equipment).filter(
+        legal_tasks_with_status_filtered = MaintenanceTask.query.join(Equipment).filter(
             MaintenanceTask.is_legal_compliance.is_(True),
-            Equipment.status == 'Operational'  
+            Equipment.status == 'Operational',
+            actionable_filter
         ).options(
             db.joinedload(MaintenanceTask.equipment_ref)
         ).order_by(
@@ -924,60 +755,27 @@ def dashboard():
              MaintenanceTask.id
         ).all()
 
-        legal_tasks_with_status_filtered = [] 
-        logging.debug("Calculating task statuses for dashboard (Legal Compliance Tasks)...")
-        for task in all_legal_tasks:
-            if not task.equipment_ref: 
-                logging.warning(f"LEGAL: Skipping task {task.id} due to missing equipment reference despite query filters.")
-                continue
-            
-            status_str, due_info, due_date_val, last_performed_info, next_due_info, estimated_days_info = \
-                calculate_task_due_status(task, current_time)
-
-            task.due_status = status_str
-            task.due_info = due_info
-            task.due_date = due_date_val
-            task.last_performed_info = last_performed_info
-            task.next_due_info = next_due_info
-            task.estimated_days_info = estimated_days_info
-
-            is_actionable = False
-            if isinstance(status_str, str):
-                for keyword in actionable_statuses_keywords:
-                    if keyword in status_str:
-                        is_actionable = True
-                        break
-            
-            if is_actionable: 
-                legal_tasks_with_status_filtered.append(task)
-                logging.debug(f"LEGAL: Including ACTIONABLE task {task.id} ('{status_str}') for OPERATIONAL equipment {task.equipment_ref.code}")
-                
+        # Exact statuses (for display) of the actionable tasks only, in one pass
+        logging.debug("Calculating task statuses for dashboard (actionable tasks only)...")
+        task_statuses = calculate_task_statuses(tasks_with_status_filtered + legal_tasks_with_status_filtered, current_time)
+        for task in tasks_with_status_filtered + legal_tasks_with_status_filtered:
+            task.due_status = task_statuses[task.id]
+        # Guard against a persisted rank that drifted from the live calculation
+        tasks_with_status_filtered = [t for t in tasks_with_status_filtered if t.due_status.is_actionable]
+        legal_tasks_with_status_filtered = [t for t in legal_tasks_with_status_filtered if t.due_status.is_actionable]
+
         logging.debug("=== FILTERED TASKS DEBUG ===")
         logging.debug(f"tasks_with_status_filtered count: {len(tasks_with_status_filtered)}")
         for idx, task in enumerate(tasks_with_status_filtered):
-            logging.debug(f"Task #{idx+1} - ID: {task.id}, Status: {task.due_status}, Description: {task.description}, Eq.Status: {task.equipment_ref.status}")
+            logging.debug(f"Task #{idx+1} - ID: {task.id}, Status: {task.due_status.state.value}, Description: {task.description}, Eq.Status: {task.equipment_ref.status}")
 
         logging.debug("=== LEGAL TASKS DEBUG ===")
         logging.debug(f"legal_tasks_with_status_filtered count: {len(legal_tasks_with_status_filtered)}")
         for idx, task in enumerate(legal_tasks_with_status_filtered):
-            logging.debug(f"Legal Task #{idx+1} - ID: {task.id}, Status: {task.due_status}, Description: {task.description}, Eq.Status: {task.equipment_ref.status}")
+            logging.debug(f"Legal Task #{idx+1} - ID: {task.id}, Status: {task.due_status.state.value}, Description: {task.description}, Eq.Status: {task.equipment_ref.status}")
             
-        sort_order_map = {
-            'Overdue': 1, 'Due Soon': 2, 'Warning': 3, 'Error': 4, 
-            'Unknown': 99 
-        }
-        default_sort_prio = 100
-
         def get_sort_key(task_item):
-            status_str_val = getattr(task_item, 'due_status', 'Unknown') 
-            if not isinstance(status_str_val, str): status_str_val = 'Unknown'
-            prio = default_sort_prio
-            for key, sort_prio in sort_order_map.items():
-                if key in status_str_val: 
-                    prio = sort_prio
-                    break 
-            secondary_key = task_item.due_date if task_item.due_date else datetime.max.replace(tzinfo=None)
-            return (prio, secondary_key)
+            return task_item.due_status.sort_key # (priority rank, due date)
 
         try:
             tasks_with_status_filtered.sort(key=get_sort_key)
@@ -1058,7 +856,8 @@ def dashboard():
             legal_tasks=legal_tasks_with_status_filtered,
             recent_activities=recent_activities, 
             today=today_date_obj,                
-            yesterday=yesterday_date_obj
+            yesterday=yesterday_date_obj,
+            missing_checklists=missing_checklists
         )
 
     except Exception as e:
@@ -1074,7 +873,8 @@ def dashboard():
                                legal_tasks=[],
                                recent_activities=[],
                                today=date.today(),
-                               yesterday=date.today() - timedelta(days=1))
+                               yesterday=date.today() - timedelta(days=1),
+                               missing_checklists=[])
 
 @bp.route('/equipment')
 @login_required
@@ -1083,6 +883,7 @@ def equipment_list():
     try:
         # Fetch all equipment, ordered primarily by type, then code
         all_equipment_query = Equipment.query.order_by(Equipment.type, Equipment.code).all()
+        attach_latest_logs(all_equipment_query) # Latest usage/checklist for every item in two queries
 
         # Group equipment by type and calculate summaries
         grouped_equipment = defaultdict(lambda: {'items': [], 'total': 0, 'operational': 0})
@@ -1321,10 +1122,8 @@ def report_jobs_by_technician():
             query = query.join(Equipment, JobCard.equipment_id == Equipment.id)\
                          .filter(Equipment.type == equipment_type_filter)
         
-        if job_type_filter == 'Maintenance':
-            query = query.filter(JobCard.job_number.like('JC-%'))
-        elif job_type_filter == 'Legal':
-            query = query.filter(JobCard.job_number.like('LC-%'))
+        if job_type_filter in JOB_TYPE_FILTERS:
+            query = query.filter(JobCard.job_type == JOB_TYPE_FILTERS[job_type_filter])
 
         # Apply technician filter if it's not 'All'
         if technician_filter and technician_filter != 'All':
@@ -1458,10 +1257,8 @@ def job_card_reports_dashboard():
             base_query = base_query.join(Equipment, JobCard.equipment_id == Equipment.id)\
                                    .filter(Equipment.type == equipment_type_filter)
         
-        if job_type_filter == 'Maintenance':
-            base_query = base_query.filter(JobCard.job_number.like('JC-%'))
-        elif job_type_filter == 'Legal':
-            base_query = base_query.filter(JobCard.job_number.like('LC-%'))
+        if job_type_filter in JOB_TYPE_FILTERS:
+            base_query = base_query.filter(JobCard.job_type == JOB_TYPE_FILTERS[job_type_filter])
 
         if technician_filter and technician_filter != 'All':
             if technician_filter == 'Unassigned':
@@ -1469,28 +1266,19 @@ def job_card_reports_dashboard():
             else:
                 base_query = base_query.filter(JobCard.technician == technician_filter)
 
-        # 4. Calculate Metrics
-        count_todo = base_query.filter(JobCard.status == 'To Do').count()
-        
-        # Overdue: due_date < today (midnight) AND status is not Done or Deleted
-        overdue_datetime_threshold = datetime.combine(today_obj, time.min)
-        count_overdue = base_query.filter(
-            JobCard.due_date < overdue_datetime_threshold,
-            JobCard.status.notin_(['Done', 'Deleted'])
-        ).count()
-
-        count_completed_in_period = base_query.filter(
-            JobCard.status == 'Done',
-            JobCard.end_datetime >= completed_period_start_dt,
-            JobCard.end_datetime <= completed_period_end_dt
-        ).count()
+        # 4. Calculate Metrics (one aggregate query; overdue = due before today and not Done/Deleted)
+        metrics = compute_job_card_metrics(
+            base_query, job_card_counters(today_obj, completed_period_start_dt, completed_period_end_dt)
+        )
+        count_todo = metrics['todo']
+        count_in_progress = metrics['in_progress']
+        count_overdue = metrics['overdue']
+        count_completed_in_period = metrics['completed_in_period']
 
         # 5. Data for Filter Dropdowns
-        equipment_types_query = db.session.query(Equipment.type).distinct().order_by(Equipment.type).all()
-        report_equipment_types = ['All'] + [t[0] for t in equipment_types_query if t[0]]
-
-        technicians_query = db.session.query(JobCard.technician).distinct().order_by(JobCard.technician).all()
-        report_technicians = ['All', 'Unassigned'] + [t[0] for t in technicians_query if t[0] and t[0].strip()]
+        facets = get_facets('equipment_types', 'technicians')
+        report_equipment_types = ['All'] + facets['equipment_types']
+        report_technicians = ['All', 'Unassigned'] + facets['technicians']
         
         report_job_types = ['All', 'Maintenance', 'Legal']
 
@@ -1503,12 +1291,13 @@ def job_card_reports_dashboard():
             'end_date': end_date_str
         }
         
-        logging.debug(f"Report Metrics: ToDo={count_todo}, Overdue={count_overdue}, Completed ({completed_period_label})={count_completed_in_period}")
+        logging.debug(f"Report Metrics: ToDo={count_todo}, InProgress={count_in_progress}, Overdue={count_overdue}, Completed ({completed_period_label})={count_completed_in_period}")
 
         return render_template(
             'pm_job_card_reports_dashboard.html',
             title="Job Card Reports & Metrics",
             count_todo=count_todo,
+            count_in_progress=count_in_progress,
             count_overdue=count_overdue,
             count_completed_in_period=count_completed_in_period,
             completed_period_label=completed_period_label,
@@ -1542,11 +1331,7 @@ def new_job_card_from_task(task_id):
         logging.debug(f"Received due_date string from form for task {task_id}: '{due_date_str}'")
 
         # --- <<< CHECK FOR EXISTING OPEN JOB CARD >>> ---
-        existing_open_jc = JobCard.query.filter(
-            JobCard.equipment_id == task.equipment_id,
-            JobCard.description == task.description,
-            JobCard.status.notin_(['Done', 'Deleted'])
-        ).first()
+        existing_open_jc = find_open_job_card(task) # Also catches older cards not yet linked by task_id
 
         if existing_open_jc:
             flash(f"Cannot create new job card. An open job card (#{existing_open_jc.job_number}) "
@@ -1566,14 +1351,16 @@ def new_job_card_from_task(task_id):
 
         # --- Generate Job Number with type distinction ---
         # Determine if this is a legal compliance task
-        job_type = 'LEGAL' if task.is_legal_compliance else 'MAINT'
+        job_type = JOB_TYPE_LEGAL if task.is_legal_compliance else JOB_TYPE_MAINTENANCE
         job_number = generate_next_job_number(job_type)
         logging.debug(f"Generated Job Number: {job_number} (Type: {job_type})")
 
         # --- Create New Job Card ---
         job_card = JobCard(
             job_number=job_number,
+            job_type=job_type,
             equipment_id=task.equipment_id,
+            task_id=task.id,
             description=task.description,
             technician=technician if technician else None,
             status='To Do',
@@ -1673,10 +1460,8 @@ def job_card_list():
         if status_filter and status_filter != 'All' and status_filter in JOB_CARD_STATUSES:
             query = query.filter(JobCard.status == status_filter)
 
-        if job_type_filter == 'Maintenance':
-            query = query.filter(JobCard.job_number.like('JC-%'))
-        elif job_type_filter == 'Legal':
-            query = query.filter(JobCard.job_number.like('LC-%'))
+        if job_type_filter in JOB_TYPE_FILTERS:
+            query = query.filter(JobCard.job_type == JOB_TYPE_FILTERS[job_type_filter])
 
         if technician_filter and technician_filter != 'All':
             if technician_filter == 'Unassigned':
@@ -1691,11 +1476,9 @@ def job_card_list():
         for jc in job_cards_page:
             jc.whatsapp_share_url = generate_whatsapp_share_url(jc)
 
-        equipment_types_query = db.session.query(Equipment.type).distinct().order_by(Equipment.type).all()
-        equipment_types_for_filter = ['All'] + [t[0] for t in equipment_types_query if t[0]]
-
-        technicians_query = db.session.query(JobCard.technician).distinct().order_by(JobCard.technician).all()
-        technicians_for_filter = ['All', 'Unassigned'] + [t[0] for t in technicians_query if t[0] and t[0].strip()]
+        facets = get_facets('equipment_types', 'technicians')
+        equipment_types_for_filter = ['All'] + facets['equipment_types']
+        technicians_for_filter = ['All', 'Unassigned'] + facets['technicians']
         
         job_type_options = ['All', 'Maintenance', 'Legal']
 
@@ -1860,10 +1643,12 @@ def complete_job_card(id):
 
             # ================== TASK UPDATE LOGIC ==================
             # Find the related maintenance task
-            task = MaintenanceTask.query.filter_by(
-                equipment_id=job_card.equipment_id,
-                description=job_card.description # Assuming description uniquely identifies the task for the equipment
-            ).first()
+            task = job_card.task
+            if task is None and job_card.task_id is None:
+                # Not linked yet (older job card): fall back to the description and remember the match
+                task = match_task_by_description(job_card)
+                if task:
+                    job_card.task_id = task.id
 
             if task:
                 # Update last performed timestamp
@@ -1898,6 +1683,7 @@ def complete_job_card(id):
                     # For 'days' tasks, the usage value isn't relevant
                     task.last_performed_usage_value = None
 
+                refresh_task_due_columns(tasks=[task]) # Persisted next-due columns
                 db.session.add(task)
             else:
                  logging.warning(f"Could not find matching MaintenanceTask for Job Card {job_card.job_number} (Eq: {job_card.equipment_id}, Desc: {job_card.description})")
@@ -2016,13 +1802,14 @@ def create_job_card():
             return redirect(request.referrer or url_for('planned_maintenance.job_card_list'))
 
         # 3. Generate Job Number with type distinction
-        job_type = 'LEGAL' if is_legal else 'MAINT'
+        job_type = JOB_TYPE_LEGAL if is_legal else JOB_TYPE_MAINTENANCE
         job_number = generate_next_job_number(job_type)
         logging.debug(f"Generated Job Number: {job_number} (Type: {job_type})")
 
         # 4. Create JobCard Object
         new_job_card = JobCard(
             job_number=job_number,
+            job_type=job_type,
             equipment_id=equipment_id,
             description=description,
             technician=technician,
@@ -2285,7 +2072,7 @@ def new_checklist():
             # --- Process Optional Usage Log Data ---
             usage_value_str = request.form.get('usage_value_for_checklist', '').strip()
             usage_logged_successfully = False
-            usage_log_entry_to_add = None # To hold the usage log object if valid
+            usage_reading_to_add = None # Validated UsageReading, if any
             usage_value_for_flash = None
 
             if usage_value_str:
@@ -2298,67 +2085,27 @@ def new_checklist():
                     else:
                         usage_log_date_dt = check_date_utc # Use the same UTC datetime as the checklist
 
-                        # --- Validation for Usage Log (adapted from add_usage route) ---
-                        # 1. Duplicate UsageLog check
-                        existing_usage_log_at_same_time = UsageLog.query.filter_by(
-                            equipment_id=equipment_id,
-                            log_date=usage_log_date_dt 
-                        ).first()
-                        if existing_usage_log_at_same_time:
-                            flash(f"A usage log for {equipment.code} already exists at {usage_log_date_dt.strftime('%Y-%m-%d %H:%M UTC')}. Usage submitted with checklist not logged again.", "info")
+                        # Same checks as add_usage (one query); inserted below with the checklist
+                        usage_reading = UsageReading(0, equipment_id, usage_value, usage_log_date_dt)
+                        if validate_usage_reading(usage_reading):
+                            flash(f"Usage submitted with checklist not logged: {usage_reading.error}", "warning")
                         else:
-                            previous_usage_log = UsageLog.query.filter(
-                                UsageLog.equipment_id == equipment_id,
-                                UsageLog.log_date < usage_log_date_dt 
-                            ).order_by(UsageLog.log_date.desc()).first()
-
-                            next_usage_log = UsageLog.query.filter(
-                                UsageLog.equipment_id == equipment_id,
-                                UsageLog.log_date > usage_log_date_dt
-                            ).order_by(UsageLog.log_date.asc()).first()
-
-                            valid_usage_entry = True
-                            if previous_usage_log and usage_value < previous_usage_log.usage_value:
-                                prev_log_time_str = previous_usage_log.log_date.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
-                                flash(f"Usage value ({usage_value:.2f}) with checklist is less than previous log ({previous_usage_log.usage_value:.2f} on {prev_log_time_str}). Usage not logged.", "warning")
-                                valid_usage_entry = False
-                            elif next_usage_log and usage_value > next_usage_log.usage_value:
-                                next_log_time_str = next_usage_log.log_date.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
-                                flash(f"Usage value ({usage_value:.2f}) with checklist is greater than next log ({next_usage_log.usage_value:.2f} on {next_log_time_str}). Usage not logged.", "warning")
-                                valid_usage_entry = False
-                            
-                            if valid_usage_entry and previous_usage_log:
-                                usage_difference = usage_value - previous_usage_log.usage_value
-                                prev_log_date_utc_val = previous_usage_log.log_date.astimezone(timezone.utc)
-                                calendar_days_spanned = (usage_log_date_dt.date() - prev_log_date_utc_val.date()).days
-                                
-                                if calendar_days_spanned == 0 and usage_difference > MAX_REASONABLE_DAILY_USAGE_INCREASE:
-                                    flash(f"Usage increase ({usage_difference:.2f}) with checklist on same day is too high (max {MAX_REASONABLE_DAILY_USAGE_INCREASE:.2f}). Usage not logged.", "warning")
-                                    valid_usage_entry = False
-                                elif calendar_days_spanned > 0:
-                                    max_allowed_increase = MAX_REASONABLE_DAILY_USAGE_INCREASE * calendar_days_spanned
-                                    if usage_difference > max_allowed_increase:
-                                        flash(f"Usage increase ({usage_difference:.2f}) with checklist over {calendar_days_spanned} day(s) is too high (max {max_allowed_increase:.2f}). Usage not logged.", "warning")
-                                        valid_usage_entry = False
-                                
-                            if valid_usage_entry:
-                                usage_log_entry_to_add = UsageLog(
-                                    equipment_id=equipment_id,
-                                    usage_value=usage_value,
-                                    log_date=usage_log_date_dt # Store as UTC
-                                )
-                                logging.info(f"Usage log entry prepared to be added with checklist: Eq ID {equipment_id}, Val {usage_value}, Date {usage_log_date_dt.strftime('%Y-%m-%d %H:%M UTC')}")
-                
+                            usage_reading_to_add = usage_reading
+                            logging.info(f"Usage log entry prepared to be added with checklist: Eq ID {equipment_id}, Val {usage_value}, Date {usage_log_date_dt.strftime('%Y-%m-%d %H:%M UTC')}")
+
                 except ValueError: # For float conversion
                     flash("Invalid Usage Value format provided with checklist (must be a number). Usage not logged.", "warning")
                 except Exception as usage_exc: # Catch any other errors during usage processing
                     logging.error(f"Error processing usage log part of checklist submission: {usage_exc}", exc_info=True)
                     flash(f"Unexpected error with usage data: {usage_exc}. Usage not logged.", "warning")
             
-            # Add usage log to session if it's valid and created
-            if usage_log_entry_to_add:
-                db.session.add(usage_log_entry_to_add)
-                usage_logged_successfully = True
+            # Add usage log to session if it's valid (the checklist is logged even if the slot was just taken)
+            if usage_reading_to_add:
+                if insert_usage_logs([usage_reading_to_add]):
+                    refresh_task_due_columns(equipment_ids=[usage_reading_to_add.equipment_id], usage_only=True)
+                    usage_logged_successfully = True
+                else:
+                    flash(f"Usage submitted with checklist not logged: {usage_reading_to_add.error}", "warning")
 
 
             # --- Commit to Database ---
@@ -2385,163 +2132,6 @@ def new_checklist():
     # If accessed via GET (should not happen with a POST-only route, but good practice)
     return redirect(url_for('planned_maintenance.dashboard'))
 # ==============================================================================
-# === Task Status Calculation ===
-# ==============================================================================
-def calculate_task_due_status(task, current_time): # Accept current_time (naive UTC)
-    logging.debug(f"    Calculating status for Task {task.id} ({task.description}) for Eq {task.equipment_id}. current_time = {current_time}")
-    status = "Unknown"
-    due_info = "N/A"
-    due_date = None 
-    last_performed_info = "Never"
-    next_due_info = "N/A" 
-    estimated_days_info = "N/A" 
-    numeric_estimated_days = None 
-    
-    if current_time.tzinfo is not None:
-        current_time = current_time.astimezone(timezone.utc).replace(tzinfo=None)
-
-    last_performed_dt = task.last_performed
-    if last_performed_dt and last_performed_dt.tzinfo is not None:
-        last_performed_dt = last_performed_dt.astimezone(timezone.utc).replace(tzinfo=None)
-    last_performed_info = last_performed_dt.strftime('%Y-%m-%d %H:%M') if last_performed_dt else "Never"
-
-    if task.interval_type == 'hours' or task.interval_type == 'km':
-        interval_unit = task.interval_type
-        current_usage = None
-        current_usage_date = None
-        hours_until_next = None
-
-        latest_log = UsageLog.query.filter_by(equipment_id=task.equipment_id).order_by(desc(UsageLog.log_date)).first()
-        if not latest_log:
-            status = f"Unknown (No Usage Data)"
-            return status, due_info, None, last_performed_info, next_due_info, estimated_days_info
-
-        current_usage = latest_log.usage_value
-        current_usage_date = latest_log.log_date
-        if current_usage_date and current_usage_date.tzinfo is not None:
-             current_usage_date = current_usage_date.astimezone(timezone.utc).replace(tzinfo=None)
-
-        if not last_performed_dt: 
-            status = "Never Performed"
-            next_due_info = f"Due at {task.interval_value} {interval_unit} (First)"
-            local_hours_until_due = task.interval_value - current_usage
-            if local_hours_until_due <= 0:
-                status = "Overdue (First)"
-                due_info = f"Over by {abs(local_hours_until_due):.1f} {interval_unit}"
-            elif local_hours_until_due <= task.interval_value * 0.1: 
-                status = "Due Soon (First)"
-                due_info = f"{local_hours_until_due:.1f} {interval_unit} remaining"
-            else:
-                status = "OK (First)"
-                due_info = f"{local_hours_until_due:.1f} {interval_unit} remaining"
-            estimated_days_info = "N/A (First)" 
-            return status, due_info, None, last_performed_info, next_due_info, estimated_days_info
-
-        last_performed_usage = task.last_performed_usage_value
-        if last_performed_usage is None: 
-             status = f"Warning (Usage at Last Done Unknown)"
-             last_performed_info = f"{last_performed_dt.strftime('%Y-%m-%d %H:%M')} (Usage Unknown)"
-             next_due_info = "Cannot Calculate"; estimated_days_info = "Cannot Calculate"
-             return status, due_info, None, last_performed_info, next_due_info, estimated_days_info
-
-        last_performed_info = f"{last_performed_dt.strftime('%Y-%m-%d %H:%M')} at {last_performed_usage:.1f} {interval_unit}"
-        next_due_at_usage = last_performed_usage + task.interval_value
-        hours_until_next = next_due_at_usage - current_usage 
-        next_due_info = f"Next due at {next_due_at_usage:.1f} {interval_unit}" 
-        due_info = f"{hours_until_next:.1f} {interval_unit} remaining" 
-
-        if hours_until_next <= 0:
-            status = "Overdue"
-            due_info = f"Overdue by {abs(hours_until_next):.1f} {interval_unit}"
-        elif hours_until_next <= task.interval_value * 0.10: 
-            status = "Due Soon"
-        else:
-            status = "OK"
-
-        previous_log = UsageLog.query.filter(
-            UsageLog.equipment_id == task.equipment_id,
-            UsageLog.log_date < current_usage_date 
-        ).order_by(desc(UsageLog.log_date)).first()
-
-        if previous_log and current_usage_date > previous_log.log_date:
-             prev_log_date = previous_log.log_date
-             if prev_log_date and prev_log_date.tzinfo is not None:
-                 prev_log_date = prev_log_date.astimezone(timezone.utc).replace(tzinfo=None)
-
-             usage_diff = current_usage - previous_log.usage_value
-             time_diff = current_usage_date - prev_log_date
-             time_diff_days = time_diff.total_seconds() / (24 * 3600)
-
-             if time_diff_days > 0 and usage_diff >= 0: 
-                 avg_daily_usage = usage_diff / time_diff_days
-                 logging.debug(f"    Task {task.id}: Avg daily usage = {avg_daily_usage:.2f} {interval_unit}/day")
-                 if avg_daily_usage > 0.01: 
-                     numeric_estimated_days = hours_until_next / avg_daily_usage
-                     try:
-                         estimated_date_only = (current_time + timedelta(days=numeric_estimated_days)).date()
-                         due_date = datetime.combine(estimated_date_only, time.min) 
-                         logging.debug(f"    Task {task.id}: Estimated due_date object set to: {due_date}")
-                     except OverflowError:
-                         logging.warning(f"    Task {task.id}: OverflowError calculating estimated due date (numeric_estimated_days={numeric_estimated_days}). due_date remains None.")
-                         due_date = None 
-                     except Exception as date_calc_err:
-                         logging.error(f"    Task {task.id}: Error calculating estimated due_date object: {date_calc_err}", exc_info=True)
-                         due_date = None 
-                     if status == "Overdue": 
-                         estimated_days_info = f"~{abs(numeric_estimated_days):.1f} days Overdue (est.)"
-                     elif numeric_estimated_days >= 0 :
-                         estimated_days_info = f"~{numeric_estimated_days:.1f} days (est.)"
-                     else: 
-                         estimated_days_info = f"~{abs(numeric_estimated_days):.1f} days ago (est.)"
-                 else:
-                     estimated_days_info = "N/A (Low Usage Rate)"
-                     due_date = None 
-             else:
-                 estimated_days_info = "N/A (Rate Calc Error)" 
-                 due_date = None
-        else:
-            estimated_days_info = "N/A (Insufficient Data)" 
-            due_date = None
-        if status == "OK" and numeric_estimated_days is not None and numeric_estimated_days <= DUE_SOON_ESTIMATED_DAYS_THRESHOLD:
-            logging.debug(f"    Task {task.id}: Status was OK, but estimated days ({numeric_estimated_days:.1f}) <= threshold ({DUE_SOON_ESTIMATED_DAYS_THRESHOLD}). Changing status to Due Soon.")
-            status = "Due Soon"
-        return status, due_info, due_date, last_performed_info, next_due_info, estimated_days_info
-
-    elif task.interval_type == 'days':
-        if last_performed_dt:
-            due_datetime = last_performed_dt + timedelta(days=task.interval_value)
-            due_date = due_datetime
-            logging.debug(f"    Task {task.id} ('days'): Calculated due_date = {due_date} (naive)")
-            try:
-                time_difference = due_date - current_time
-                days_until_due = time_difference.days
-                total_seconds_until_due = time_difference.total_seconds()
-                if total_seconds_until_due < 0:
-                    status = "Overdue"
-                    due_info = f"Due on {due_date.strftime('%Y-%m-%d')} ({abs(days_until_due)} days ago)"
-                elif days_until_due <= DUE_SOON_ESTIMATED_DAYS_THRESHOLD:
-                    status = "Due Soon"
-                    due_info = f"Due on {due_date.strftime('%Y-%m-%d')} (in {days_until_due} days)"
-                else:
-                    status = "OK"
-                    due_info = f"Due on {due_date.strftime('%Y-%m-%d')} (in {days_until_due} days)"
-                next_due_info = f"Due on {due_date.strftime('%Y-%m-%d')}"
-                estimated_days_info = due_info 
-            except TypeError as calc_err:
-                 logging.error(f"    Task {task.id}: TYPE ERROR during 'days_until_due' calculation!", exc_info=True)
-                 status, due_info, due_date, last_performed_info, next_due_info = "Error Calculating Due", "Calculation Error", None, "Error", "Error"
-                 estimated_days_info = "Error" 
-        else:
-            status = "Never Performed"
-            next_due_info = "N/A (First)"
-            due_info = "N/A (First)"
-            estimated_days_info = "N/A (First)" 
-        return status, due_info, due_date, last_performed_info, next_due_info, estimated_days_info
-    else: 
-        status = "Unknown Interval Type"
-        due_info = task.interval_type
-        return status, due_info, None, last_performed_info, next_due_info, estimated_days_info
-# ==============================================================================
 # === Tasks List ===
 # ==============================================================================
 @bp.route('/tasks', methods=['GET'])
@@ -2550,6 +2140,8 @@ def tasks_list():
     logging.debug("--- Entering tasks_list route ---")
     try:
         type_filter = request.args.get('type')
+        due_filter = (request.args.get('due') or '').lower() # Due-state filter, see STATE_FILTERS
+        page = request.args.get('page', 1, type=int)
         query = MaintenanceTask.query.join(Equipment).filter(
             or_(
                 MaintenanceTask.is_legal_compliance.is_(False),
@@ -2558,13 +2150,22 @@ def tasks_list():
         )
         if type_filter:
             query = query.filter(Equipment.type == type_filter)
-        # Fetch tasks WITH equipment eagerly loaded to avoid N+1 in loops
-        all_tasks_query = query.options(db.joinedload(MaintenanceTask.equipment_ref)).order_by(Equipment.code, Equipment.name, MaintenanceTask.id).all()
 
         current_time_for_list = datetime.utcnow() # Naive UTC
         logging.debug(f"Tasks List using current_time: {current_time_for_list}")
 
+        if due_filter in STATE_FILTERS:
+            query = query.filter(due_state_filter(STATE_FILTERS[due_filter], current_time_for_list)) # Indexed
+        # Fetch one page of tasks WITH equipment eagerly loaded to avoid N+1 in loops
+        pagination = query.options(db.joinedload(MaintenanceTask.equipment_ref)).order_by(
+            Equipment.code, Equipment.name, MaintenanceTask.id
+        ).paginate(page=page, per_page=TASKS_PER_PAGE, error_out=False)
+        all_tasks_query = pagination.items
+
+        task_statuses = calculate_task_statuses(all_tasks_query, current_time_for_list) # One pass, usage loaded once
+
         tasks_by_equipment = defaultdict(list) # Use defaultdict for easier appending
+        equipment_id_by_key = {}
         for task in all_tasks_query:
             # Ensure equipment_ref is loaded (should be by joinedload)
             if not task.equipment_ref:
@@ -2572,130 +2173,37 @@ def tasks_list():
                 continue
             eq_key = (task.equipment_ref.code, task.equipment_ref.name, task.equipment_ref.type)
             # Calculate status and add attributes directly to the task object
-            status, due_info, due_date_val, last_performed_info, next_due_info, estimated_days_info = \
-                calculate_task_due_status(task, current_time_for_list)
-            task.due_status = status # Store the full status string
-            task.due_info = due_info
-            task.due_date = due_date_val
-            task.last_performed_info = last_performed_info
-            task.next_due_info = next_due_info
-            task.estimated_days_info = estimated_days_info
+            task.due_status = task_statuses[task.id] # TaskDueStatus; formatted in the template
             tasks_by_equipment[eq_key].append(task)
-
-        # --- Define Status Priority AND Header Label Mapping ---
-        # Priority: Lower number = higher priority
-        # Label: The text to display in the header badge
-        status_config = {
-            # Base Status Key: (Priority, Header Label)
-            'Overdue':          (1, 'Overdue'),
-            'Due Soon':         (2, 'Due Soon'),
-            'Warning':          (3, 'Warning'),
-            'Error':            (4, 'Error'), # Separate Error from Warning?
-            'Never Performed':  (5, 'Never Done'),
-            'OK':               (6, 'OK'),
-            'Unknown':          (7, 'Unknown')
-            # Add other base statuses returned by calculate_task_due_status if needed
-        }
-        default_priority = 99
-        default_label = 'Unknown'
-        ok_priority = status_config.get('OK', (default_priority, default_label))[0]
-        ok_label = status_config.get('OK', (default_priority, default_label))[1]
-
+            equipment_id_by_key[eq_key] = task.equipment_id
 
         # --- Process tasks for sorting and header status ---
+        # Header shows the most urgent state in the group; anything ranked below OK
+        # (e.g. Unknown) still shows as OK. A group can span pages, so its tasks
+        # off this page count too (persisted columns, one grouped query).
+        ok_priority = STATE_PRIORITY[DueState.OK]
+        group_ranks = equipment_min_ranks(query, equipment_id_by_key.values(), current_time_for_list)
         processed_tasks_data = {}
         # Sort equipment keys alphabetically first
         sorted_equipment_keys = sorted(tasks_by_equipment.keys())
 
         for eq_key in sorted_equipment_keys:
             tasks_list_for_eq = tasks_by_equipment[eq_key]
-            highest_priority_level_found = ok_priority # Start assuming OK priority
-
-            # --- First pass: Find the highest priority level in the group ---
-            for task in tasks_list_for_eq:
-                # Ensure task has a status string before processing
-                if not hasattr(task, 'due_status') or not isinstance(task.due_status, str):
-                    logging.warning(f"Task {getattr(task, 'id', 'N/A')} missing valid due_status attribute. Assigning default priority.")
-                    current_prio = default_priority
-                else:
-                    # --- CORRECTED: Extract base status reliably ---
-                    # Handle variations like 'Overdue (First)', 'Due Soon (First)', 'Unknown (No Usage)' etc.
-                    # We want the core status word recognized by status_config keys
-                    current_status_str = task.due_status # e.g., "Due Soon (First)"
-                    current_prio = default_priority # Default if no match found below
-                    matched_base = None
-
-                    # Check for specific keywords IN ORDER OF PRIORITY (most specific first)
-                    # This ensures "Due Soon" is caught before just "Due" if that were a key
-                    if 'Overdue' in current_status_str: matched_base = 'Overdue'
-                    elif 'Due Soon' in current_status_str: matched_base = 'Due Soon'
-                    elif 'Warning' in current_status_str: matched_base = 'Warning'
-                    elif 'Error' in current_status_str: matched_base = 'Error'
-                    elif 'Never Performed' in current_status_str: matched_base = 'Never Performed'
-                    elif 'OK' in current_status_str: matched_base = 'OK' # Must be checked after more specific ones
-                    elif 'Unknown' in current_status_str: matched_base = 'Unknown'
-                    # Add elif for other specific statuses if needed
-
-                    # Get priority from config if a base status was matched
-                    if matched_base and matched_base in status_config:
-                        current_prio = status_config[matched_base][0]
-                    else:
-                        # Log if status wasn't mapped - indicates potential need to update status_config
-                         logging.warning(f"Status '{current_status_str}' for task {task.id} did not map to a known base status in status_config. Using default priority.")
-                         # current_prio remains default_priority
-
-                # Update the highest priority level found so far
-                if current_prio < highest_priority_level_found:
-                    highest_priority_level_found = current_prio
-                    logging.debug(f"  Eq {eq_key}: New highest prio level found: {highest_priority_level_found} from task {task.id} (status: {task.due_status})")
-
-
-            # --- Determine the final header label based on the highest priority level found ---
-            final_header_label = default_label # Default
-            # Find the label corresponding to the highest priority level achieved
-            for base_status, (prio, label) in status_config.items():
-                if prio == highest_priority_level_found:
-                    final_header_label = label
-                    break # Found the matching label
-            logging.debug(f"Eq {eq_key}: Final highest prio level: {highest_priority_level_found}, Assigned Header Label: '{final_header_label}'")
-
-            # --- Second pass (or combined): Sort the tasks list itself ---
-            # Use a stable sort key function referencing the config
-            def get_tasks_sort_key(task_item):
-                sort_prio = default_priority # Default
-                sort_matched_base = None
-                if hasattr(task_item, 'due_status') and isinstance(task_item.due_status, str):
-                    status_str = task_item.due_status
-                    # Use same matching logic as priority finding for consistency
-                    if 'Overdue' in status_str: sort_matched_base = 'Overdue'
-                    elif 'Due Soon' in status_str: sort_matched_base = 'Due Soon'
-                    elif 'Warning' in status_str: sort_matched_base = 'Warning'
-                    elif 'Error' in status_str: sort_matched_base = 'Error'
-                    elif 'Never Performed' in status_str: sort_matched_base = 'Never Performed'
-                    elif 'OK' in status_str: sort_matched_base = 'OK'
-                    elif 'Unknown' in status_str: sort_matched_base = 'Unknown'
-
-                    if sort_matched_base and sort_matched_base in status_config:
-                        sort_prio = status_config[sort_matched_base][0]
-
-                # Add secondary sort criteria if needed (e.g., by due date/remaining value within the same status)
-                # return (sort_prio, task_item.due_date or date.max) # Example secondary sort
-                return sort_prio
+            # Stable sort by priority rank keeps the original order within a state
+            tasks_list_for_eq.sort(key=lambda task_item: task_item.due_status.priority)
 
-            try:
-                 tasks_list_for_eq.sort(key=get_tasks_sort_key)
-            except Exception as eq_sort_exc:
-                logging.error(f"Error sorting tasks for equipment {eq_key}: {eq_sort_exc}", exc_info=True)
-                # Use unsorted list on error
+            header_priority = min(tasks_list_for_eq[0].due_status.priority,
+                                  group_ranks.get(equipment_id_by_key[eq_key], ok_priority))
+            header_state = STATE_BY_PRIORITY[header_priority] if header_priority < ok_priority else DueState.OK
+            logging.debug(f"Eq {eq_key}: Header state: {header_state.value}")
 
-            # Store the sorted list and the final header status label
+            # Store the sorted list and the header state (label rendered in the template)
             processed_tasks_data[eq_key] = {
                 'tasks': tasks_list_for_eq,
-                'header_status': final_header_label # Use the label derived from the highest priority
+                'header_state': header_state
             }
 
-        equipment_types = db.session.query(Equipment.type).distinct().order_by(Equipment.type).all()
-        equipment_types = [t[0] for t in equipment_types]
+        equipment_types = get_facets('equipment_types')['equipment_types']
 
         logging.debug("--- Rendering pm_tasks.html ---")
         return render_template(
@@ -2703,6 +2211,10 @@ def tasks_list():
             tasks_data=processed_tasks_data, # Pass the new structure
             equipment_types=equipment_types,
             type_filter=type_filter,
+            due_filter=due_filter,
+            due_filters=STATE_FILTERS.keys(),
+            pagination=pagination,
+            query_params={k: v for k, v in request.args.items() if k != 'page'},
             title='Maintenance Tasks'
         )
     except Exception as e:
@@ -2713,6 +2225,10 @@ def tasks_list():
                                tasks_data={},
                                equipment_types=[],
                                type_filter=request.args.get('type'),
+                               due_filter=request.args.get('due'),
+                               due_filters=STATE_FILTERS.keys(),
+                               pagination=None,
+                               query_params={},
                                title='Maintenance Tasks',
                                error=True)
 
@@ -2764,6 +2280,8 @@ def add_task():
                 kit_required=kit_required
             )
             db.session.add(new_task)
+            db.session.flush() # Assign id before computing due status
+            refresh_task_due_columns(tasks=[new_task])
             db.session.commit()
             flash(f'Maintenance task "{description}" added successfully!', 'success')
             return redirect(url_for('planned_maintenance.tasks_list'))
@@ -2841,6 +2359,7 @@ def edit_task(id):
             task_to_edit.oem_required = oem_required
             task_to_edit.kit_required = kit_required
             task_to_edit.is_legal_compliance = is_legal_compliance # Update the flag
+            refresh_task_due_columns(tasks=[task_to_edit]) # Interval/equipment may have changed
 
             db.session.commit()
             flash(f'Task "{task_to_edit.description}" updated successfully!', 'success')
@@ -2934,72 +2453,13 @@ def add_usage():
                 flash(f"Equipment with ID {equipment_id} not found.", "danger")
                 return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
 
-            # --- Validation 1: Prevent duplicate records (same machine, same datetime) ---
-            existing_log_at_same_time = UsageLog.query.filter_by(
-                equipment_id=equipment_id, 
-                log_date=log_date_dt # Compare UTC with UTC
-            ).first()
-            if existing_log_at_same_time:
-                flash(f"A usage log for {equipment.code} already exists at {log_date_dt.strftime('%Y-%m-%d %H:%M:%S %Z')}.", "warning")
-                return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
-
-            # --- Fetch previous and next logs for chronological validation ---
-            previous_log = UsageLog.query.filter(
-                UsageLog.equipment_id == equipment_id,
-                UsageLog.log_date < log_date_dt # Compare UTC with UTC
-            ).order_by(UsageLog.log_date.desc()).first()
-
-            next_log = UsageLog.query.filter(
-                UsageLog.equipment_id == equipment_id,
-                UsageLog.log_date > log_date_dt # Compare UTC with UTC
-            ).order_by(UsageLog.log_date.asc()).first()
-
-            # --- Validation 2a: Usage cannot be less than previously recorded ---
-            if previous_log and usage_value < previous_log.usage_value:
-                prev_log_time_str = previous_log.log_date.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
-                flash(f"Usage value ({usage_value:.2f}) cannot be less than the previous log's value "
-                      f"({previous_log.usage_value:.2f} recorded on {prev_log_time_str}).", "warning")
-                return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
-
-            # --- Validation 2b: Usage cannot be more than a subsequent existing log ---
-            if next_log and usage_value > next_log.usage_value:
-                next_log_time_str = next_log.log_date.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
-                flash(f"Usage value ({usage_value:.2f}) cannot be greater than the next log's value "
-                      f"({next_log.usage_value:.2f} recorded on {next_log_time_str}). "
-                      f"You might be trying to insert a log out of sequence.", "warning")
+            # --- Validation: no duplicate timestamp, chronological order, plausible increase (one query) ---
+            reading = UsageReading(0, equipment_id, usage_value, log_date_dt)
+            if validate_usage_reading(reading) or not insert_usage_logs([reading]):
+                flash(f"Usage log for {equipment.code} not added: {reading.error}", "warning")
                 return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
 
-            # --- Validation 3: Limit unreasonable usage increase ---
-            if previous_log:
-                usage_difference = usage_value - previous_log.usage_value
-                # Ensure previous_log.log_date is timezone-aware UTC for accurate calculations
-                prev_log_date_utc = previous_log.log_date
-                if prev_log_date_utc.tzinfo is None: # Should not happen if model default is used
-                    prev_log_date_utc = prev_log_date_utc.replace(tzinfo=timezone.utc)
-                else:
-                    prev_log_date_utc = prev_log_date_utc.astimezone(timezone.utc)
-
-                calendar_days_spanned = (log_date_dt.date() - prev_log_date_utc.date()).days
-                current_max_increase_threshold = MAX_REASONABLE_DAILY_USAGE_INCREASE
-                
-                if calendar_days_spanned == 0: # Same calendar day
-                    if usage_difference > current_max_increase_threshold:
-                        flash(f"Usage increase of {usage_difference:.2f} on the same day ({log_date_dt.strftime('%Y-%m-%d')}) "
-                              f"is too high. Max allowed daily increase is {current_max_increase_threshold:.2f}.", "warning")
-                        return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
-                elif calendar_days_spanned > 0: # Spans one or more full calendar days
-                    max_allowed_increase_for_period = current_max_increase_threshold * calendar_days_spanned
-                    if usage_difference > max_allowed_increase_for_period:
-                        flash(f"Usage increase of {usage_difference:.2f} over {calendar_days_spanned} day(s) "
-                              f"(from {prev_log_date_utc.strftime('%Y-%m-%d')} to {log_date_dt.strftime('%Y-%m-%d')}) "
-                              f"is too high. Max allowed for this period is {max_allowed_increase_for_period:.2f} "
-                              f"(based on {current_max_increase_threshold:.2f}/day).", "warning")
-                        return redirect(request.referrer or url_for('planned_maintenance.dashboard'))
-                # No 'else' needed for calendar_days_spanned < 0, as previous_log query ensures it's earlier.
-
-            # All validations passed, create and save the log
-            new_usage_log = UsageLog(equipment_id=equipment_id, usage_value=usage_value, log_date=log_date_dt) # Store UTC
-            db.session.add(new_usage_log)
+            refresh_task_due_columns(equipment_ids=[equipment_id], usage_only=True) # Hours/km tasks depend on latest usage
             db.session.commit()
             flash(f"Usage log for {equipment.code} added successfully for {log_date_dt.strftime('%Y-%m-%d %H:%M UTC')}.", "success")
 
@@ -3019,48 +2479,18 @@ def add_usage():
 
 def generate_next_job_number(job_type='MAINT'):
     """
-    Generates the next sequential job number with type distinction.
-    
+    Issues the next sequential job number with type distinction.
+
     Args:
         job_type (str): Type of job - 'MAINT' for maintenance or 'LEGAL' for legal compliance
                        This will add a prefix to the job number
-    
+
     Returns:
-        str: Formatted job number with type distinction
+        str: Formatted job number with type distinction, e.g. "JC-24-0001" or "LC-24-0001".
+             The number is reserved by the current transaction (see job_numbers.py), so
+             commit or roll back promptly.
     """
-    # Validate and standardize job_type
-    if job_type.upper() not in ['MAINT', 'LEGAL']:
-        logging.warning(f"Invalid job_type '{job_type}'. Defaulting to 'MAINT'.")
-        job_type = 'MAINT'
-    
-    job_type = job_type.upper()  # Ensure uppercase
-    
-    # Define prefix for the specific job type
-    if job_type == 'LEGAL':
-        type_prefix = 'LC'  # Legal Compliance
-    else:
-        type_prefix = 'JC'  # Job Card (maintenance)
-    
-    # Create date portion of the prefix
-    date_prefix = f"{datetime.now(timezone.utc).strftime('%y')}"
-    
-    # Complete prefix including type and date
-    prefix = f"{type_prefix}-{date_prefix}-"
-    
-    # Find the last job card with this prefix
-    last_jc = JobCard.query.filter(JobCard.job_number.like(f"{prefix}%")).order_by(JobCard.id.desc()).first()
-    
-    next_num = 1
-    
-    if last_jc:
-        try:
-            last_num_part = last_jc.job_number[len(prefix):]
-            next_num = int(last_num_part) + 1
-        except (ValueError, IndexError):
-            logging.warning(f"Could not parse sequence number from last job card '{last_jc.job_number}'. Resetting sequence for prefix {prefix}.")
-            next_num = 1  # Reset if parsing fails
-    
-    return f"{prefix}{next_num:04d}"  # e.g., "JC-24-0001" or "LC-24-0001"
+    return allocate_job_number(job_type)
 # ==============================================================================
 # === Log Views ===
 # ==============================================================================
@@ -3116,6 +2546,7 @@ def checklist_logs():
                                    title='Checklist Log Matrix', **common_template_args)
 
         equipment_ids = [eq.id for eq in all_equipment]
+        attach_latest_logs(all_equipment) # Last known checklist/usage, even outside the window
 
         range_start_dt_utc = datetime.combine(current_start_date, time.min).replace(tzinfo=timezone.utc)
         range_end_dt_utc = datetime.combine(current_end_date, time.max).replace(tzinfo=timezone.utc)
@@ -3124,8 +2555,6 @@ def checklist_logs():
             Checklist.equipment_id.in_(equipment_ids),
             Checklist.check_date >= range_start_dt_utc,
             Checklist.check_date <= range_end_dt_utc
-        ).options(
-            db.joinedload(Checklist.equipment_ref)
         ).order_by(
             Checklist.equipment_id,
             Checklist.check_date
@@ -3185,6 +2614,60 @@ def checklist_logs():
                                title='Checklist Log Matrix - Error',
                                **error_template_args)
 
+@bp.route('/checklist_compliance', methods=['GET'])
+@login_required
+def checklist_compliance():
+    """Checklist compliance heatmap (equipment x day) over a month, a quarter or any range up to a year."""
+    today = date.today()
+    try:
+        first_day, last_day = parse_compliance_range(request.args.get('start'), request.args.get('end'), today)
+    except ValueError as e:
+        flash(f"{e} Showing the default period.", "warning")
+        first_day, last_day = parse_compliance_range(None, None, today)
+    type_filter = request.args.get('type')
+
+    equipment_list = compliance_equipment(type_filter)
+    compliance = get_checklist_compliance(equipment_list, first_day, last_day)
+    presets = [ # (label, start, end)
+        ('Last 30 Days', today - timedelta(days=29), today),
+        ('This Month', today.replace(day=1), today),
+        ('Last 90 Days', today - timedelta(days=89), today),
+        ('This Year', today.replace(month=1, day=1), today),
+    ]
+    return render_template('pm_checklist_compliance.html',
+                           title=f'Checklist Compliance: {first_day.strftime("%b %d")} - {last_day.strftime("%b %d, %Y")}',
+                           compliance=compliance,
+                           first_day=first_day,
+                           last_day=last_day,
+                           presets=presets,
+                           max_days=CHECKLIST_COMPLIANCE_MAX_DAYS,
+                           type_filter=type_filter,
+                           equipment_types=get_facets('equipment_types')['equipment_types'])
+
+@bp.route('/checklists/missing/print', methods=['GET'])
+@login_required
+def missing_checklists_print():
+    """Printable shift report of operational equipment without a checklist today, yesterday or this week."""
+    period = request.args.get('period', 'today')
+    try:
+        first_day, last_day = missing_checklist_range(period, date.today())
+    except ValueError as e:
+        flash(str(e), "warning")
+        period = 'today'
+        first_day, last_day = missing_checklist_range(period, date.today())
+    type_filter = request.args.get('type')
+    missing = find_missing_checklists(first_day, last_day, type_filter)
+    return render_template('pm_missing_checklists_print.html',
+                           title=f'Missing Checklists: {MISSING_CHECKLIST_PERIOD_LABELS[period]}',
+                           missing=missing,
+                           period=period,
+                           periods=MISSING_CHECKLIST_PERIOD_LABELS,
+                           first_day=first_day,
+                           last_day=last_day,
+                           type_filter=type_filter,
+                           equipment_types=get_facets('equipment_types')['equipment_types'],
+                           generated_at=datetime.now(timezone.utc))
+
 @bp.route('/usage_logs', methods=['GET'])
 @login_required
 def usage_logs():
@@ -3230,56 +2713,19 @@ def usage_logs():
                                    title='Usage Log Matrix', **common_template_args)
 
         equipment_ids = [eq.id for eq in all_equipment]
-        range_start_dt_utc = datetime.combine(current_start_date, time.min).replace(tzinfo=timezone.utc)
-        range_end_dt_utc = datetime.combine(current_end_date, time.max).replace(tzinfo=timezone.utc)
+        attach_latest_logs(all_equipment) # Last known checklist/usage, even outside the window
+        # One row per equipment and day from the usage_daily rollup; the
+        # individual logs of a cell are loaded on demand by the modal
+        usage_days = get_usage_days(equipment_ids, current_start_date, current_end_date)
+        processed_data = defaultdict(dict)
+        for eq_id, days in usage_days.items():
+            for day, usage_day in days.items():
+                processed_data[eq_id][day] = {
+                    'count': usage_day.reading_count,
+                    'latest_value': usage_day.last_value,
+                    'latest_timestamp_utc': usage_day.last_log_date.replace(tzinfo=timezone.utc),
+                }
 
-        relevant_logs_query = UsageLog.query.filter(
-            UsageLog.equipment_id.in_(equipment_ids),
-            UsageLog.log_date >= range_start_dt_utc,
-            UsageLog.log_date <= range_end_dt_utc
-        ).options(
-            db.joinedload(UsageLog.equipment_ref)
-        ).order_by( # Crucial: order by log_date ASC to easily get the latest by overwriting
-            UsageLog.equipment_id,
-            UsageLog.log_date # Ascending order means later logs for the same day come later
-        )
-        relevant_logs = relevant_logs_query.all()
-        logging.debug(f"Found {len(relevant_logs)} usage logs within the date range.")
-
-        # Initialize processed_data to store count, latest_value, and latest_timestamp_utc
-        processed_data = defaultdict(lambda: defaultdict(lambda: {
-            'count': 0, 
-            'latest_value': None, 
-            'latest_timestamp_utc': None, # Store the actual datetime object
-            'logs': [] # For the modal
-        }))
-
-        for log in relevant_logs:
-            eq_id = log.equipment_id
-            log_date_utc = log.log_date
-            # Ensure log_date_utc is timezone-aware (UTC)
-            if log_date_utc.tzinfo is None:
-                log_date_utc = log_date_utc.replace(tzinfo=timezone.utc)
-            else:
-                log_date_utc = log_date_utc.astimezone(timezone.utc)
-            
-            log_date_only = log_date_utc.date() # Key for the inner dictionary
-
-            if current_start_date <= log_date_only <= current_end_date:
-                cell_data = processed_data[eq_id][log_date_only]
-                cell_data['count'] += 1
-                
-                # Since logs are ordered by log_date ascending,
-                # the current log's value will overwrite previous ones for the same day,
-                # effectively storing the latest.
-                cell_data['latest_value'] = log.usage_value
-                cell_data['latest_timestamp_utc'] = log_date_utc # Store the datetime object
-                
-                cell_data['logs'].append({
-                    'id': log.id, 'value': log.usage_value,
-                    'timestamp': log_date_utc.strftime('%Y-%m-%d %H:%M UTC') # Formatted for modal
-                })
-        
         logging.debug(f"Processed usage data structure contains entries for {len(processed_data)} equipment.")
         view_title = f'Usage Logs: {current_start_date.strftime("%b %d")} - {current_end_date.strftime("%b %d, %Y")}'
 
@@ -3306,6 +2752,76 @@ def usage_logs():
                                error=f"Could not load logs: {e}",
                                title='Usage Log Matrix - Error',
                                **error_template_args)
+
+# Periods offered by the usage history chart (days back from today)
+USAGE_HISTORY_PERIODS = (90, 365, 730, 1825)
+USAGE_HISTORY_DEFAULT_DAYS = 365
+USAGE_CHART_WIDTH = 1000
+USAGE_CHART_HEIGHT = 260
+USAGE_CHART_BAR_HEIGHT = 120
+
+
+def _usage_history_chart(series, first_day, last_day):
+    """
+    SVG coordinates for the usage history chart: a line of the end-of-day
+    readings and bars of the daily increases, scaled to the period.
+    """
+    span_days = max((last_day - first_day).days, 1)
+
+    def x_of(day):
+        return round((day - first_day).days / span_days * USAGE_CHART_WIDTH, 1)
+
+    values = [point['last_value'] for point in series]
+    low, high = (min(values), max(values)) if values else (0, 0)
+    value_range = (high - low) or 1
+    line = ' '.join(
+        f"{x_of(point['day'])},{round(USAGE_CHART_HEIGHT - (point['last_value'] - low) / value_range * USAGE_CHART_HEIGHT, 1)}"
+        for point in series
+    )
+
+    increases = [point['increase'] for point in series if point['increase'] is not None]
+    largest_increase = max([abs(increase) for increase in increases] or [0]) or 1
+    bar_width = max(USAGE_CHART_WIDTH / (span_days + 1), 1)
+    bars = []
+    for point in series:
+        if point['increase'] is None:
+            continue
+        bar_height = round(abs(point['increase']) / largest_increase * USAGE_CHART_BAR_HEIGHT, 1)
+        bars.append({
+            'x': x_of(point['day']), 'height': bar_height, 'y': USAGE_CHART_BAR_HEIGHT - bar_height,
+            'negative': point['increase'] < 0, 'point': point,
+        })
+    return {
+        'width': USAGE_CHART_WIDTH, 'height': USAGE_CHART_HEIGHT, 'bar_height': USAGE_CHART_BAR_HEIGHT,
+        'bar_width': round(bar_width, 1), 'line': line, 'bars': bars,
+        'low': low, 'high': high, 'largest_increase': largest_increase if increases else 0,
+        'total_increase': (values[-1] - values[0]) if len(values) > 1 else 0,
+    }
+
+
+@bp.route('/usage_logs/history/<int:equipment_id>', methods=['GET'])
+@login_required
+def usage_history(equipment_id):
+    """Long-range usage chart of one equipment item (end-of-day readings and daily increases) from usage_daily."""
+    equipment = Equipment.query.get_or_404(equipment_id)
+    days = request.args.get('days', USAGE_HISTORY_DEFAULT_DAYS, type=int)
+    if days not in USAGE_HISTORY_PERIODS:
+        days = USAGE_HISTORY_DEFAULT_DAYS
+    last_day = date.today()
+    first_day = last_day - timedelta(days=days - 1)
+
+    series = get_usage_history(equipment.id, first_day, last_day)
+    logging.debug(f"Usage history for {equipment.code}: {len(series)} day(s) with readings in the last {days} days.")
+    return render_template('pm_usage_history.html',
+                           title=f'Usage History: {equipment.code}',
+                           equipment=equipment,
+                           series=series,
+                           chart=_usage_history_chart(series, first_day, last_day),
+                           days=days,
+                           periods=USAGE_HISTORY_PERIODS,
+                           first_day=first_day,
+                           last_day=last_day)
+
 # ==============================================================================
 # === Legal Compliance Tasks List ===
 # ==============================================================================
@@ -3317,6 +2833,8 @@ def legal_tasks_list():
     try:
         type_filter = request.args.get('type')
         status_filter = request.args.get('status')
+        due_filter = (request.args.get('due') or '').lower() # Due-state filter, see STATE_FILTERS
+        page = request.args.get('page', 1, type=int)
         
         # First join Equipment to get access to its properties
         query = MaintenanceTask.query.join(Equipment).filter(MaintenanceTask.is_legal_compliance == True)
@@ -3333,13 +2851,21 @@ def legal_tasks_list():
         if type_filter:
             query = query.filter(Equipment.type == type_filter)
             
-        # Fetch tasks WITH equipment eagerly loaded to avoid N+1 in loops
-        all_tasks_query = query.options(db.joinedload(MaintenanceTask.equipment_ref)).order_by(Equipment.code, Equipment.name, MaintenanceTask.id).all()
-
         current_time_for_list = datetime.utcnow() # Naive UTC
         logging.debug(f"Legal Tasks List using current_time: {current_time_for_list}")
 
+        if due_filter in STATE_FILTERS:
+            query = query.filter(due_state_filter(STATE_FILTERS[due_filter], current_time_for_list)) # Indexed
+        # Fetch one page of tasks WITH equipment eagerly loaded to avoid N+1 in loops
+        pagination = query.options(db.joinedload(MaintenanceTask.equipment_ref)).order_by(
+            Equipment.code, Equipment.name, MaintenanceTask.id
+        ).paginate(page=page, per_page=TASKS_PER_PAGE, error_out=False)
+        all_tasks_query = pagination.items
+
+        task_statuses = calculate_task_statuses(all_tasks_query, current_time_for_list) # One pass, usage loaded once
+
         tasks_by_equipment = defaultdict(list) # Use defaultdict for easier appending
+        equipment_id_by_key = {}
         for task in all_tasks_query:
             # Ensure equipment_ref is loaded (should be by joinedload)
             if not task.equipment_ref:
@@ -3347,131 +2873,38 @@ def legal_tasks_list():
                 continue
             eq_key = (task.equipment_ref.code, task.equipment_ref.name, task.equipment_ref.type)
             # Calculate status and add attributes directly to the task object
-            status, due_info, due_date_val, last_performed_info, next_due_info, estimated_days_info = \
-                calculate_task_due_status(task, current_time_for_list)
-            task.due_status = status # Store the full status string
-            task.due_info = due_info
-            task.due_date = due_date_val
-            task.last_performed_info = last_performed_info
-            task.next_due_info = next_due_info
-            task.estimated_days_info = estimated_days_info
+            task.due_status = task_statuses[task.id] # TaskDueStatus; formatted in the template
             tasks_by_equipment[eq_key].append(task)
-
-        # --- Define Status Priority AND Header Label Mapping ---
-        # Priority: Lower number = higher priority
-        # Label: The text to display in the header badge
-        status_config = {
-            # Base Status Key: (Priority, Header Label)
-            'Overdue':          (1, 'Overdue'),
-            'Due Soon':         (2, 'Due Soon'),
-            'Warning':          (3, 'Warning'),
-            'Error':            (4, 'Error'), # Separate Error from Warning?
-            'Never Performed':  (5, 'Never Done'),
-            'OK':               (6, 'OK'),
-            'Unknown':          (7, 'Unknown')
-            # Add other base statuses returned by calculate_task_due_status if needed
-        }
-        default_priority = 99
-        default_label = 'Unknown'
-        ok_priority = status_config.get('OK', (default_priority, default_label))[0]
-        ok_label = status_config.get('OK', (default_priority, default_label))[1]
-
+            equipment_id_by_key[eq_key] = task.equipment_id
 
         # --- Process tasks for sorting and header status ---
+        # Header shows the most urgent state in the group; anything ranked below OK
+        # (e.g. Unknown) still shows as OK. A group can span pages, so its tasks
+        # off this page count too (persisted columns, one grouped query).
+        ok_priority = STATE_PRIORITY[DueState.OK]
+        group_ranks = equipment_min_ranks(query, equipment_id_by_key.values(), current_time_for_list)
         processed_tasks_data = {}
         # Sort equipment keys alphabetically first
         sorted_equipment_keys = sorted(tasks_by_equipment.keys())
 
         for eq_key in sorted_equipment_keys:
             tasks_list_for_eq = tasks_by_equipment[eq_key]
-            highest_priority_level_found = ok_priority # Start assuming OK priority
-
-            # --- First pass: Find the highest priority level in the group ---
-            for task in tasks_list_for_eq:
-                # Ensure task has a status string before processing
-                if not hasattr(task, 'due_status') or not isinstance(task.due_status, str):
-                    logging.warning(f"Task {getattr(task, 'id', 'N/A')} missing valid due_status attribute. Assigning default priority.")
-                    current_prio = default_priority
-                else:
-                    # --- CORRECTED: Extract base status reliably ---
-                    # Handle variations like 'Overdue (First)', 'Due Soon (First)', 'Unknown (No Usage)' etc.
-                    # We want the core status word recognized by status_config keys
-                    current_status_str = task.due_status # e.g., "Due Soon (First)"
-                    current_prio = default_priority # Default if no match found below
-                    matched_base = None
-
-                    # Check for specific keywords IN ORDER OF PRIORITY (most specific first)
-                    # This ensures "Due Soon" is caught before just "Due" if that were a key
-                    if 'Overdue' in current_status_str: matched_base = 'Overdue'
-                    elif 'Due Soon' in current_status_str: matched_base = 'Due Soon'
-                    elif 'Warning' in current_status_str: matched_base = 'Warning'
-                    elif 'Error' in current_status_str: matched_base = 'Error'
-                    elif 'Never Performed' in current_status_str: matched_base = 'Never Performed'
-                    elif 'OK' in current_status_str: matched_base = 'OK' # Must be checked after more specific ones
-                    elif 'Unknown' in current_status_str: matched_base = 'Unknown'
-                    # Add elif for other specific statuses if needed
-
-                    # Get priority from config if a base status was matched
-                    if matched_base and matched_base in status_config:
-                        current_prio = status_config[matched_base][0]
-                    else:
-                        # Log if status wasn't mapped - indicates potential need to update status_config
-                         logging.warning(f"Status '{current_status_str}' for task {task.id} did not map to a known base status in status_config. Using default priority.")
-                         # current_prio remains default_priority
-
-                # Update the highest priority level found so far
-                if current_prio < highest_priority_level_found:
-                    highest_priority_level_found = current_prio
-                    logging.debug(f"  Eq {eq_key}: New highest prio level found: {highest_priority_level_found} from task {task.id} (status: {task.due_status})")
-
-
-            # --- Determine the final header label based on the highest priority level found ---
-            final_header_label = default_label # Default
-            # Find the label corresponding to the highest priority level achieved
-            for base_status, (prio, label) in status_config.items():
-                if prio == highest_priority_level_found:
-                    final_header_label = label
-                    break # Found the matching label
-            logging.debug(f"Eq {eq_key}: Final highest prio level: {highest_priority_level_found}, Assigned Header Label: '{final_header_label}'")
-
-            # --- Second pass (or combined): Sort the tasks list itself ---
-            # Use a stable sort key function referencing the config
-            def get_tasks_sort_key(task_item):
-                sort_prio = default_priority # Default
-                sort_matched_base = None
-                if hasattr(task_item, 'due_status') and isinstance(task_item.due_status, str):
-                    status_str = task_item.due_status
-                    # Use same matching logic as priority finding for consistency
-                    if 'Overdue' in status_str: sort_matched_base = 'Overdue'
-                    elif 'Due Soon' in status_str: sort_matched_base = 'Due Soon'
-                    elif 'Warning' in status_str: sort_matched_base = 'Warning'
-                    elif 'Error' in status_str: sort_matched_base = 'Error'
-                    elif 'Never Performed' in status_str: sort_matched_base = 'Never Performed'
-                    elif 'OK' in status_str: sort_matched_base = 'OK'
-                    elif 'Unknown' in status_str: sort_matched_base = 'Unknown'
-
-                    if sort_matched_base and sort_matched_base in status_config:
-                        sort_prio = status_config[sort_matched_base][0]
-
-                # Add secondary sort criteria if needed (e.g., by due date/remaining value within the same status)
-                # return (sort_prio, task_item.due_date or date.max) # Example secondary sort
-                return sort_prio
+            # Stable sort by priority rank keeps the original order within a state
+            tasks_list_for_eq.sort(key=lambda task_item: task_item.due_status.priority)
 
-            try:
-                 tasks_list_for_eq.sort(key=get_tasks_sort_key)
-            except Exception as eq_sort_exc:
-                logging.error(f"Error sorting tasks for equipment {eq_key}: {eq_sort_exc}", exc_info=True)
-                # Use unsorted list on error
+            header_priority = min(tasks_list_for_eq[0].due_status.priority,
+                                  group_ranks.get(equipment_id_by_key[eq_key], ok_priority))
+            header_state = STATE_BY_PRIORITY[header_priority] if header_priority < ok_priority else DueState.OK
+            logging.debug(f"Eq {eq_key}: Header state: {header_state.value}")
 
-            # Store the sorted list and the final header status label
+            # Store the sorted list and the header state (label rendered in the template)
             processed_tasks_data[eq_key] = {
                 'tasks': tasks_list_for_eq,
-                'header_status': final_header_label # Use the label derived from the highest priority
+                'header_state': header_state
             }
 
         # Get list of equipment types for filter dropdown
-        equipment_types = db.session.query(Equipment.type).distinct().order_by(Equipment.type).all()
-        equipment_types = [t[0] for t in equipment_types]
+        equipment_types = get_facets('equipment_types')['equipment_types']
         
         # Get list of equipment statuses for filter dropdown (adding status filter)
         equipment_statuses = ['Operational'] + [status for status in EQUIPMENT_STATUSES if status != 'Operational']
@@ -3484,6 +2917,10 @@ def legal_tasks_list():
             equipment_statuses=equipment_statuses,  # Add statuses for dropdown
             type_filter=type_filter,
             status_filter=status_filter,  # Pass the status filter to template
+            due_filter=due_filter,
+            due_filters=STATE_FILTERS.keys(),
+            pagination=pagination,
+            query_params={k: v for k, v in request.args.items() if k != 'page'},
             title='Legal Compliance Tasks'
         )
     except Exception as e:
@@ -3496,6 +2933,10 @@ def legal_tasks_list():
                                equipment_statuses=EQUIPMENT_STATUSES,  # Add statuses for dropdown
                                type_filter=request.args.get('type'),
                                status_filter=request.args.get('status'),  # Pass the status filter
+                               due_filter=request.args.get('due'),
+                               due_filters=STATE_FILTERS.keys(),
+                               pagination=None,
+                               query_params={},
                                title='Legal Compliance Tasks',
                                error=True)
 
@@ -3549,6 +2990,8 @@ def add_legal_task():
                 is_legal_compliance=True  # Set legal compliance flag to True
             )
             db.session.add(new_task)
+            db.session.flush() # Assign id before computing due status
+            refresh_task_due_columns(tasks=[new_task])
             db.session.commit()
             flash(f'Legal compliance task "{description}" added successfully!', 'success')
             return redirect(url_for('planned_maintenance.legal_tasks_list'))
@@ -3635,6 +3078,75 @@ def get_logs_for_cell():
         logging.error(f"Error fetching logs for cell: {e}", exc_info=True)
         return jsonify({'error': 'Server error fetching log details'}), 500
 
+# === AJAX Endpoint to prefetch the logs of a whole matrix window ===
+LOG_WINDOW_MAX_DAYS = 31
+_URL_ID_PLACEHOLDER = 2147483647 # Replaced by '{id}' in URL templates
+
+# log_type -> (model, date column, endpoints of the row actions, row columns after id and time)
+LOG_WINDOW_TYPES = {
+    'checklist': (Checklist, Checklist.check_date, 'edit_checklist_log_form', 'delete_checklist_log',
+                  (('status', Checklist.status), ('issues', Checklist.issues), ('operator', Checklist.operator))),
+    'usage': (UsageLog, UsageLog.log_date, 'edit_usage_log_form', 'delete_usage_log',
+              (('value', UsageLog.usage_value),)),
+}
+
+
+def _url_template(endpoint):
+    """URL of a per-log endpoint with '{id}' in place of the log id."""
+    return url_for(f'planned_maintenance.{endpoint}', log_id=_URL_ID_PLACEHOLDER).replace(str(_URL_ID_PLACEHOLDER), '{id}')
+
+
+@bp.route('/logs/window', methods=['GET'])
+@login_required
+@conditional_on(Checklist, UsageLog)
+def get_logs_for_window():
+    """
+    All checklist or usage logs of a matrix window (equipment x days) in one
+    response, so the cell modals open without a request each.
+    Query parameters: log_type ('checklist'/'usage'), start, end (YYYY-MM-DD,
+    at most LOG_WINDOW_MAX_DAYS days), equipment_id (repeatable; default all).
+
+    Returns:
+        JSON: 'columns' of a row, 'edit_url'/'delete_url' templates ('{id}'),
+              and 'cells': {equipment_id: {YYYY-MM-DD: [row, ...]}}, rows latest first.
+    """
+    log_type = request.args.get('log_type')
+    if log_type not in LOG_WINDOW_TYPES:
+        return jsonify({'error': 'Invalid log type'}), 400
+    try:
+        first_day = date.fromisoformat(request.args.get('start', ''))
+        last_day = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    if not 0 <= (last_day - first_day).days < LOG_WINDOW_MAX_DAYS:
+        return jsonify({'error': f'Window must be 1 to {LOG_WINDOW_MAX_DAYS} days'}), 400
+
+    model, date_column, edit_endpoint, delete_endpoint, columns = LOG_WINDOW_TYPES[log_type]
+    query = db.session.query(model.id, model.equipment_id, date_column, *[column for _, column in columns]).filter(
+        date_column >= datetime.combine(first_day, time.min),
+        date_column < datetime.combine(last_day + timedelta(days=1), time.min),
+    )
+    equipment_ids = request.args.getlist('equipment_id', type=int)
+    if equipment_ids:
+        query = query.filter(model.equipment_id.in_(equipment_ids))
+
+    cells = defaultdict(lambda: defaultdict(list))
+    row_count = 0
+    for log_id, equipment_id, logged_at, *values in query.order_by(model.equipment_id, date_column.desc(), model.id.desc()):
+        logged_at = _to_naive_utc(logged_at)
+        cells[equipment_id][logged_at.date().isoformat()].append([log_id, logged_at.strftime('%H:%M:%S UTC'), *values])
+        row_count += 1
+    logging.debug(f"Log window {log_type} {first_day} - {last_day}: {row_count} log(s).")
+    return jsonify({
+        'log_type': log_type,
+        'start': first_day.isoformat(),
+        'end': last_day.isoformat(),
+        'columns': ['id', 'timestamp', *[name for name, _ in columns]],
+        'edit_url': _url_template(edit_endpoint),
+        'delete_url': _url_template(delete_endpoint),
+        'cells': cells,
+    })
+
 # === Route to RENDER Checklist Log Edit Form ===
 @bp.route('/checklist/edit/<int:log_id>', methods=['GET'])
 @login_required
@@ -3694,8 +3206,13 @@ def update_usage_log(log_id):
         if usage_value is None or usage_value < 0:
             return jsonify({'success': False, 'error': 'Usage value must be a non-negative number'}), 400
 
+        reading = UsageReading(0, log.equipment_id, usage_value, log.log_date)
+        if validate_usage_reading(reading, exclude_id=log.id):
+            return jsonify({'success': False, 'error': reading.error}), 400
+
         log.usage_value = usage_value
         logging.info(f"Updating UsageLog ID: {log.id}, Equipment: {log.equipment_id}, Date: {log.log_date}")
+        refresh_task_due_columns(equipment_ids=[log.equipment_id], usage_only=True)
         db.session.commit()
         logging.info(f"UsageLog ID: {log_id} updated successfully.")
         return jsonify({'success': True, 'message': f'Usage log ID {log.id} updated successfully.'})
@@ -3713,6 +3230,7 @@ def delete_usage_log(log_id):
         logging.info(f"User attempting to delete UsageLog ID: {log.id}, Equipment: {log.equipment_id}, Date: {log.log_date}, Value: {log.usage_value}")
         
         db.session.delete(log)
+        refresh_task_due_columns(equipment_ids=[log.equipment_id], usage_only=True)
         db.session.commit()
         logging.info(f"UsageLog ID: {log_id} deleted successfully.")
         return jsonify({'success': True, 'message': f'Usage log ID {log.id} deleted successfully.'})
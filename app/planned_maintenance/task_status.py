@@ -0,0 +1,387 @@
+# tkr_system/app/planned_maintenance/task_status.py
+import enum
+import logging
+from datetime import datetime, timedelta, time
+from sqlalchemy import and_, case, func, or_
+from app import db
+from app.models import MaintenanceTask
+from app.planned_maintenance.loaders import _to_naive_utc
+from app.planned_maintenance.usage_rates import get_usage_rates
+
+DUE_SOON_ESTIMATED_DAYS_THRESHOLD = 7
+USAGE_INTERVAL_TYPES = ('hours', 'km')
+
+
+class DueState(enum.Enum):
+    """Base due state of a task. The value is the label shown to users."""
+    OVERDUE = 'Overdue'
+    DUE_SOON = 'Due Soon'
+    WARNING = 'Warning'
+    ERROR = 'Error'
+    NEVER_PERFORMED = 'Never Performed'
+    OK = 'OK'
+    UNKNOWN = 'Unknown'
+
+
+# Lower number = higher priority (used for sorting and group headers)
+STATE_PRIORITY = {
+    DueState.OVERDUE: 1,
+    DueState.DUE_SOON: 2,
+    DueState.WARNING: 3,
+    DueState.ERROR: 4,
+    DueState.NEVER_PERFORMED: 5,
+    DueState.OK: 6,
+    DueState.UNKNOWN: 7,
+}
+
+# Rank -> state, for ranks computed in SQL
+STATE_BY_PRIORITY = {rank: state for state, rank in STATE_PRIORITY.items()}
+
+# States that need attention (shown on the dashboard)
+ACTIONABLE_STATES = frozenset({DueState.OVERDUE, DueState.DUE_SOON, DueState.WARNING, DueState.ERROR})
+
+# Values accepted by the `status` filter of the task lists and API
+STATE_FILTERS = {state.name.lower(): frozenset({state}) for state in DueState}
+STATE_FILTERS['actionable'] = ACTIONABLE_STATES
+
+# Reasons attached to a status when something could not be calculated
+NOTE_NO_USAGE_DATA = 'no_usage_data'
+NOTE_USAGE_AT_LAST_DONE_UNKNOWN = 'usage_at_last_done_unknown'
+NOTE_LOW_USAGE_RATE = 'low_usage_rate'
+NOTE_RATE_CALC_ERROR = 'rate_calc_error'
+NOTE_INSUFFICIENT_DATA = 'insufficient_data'
+NOTE_CALC_ERROR = 'calc_error'
+NOTE_UNKNOWN_INTERVAL = 'unknown_interval'
+
+
+class TaskDueStatus:
+    """
+    Due status of one maintenance task, as plain values.
+
+    Nothing here is pre-formatted; templates render it via the macros in
+    pm_partials/_task_status_macros.html.
+
+    Attributes:
+        task_id (int): The task this status belongs to.
+        state (DueState): Base state.
+        is_first (bool): True when the task was never performed and is measured
+            from zero usage (hours/km tasks only).
+        interval_type (str): 'hours', 'km' or 'days'.
+        interval_value (int): The task interval.
+        remaining (float|int|None): Units left until due (hours/km), or whole
+            days left (days tasks). Negative when overdue.
+        next_due_usage (float|None): Usage reading at which the task is due.
+        last_performed (datetime|None): Naive UTC time last performed.
+        last_performed_usage (float|None): Usage reading when last performed.
+        estimated_days (float|None): Estimated days until due (negative if past).
+        usage_rate (float|None): Average usage per day behind the estimate
+            (hours/km tasks only).
+        due_date (datetime|None): Due (or estimated due) datetime, naive UTC.
+        note (str|None): One of the NOTE_* constants, when a value is missing.
+        priority (int): Sort rank from STATE_PRIORITY (lower = more urgent).
+    """
+    __slots__ = ('task_id', 'state', 'is_first', 'interval_type', 'interval_value',
+                 'remaining', 'next_due_usage', 'last_performed', 'last_performed_usage',
+                 'estimated_days', 'usage_rate', 'due_date', 'note', 'priority')
+
+    def __init__(self, task, state, is_first=False, remaining=None, next_due_usage=None,
+                 last_performed=None, estimated_days=None, usage_rate=None, due_date=None, note=None):
+        self.task_id = task.id
+        self.interval_type = task.interval_type
+        self.interval_value = task.interval_value
+        self.last_performed_usage = task.last_performed_usage_value
+        self.state = state
+        self.is_first = is_first
+        self.remaining = remaining
+        self.next_due_usage = next_due_usage
+        self.last_performed = last_performed
+        self.estimated_days = estimated_days
+        self.usage_rate = usage_rate
+        self.due_date = due_date
+        self.note = note
+        self.priority = STATE_PRIORITY[state]
+
+    @property
+    def is_actionable(self):
+        return self.state in ACTIONABLE_STATES
+
+    @property
+    def sort_key(self):
+        """(priority, due_date) - tasks without a due date sort last within their state."""
+        return (self.priority, self.due_date or datetime.max)
+
+    def to_dict(self):
+        """Plain-value representation for API responses."""
+        return {
+            'state': self.state.name,
+            'is_first': self.is_first,
+            'priority': self.priority,
+            'remaining': self.remaining,
+            'next_due_usage': self.next_due_usage,
+            'estimated_days': self.estimated_days,
+            'usage_rate': self.usage_rate,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'note': self.note,
+        }
+
+    def __repr__(self):
+        return f"<TaskDueStatus task={self.task_id} {self.state.name}{' (first)' if self.is_first else ''} remaining={self.remaining} est_days={self.estimated_days}>"
+
+
+def _calculate_status(task, current_time, usage):
+    """Status calculation for one task, given its equipment's UsageRate (or None)."""
+    logging.debug(f"    Calculating status for Task {task.id} ({task.description}) for Eq {task.equipment_id}. current_time = {current_time}")
+    last_performed_dt = _to_naive_utc(task.last_performed)
+
+    if task.interval_type in USAGE_INTERVAL_TYPES:
+        if not usage:
+            return TaskDueStatus(task, DueState.UNKNOWN, last_performed=last_performed_dt, note=NOTE_NO_USAGE_DATA)
+
+        current_usage = usage.current_usage
+
+        if not last_performed_dt:
+            # Never performed: first service is due at interval_value on the meter
+            remaining = task.interval_value - current_usage
+            if remaining <= 0:
+                state = DueState.OVERDUE
+            elif remaining <= task.interval_value * 0.1:
+                state = DueState.DUE_SOON
+            else:
+                state = DueState.OK
+            return TaskDueStatus(task, state, is_first=True, remaining=remaining,
+                                 next_due_usage=task.interval_value)
+
+        last_performed_usage = task.last_performed_usage_value
+        if last_performed_usage is None:
+            return TaskDueStatus(task, DueState.WARNING, last_performed=last_performed_dt,
+                                 note=NOTE_USAGE_AT_LAST_DONE_UNKNOWN)
+
+        next_due_at_usage = last_performed_usage + task.interval_value
+        remaining = next_due_at_usage - current_usage
+
+        if remaining <= 0:
+            state = DueState.OVERDUE
+        elif remaining <= task.interval_value * 0.10:
+            state = DueState.DUE_SOON
+        else:
+            state = DueState.OK
+
+        numeric_estimated_days = None
+        usage_rate = None
+        due_date = None
+        note = None
+        if usage.rate is None:
+            note = NOTE_INSUFFICIENT_DATA
+        elif usage.rate < 0:
+            note = NOTE_RATE_CALC_ERROR # Readings going backwards over the window
+        elif not usage.is_usable:
+            note = NOTE_LOW_USAGE_RATE
+        else:
+            usage_rate = usage.rate
+            logging.debug(f"    Task {task.id}: Usage rate = {usage_rate:.2f} {task.interval_type}/day ({usage.samples} readings over {usage.window_days:.1f} days)")
+            numeric_estimated_days = remaining / usage_rate
+            try:
+                estimated_date_only = (current_time + timedelta(days=numeric_estimated_days)).date()
+                due_date = datetime.combine(estimated_date_only, time.min)
+                logging.debug(f"    Task {task.id}: Estimated due_date object set to: {due_date}")
+            except OverflowError:
+                logging.warning(f"    Task {task.id}: OverflowError calculating estimated due date (numeric_estimated_days={numeric_estimated_days}). due_date remains None.")
+            except Exception as date_calc_err:
+                logging.error(f"    Task {task.id}: Error calculating estimated due_date object: {date_calc_err}", exc_info=True)
+
+        if state == DueState.OK and numeric_estimated_days is not None and numeric_estimated_days <= DUE_SOON_ESTIMATED_DAYS_THRESHOLD:
+            logging.debug(f"    Task {task.id}: Status was OK, but estimated days ({numeric_estimated_days:.1f}) <= threshold ({DUE_SOON_ESTIMATED_DAYS_THRESHOLD}). Changing status to Due Soon.")
+            state = DueState.DUE_SOON
+        return TaskDueStatus(task, state, remaining=remaining, next_due_usage=next_due_at_usage,
+                             last_performed=last_performed_dt, estimated_days=numeric_estimated_days,
+                             usage_rate=usage_rate, due_date=due_date, note=note)
+
+    elif task.interval_type == 'days':
+        if not last_performed_dt:
+            return TaskDueStatus(task, DueState.NEVER_PERFORMED)
+
+        due_date = last_performed_dt + timedelta(days=task.interval_value)
+        logging.debug(f"    Task {task.id} ('days'): Calculated due_date = {due_date} (naive)")
+        try:
+            time_difference = due_date - current_time
+            days_until_due = time_difference.days
+            total_seconds_until_due = time_difference.total_seconds()
+        except TypeError:
+            logging.error(f"    Task {task.id}: TYPE ERROR during 'days_until_due' calculation!", exc_info=True)
+            return TaskDueStatus(task, DueState.ERROR, note=NOTE_CALC_ERROR)
+
+        if total_seconds_until_due < 0:
+            state = DueState.OVERDUE
+        elif days_until_due <= DUE_SOON_ESTIMATED_DAYS_THRESHOLD:
+            state = DueState.DUE_SOON
+        else:
+            state = DueState.OK
+        return TaskDueStatus(task, state, remaining=days_until_due, last_performed=last_performed_dt,
+                             estimated_days=total_seconds_until_due / (24 * 3600), due_date=due_date)
+    else:
+        return TaskDueStatus(task, DueState.UNKNOWN, last_performed=last_performed_dt, note=NOTE_UNKNOWN_INTERVAL)
+
+
+def calculate_task_statuses(tasks, current_time, usage_rates=None):
+    """
+    Calculates the due status of many tasks in one pass.
+
+    Current readings and usage rates for every equipment with an hours/km task
+    come from the cached usage-rate model (see usage_rates.get_usage_rates).
+
+    Args:
+        tasks (list[MaintenanceTask]): Tasks to evaluate.
+        current_time (datetime): Reference time (naive UTC or aware).
+        usage_rates (dict, optional): {equipment_id: UsageRate}, if the caller
+            already has it.
+
+    Returns:
+        dict: {task.id: TaskDueStatus}
+    """
+    current_time = _to_naive_utc(current_time)
+
+    if usage_rates is None:
+        usage_equipment_ids = {t.equipment_id for t in tasks if t.interval_type in USAGE_INTERVAL_TYPES}
+        usage_rates = get_usage_rates(usage_equipment_ids)
+
+    results = {}
+    for task in tasks:
+        results[task.id] = _calculate_status(task, current_time, usage_rates.get(task.equipment_id))
+    return results
+
+
+# ==============================================================================
+# === Persisted due columns (MaintenanceTask.next_due_date / next_due_usage / status_rank) ===
+# ==============================================================================
+# status_rank is exact for hours/km tasks until the next usage log or completion.
+# For 'days' tasks the state moves with the clock, so queries derive it from
+# next_due_date instead (see due_state_filter).
+
+def apply_due_status(task, status):
+    """Copies a TaskDueStatus onto the task's persisted due columns."""
+    task.next_due_date = status.due_date
+    task.next_due_usage = status.next_due_usage
+    task.status_rank = status.priority
+
+
+def refresh_task_due_columns(tasks=None, equipment_ids=None, usage_only=False, current_time=None):
+    """
+    Recomputes the persisted due columns for the given tasks, or for every task
+    of the given equipment ids. Adds to the session; the caller commits.
+
+    Args:
+        tasks (list[MaintenanceTask], optional): Tasks to refresh.
+        equipment_ids (iterable, optional): Refresh all tasks of this equipment
+            (used when usage logs change). Ignored if `tasks` is given.
+        usage_only (bool): With equipment_ids, only refresh hours/km tasks.
+        current_time (datetime, optional): Defaults to now (naive UTC).
+
+    Returns:
+        int: Number of tasks refreshed.
+    """
+    if tasks is None:
+        if not equipment_ids:
+            return 0
+        query = MaintenanceTask.query.filter(MaintenanceTask.equipment_id.in_(list(set(equipment_ids))))
+        if usage_only:
+            query = query.filter(MaintenanceTask.interval_type.in_(USAGE_INTERVAL_TYPES))
+        tasks = query.all()
+    if not tasks:
+        return 0
+
+    statuses = calculate_task_statuses(tasks, current_time or datetime.utcnow())
+    for task in tasks:
+        apply_due_status(task, statuses[task.id])
+    logging.debug(f"Refreshed persisted due columns for {len(tasks)} task(s).")
+    return len(tasks)
+
+
+def rebuild_all_task_due_columns(batch_size=500):
+    """Recomputes the due columns of every task in batches and commits. Returns the task count."""
+    total = 0
+    current_time = datetime.utcnow()
+    last_id = 0
+    while True:
+        batch = MaintenanceTask.query.filter(
+            MaintenanceTask.id > last_id
+        ).order_by(MaintenanceTask.id).limit(batch_size).all()
+        if not batch:
+            break
+        total += refresh_task_due_columns(tasks=batch, current_time=current_time)
+        db.session.commit()
+        last_id = batch[-1].id
+    return total
+
+
+def due_state_filter(states, current_time):
+    """
+    SQL condition matching tasks whose *current* due state is in `states`,
+    using the indexed persisted columns.
+
+    'days' tasks are classified from next_due_date against current_time, with
+    the same thresholds as _calculate_status; all other tasks use status_rank.
+
+    Args:
+        states (iterable[DueState]): States to match.
+        current_time (datetime): Reference time (naive UTC).
+    """
+    states = set(states)
+    current_time = _to_naive_utc(current_time)
+    # timedelta.days <= threshold  <=>  due - now < threshold + 1 days
+    due_soon_limit = current_time + timedelta(days=DUE_SOON_ESTIMATED_DAYS_THRESHOLD + 1)
+
+    days_conditions = []
+    if DueState.OVERDUE in states:
+        days_conditions.append(MaintenanceTask.next_due_date < current_time)
+    if DueState.DUE_SOON in states:
+        days_conditions.append(and_(MaintenanceTask.next_due_date >= current_time,
+                                    MaintenanceTask.next_due_date < due_soon_limit))
+    if DueState.OK in states:
+        days_conditions.append(MaintenanceTask.next_due_date >= due_soon_limit)
+    if DueState.NEVER_PERFORMED in states:
+        days_conditions.append(MaintenanceTask.next_due_date.is_(None))
+
+    conditions = [and_(MaintenanceTask.interval_type != 'days',
+                       MaintenanceTask.status_rank.in_([STATE_PRIORITY[st] for st in states]))]
+    if days_conditions:
+        conditions.append(and_(MaintenanceTask.interval_type == 'days', or_(*days_conditions)))
+    return or_(*conditions)
+
+
+def current_rank_expression(current_time):
+    """
+    SQL expression of each task's *current* STATE_PRIORITY rank from the
+    persisted columns; 'days' tasks are ranked from next_due_date with the same
+    thresholds as due_state_filter. NULL for tasks never refreshed.
+    """
+    current_time = _to_naive_utc(current_time)
+    due_soon_limit = current_time + timedelta(days=DUE_SOON_ESTIMATED_DAYS_THRESHOLD + 1)
+    days_rank = case(
+        (MaintenanceTask.next_due_date.is_(None), STATE_PRIORITY[DueState.NEVER_PERFORMED]),
+        (MaintenanceTask.next_due_date < current_time, STATE_PRIORITY[DueState.OVERDUE]),
+        (MaintenanceTask.next_due_date < due_soon_limit, STATE_PRIORITY[DueState.DUE_SOON]),
+        else_=STATE_PRIORITY[DueState.OK],
+    )
+    return case((MaintenanceTask.interval_type == 'days', days_rank), else_=MaintenanceTask.status_rank)
+
+
+def equipment_min_ranks(query, equipment_ids, current_time):
+    """
+    Most urgent current rank per equipment over every task matched by `query`,
+    not just the ones on the current page. One grouped query.
+
+    Args:
+        query: MaintenanceTask query with the list's filters applied.
+        equipment_ids (iterable[int]): Equipment shown on the page.
+        current_time (datetime): Reference time (naive UTC).
+
+    Returns:
+        dict: {equipment_id: rank}
+    """
+    equipment_ids = set(equipment_ids)
+    if not equipment_ids:
+        return {}
+    rows = query.with_entities(
+        MaintenanceTask.equipment_id, func.min(current_rank_expression(current_time))
+    ).filter(MaintenanceTask.equipment_id.in_(equipment_ids)).group_by(MaintenanceTask.equipment_id)
+    return {equipment_id: rank for equipment_id, rank in rows if rank is not None}
@@ -0,0 +1,85 @@
+# tkr_system/app/planned_maintenance/usage_daily.py
+"""
+Daily usage rollup (`usage_daily`): one row per equipment and UTC day with
+readings - min/max, count and the last reading. Kept current by daily_rollups.py.
+"""
+from collections import defaultdict
+from app.models import UsageDaily, UsageLog
+from app.planned_maintenance.daily_rollups import register_daily_rollup
+
+
+class _DayAggregate:
+    """Accumulates one (equipment, day) rollup row from readings in log_date order."""
+    __slots__ = ('min_value', 'max_value', 'reading_count', 'last_value', 'last_log_date')
+
+    def __init__(self):
+        self.min_value = None
+        self.max_value = None
+        self.reading_count = 0
+        self.last_value = None
+        self.last_log_date = None
+
+    def add(self, log_date, usage_value):
+        self.min_value = usage_value if self.min_value is None else min(self.min_value, usage_value)
+        self.max_value = usage_value if self.max_value is None else max(self.max_value, usage_value)
+        self.reading_count += 1
+        self.last_value = usage_value
+        self.last_log_date = log_date
+
+    def values(self):
+        return {
+            'min_value': self.min_value, 'max_value': self.max_value, 'reading_count': self.reading_count,
+            'last_value': self.last_value, 'last_log_date': self.last_log_date,
+        }
+
+
+USAGE_DAILY_ROLLUP = register_daily_rollup(UsageLog, UsageLog.log_date, UsageLog.usage_value, UsageDaily, _DayAggregate)
+
+
+def get_usage_days(equipment_ids, first_day, last_day):
+    """
+    Rollup rows of the equipment between first_day and last_day (inclusive),
+    in one indexed range scan.
+
+    Returns:
+        dict: {equipment_id: {day: UsageDaily}}.
+    """
+    if not equipment_ids:
+        return {}
+    rows = UsageDaily.query.filter(
+        UsageDaily.equipment_id.in_(list(equipment_ids)),
+        UsageDaily.day >= first_day,
+        UsageDaily.day <= last_day,
+    ).order_by(UsageDaily.equipment_id, UsageDaily.day)
+    days = defaultdict(dict)
+    for row in rows:
+        days[row.equipment_id][row.day] = row
+    return days
+
+
+def get_usage_history(equipment_id, first_day, last_day):
+    """
+    Daily series of one equipment between first_day and last_day, for the
+    usage history chart: one entry per day with readings, with the increase
+    since the previous day with readings (None for the first one).
+
+    Returns:
+        list[dict]: 'day', 'last_value', 'min_value', 'max_value',
+                    'reading_count', 'increase'; oldest first.
+    """
+    previous = UsageDaily.query.filter(
+        UsageDaily.equipment_id == equipment_id, UsageDaily.day < first_day
+    ).order_by(UsageDaily.day.desc()).first() # Baseline for the first day's increase
+    previous_value = previous.last_value if previous else None
+    series = []
+    for day, usage_day in get_usage_days([equipment_id], first_day, last_day).get(equipment_id, {}).items():
+        series.append({
+            'day': day,
+            'last_value': usage_day.last_value,
+            'min_value': usage_day.min_value,
+            'max_value': usage_day.max_value,
+            'reading_count': usage_day.reading_count,
+            'increase': None if previous_value is None else usage_day.last_value - previous_value,
+        })
+        previous_value = usage_day.last_value
+    return series
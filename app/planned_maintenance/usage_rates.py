@@ -0,0 +1,292 @@
+# tkr_system/app/planned_maintenance/usage_rates.py
+import logging
+import threading
+import time as time_module
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import UsageDaily, UsageLog
+from app.planned_maintenance.loaders import _to_naive_utc
+from app.table_versions import table_exists, is_savepoint_rollback
+
+# Readings considered per equipment: the last reading of each of the most
+# recent N days with readings, limited to this many days before the latest one.
+USAGE_RATE_WINDOW_DAYS = 90
+USAGE_RATE_MAX_SAMPLES = 30
+# Rates at or below this (units/day) are treated as "not running"
+MIN_USAGE_RATE = 0.01
+# Upper bound on how long another worker process can serve a stale rate
+USAGE_RATE_CACHE_TTL_SECONDS = 300
+
+
+class UsageRate:
+    """
+    Usage-rate model of one equipment item.
+
+    Attributes:
+        equipment_id (int): The equipment.
+        current_usage (float): Latest meter reading.
+        current_usage_date (datetime): Naive UTC time of the latest reading.
+        rate (float|None): Robust average usage per day over the window
+            (median of pairwise slopes, Theil-Sen). None with fewer than two
+            days with readings. Can be negative if readings go backwards.
+        samples (int): Days with readings used (one sample per day).
+        window_days (float): Days between the oldest and latest reading used.
+    """
+    __slots__ = ('equipment_id', 'current_usage', 'current_usage_date', 'rate', 'samples', 'window_days')
+
+    def __init__(self, equipment_id, current_usage, current_usage_date, rate=None, samples=1, window_days=0.0):
+        self.equipment_id = equipment_id
+        self.current_usage = current_usage
+        self.current_usage_date = current_usage_date
+        self.rate = rate
+        self.samples = samples
+        self.window_days = window_days
+
+    @property
+    def is_usable(self):
+        """True when the rate can be used to project future readings."""
+        return self.rate is not None and self.rate > MIN_USAGE_RATE
+
+    def to_dict(self):
+        return {
+            'equipment_id': self.equipment_id,
+            'current_usage': self.current_usage,
+            'current_usage_date': self.current_usage_date.isoformat() if self.current_usage_date else None,
+            'rate': self.rate,
+            'samples': self.samples,
+            'window_days': self.window_days,
+        }
+
+    def __repr__(self):
+        return f"<UsageRate eq={self.equipment_id} rate={self.rate} samples={self.samples} window={self.window_days:.1f}d>"
+
+
+def _median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def _theil_sen_rate(points):
+    """
+    Median of the slopes between every pair of (days, value) points.
+
+    A single bad reading only moves the slopes it takes part in, so unlike the
+    slope between the last two readings it cannot swing the result.
+    """
+    slopes = []
+    for i in range(len(points)):
+        x_i, y_i = points[i]
+        for j in range(i + 1, len(points)):
+            x_j, y_j = points[j]
+            if x_j != x_i:
+                slopes.append((y_j - y_i) / (x_j - x_i))
+    return _median(slopes) if slopes else None
+
+
+def _build_rate(equipment_id, readings):
+    """readings: [(log_date, usage_value)] newest first, one per distinct date."""
+    latest_date, latest_value = readings[0]
+    window_start = latest_date - timedelta(days=USAGE_RATE_WINDOW_DAYS)
+    window = [(d, v) for d, v in readings if d >= window_start]
+    if len(window) < 2:
+        return UsageRate(equipment_id, latest_value, latest_date)
+
+    points = [((d - latest_date).total_seconds() / (24 * 3600), v) for d, v in window]
+    return UsageRate(equipment_id, latest_value, latest_date,
+                     rate=_theil_sen_rate(points), samples=len(window),
+                     window_days=-points[-1][0])
+
+
+def _daily_readings(equipment_ids):
+    """
+    [(equipment_id, last_log_date, last_value)] of the most recent
+    USAGE_RATE_MAX_SAMPLES days with readings per equipment, from the
+    usage_daily rollup (ROW_NUMBER() over each equipment's days).
+    """
+    day_rank = func.row_number().over(
+        partition_by=UsageDaily.equipment_id,
+        order_by=UsageDaily.day.desc()
+    ).label('day_rank')
+    ranked = db.session.query(
+        UsageDaily.equipment_id, UsageDaily.last_log_date, UsageDaily.last_value, day_rank
+    ).filter(
+        UsageDaily.equipment_id.in_(list(equipment_ids))
+    ).subquery()
+
+    return db.session.query(
+        ranked.c.equipment_id, ranked.c.last_log_date, ranked.c.last_value
+    ).filter(
+        ranked.c.day_rank <= USAGE_RATE_MAX_SAMPLES
+    ).order_by(ranked.c.equipment_id, ranked.c.last_log_date.desc()).all()
+
+
+def _raw_readings(equipment_ids):
+    """
+    Same as _daily_readings() but straight from usage_log (most recent
+    USAGE_RATE_MAX_SAMPLES distinct log dates), for databases without the
+    usage_daily table yet.
+    """
+    date_rank = func.dense_rank().over(
+        partition_by=UsageLog.equipment_id,
+        order_by=UsageLog.log_date.desc()
+    ).label('date_rank')
+    ranked = db.session.query(
+        UsageLog.equipment_id, UsageLog.log_date, UsageLog.usage_value, UsageLog.id, date_rank
+    ).filter(
+        UsageLog.equipment_id.in_(list(equipment_ids))
+    ).subquery()
+
+    return db.session.query(
+        ranked.c.equipment_id, ranked.c.log_date, ranked.c.usage_value
+    ).filter(
+        ranked.c.date_rank <= USAGE_RATE_MAX_SAMPLES
+    ).order_by(ranked.c.equipment_id, ranked.c.log_date.desc(), ranked.c.id.desc()).all()
+
+
+def compute_usage_rates(equipment_ids):
+    """
+    Builds the usage-rate model for each equipment id from the database,
+    in one query over the daily rollup: one sample per day with readings
+    (that day's last reading). Bypasses the cache.
+
+    Returns:
+        dict: {equipment_id: UsageRate}; equipment without usage logs is omitted.
+    """
+    if not equipment_ids:
+        return {}
+
+    equipment_ids = set(equipment_ids)
+    if table_exists(db.session.connection(), UsageDaily.__tablename__):
+        rows = _daily_readings(equipment_ids)
+    else:
+        rows = _raw_readings(equipment_ids)
+
+    return usage_rates_from_readings(rows)
+
+
+def usage_rates_from_readings(rows):
+    """
+    Builds the usage-rate model from raw readings.
+
+    Args:
+        rows: (equipment_id, log_date, usage_value) ordered by equipment, then
+            newest log_date first (the last one written first on ties).
+
+    Returns:
+        dict: {equipment_id: UsageRate}
+    """
+    readings = defaultdict(list)
+    for equipment_id, log_date, usage_value in rows:
+        log_date = _to_naive_utc(log_date)
+        eq_readings = readings[equipment_id]
+        # Several logs at the same timestamp: keep the last one written
+        if eq_readings and eq_readings[-1][0] == log_date:
+            continue
+        if len(eq_readings) < USAGE_RATE_MAX_SAMPLES:
+            eq_readings.append((log_date, usage_value))
+
+    return {eq_id: _build_rate(eq_id, eq_readings) for eq_id, eq_readings in readings.items()}
+
+
+# ==============================================================================
+# === Cache ===
+# ==============================================================================
+# Process-local. Entries are dropped when usage logs of that equipment are
+# flushed/committed in this process, and expire after the TTL so other
+# worker processes pick up changes too.
+
+_cache = {} # {equipment_id: (UsageRate or None, stored_at)}
+_cache_lock = threading.Lock()
+_cache_generation = 0 # Bumped on every invalidation; results computed across one are not stored
+
+
+def get_usage_rates(equipment_ids):
+    """
+    Returns {equipment_id: UsageRate} for the given ids, computing only the
+    ones not already cached (one query for all of them).
+    Equipment without usage logs is omitted.
+    """
+    equipment_ids = set(equipment_ids or ())
+    if not equipment_ids:
+        return {}
+
+    now = time_module.monotonic()
+    rates, missing = {}, set()
+    with _cache_lock:
+        generation = _cache_generation
+        for eq_id in equipment_ids:
+            cached = _cache.get(eq_id)
+            if cached is None or now - cached[1] > USAGE_RATE_CACHE_TTL_SECONDS:
+                missing.add(eq_id)
+            elif cached[0] is not None:
+                rates[eq_id] = cached[0]
+
+    if missing:
+        computed = compute_usage_rates(missing)
+        with _cache_lock:
+            if generation == _cache_generation:
+                for eq_id in missing:
+                    _cache[eq_id] = (computed.get(eq_id), now)
+        rates.update(computed)
+        logging.debug(f"Usage rates: {len(equipment_ids) - len(missing)} cached, {len(missing)} computed.")
+    return rates
+
+
+def get_usage_rate(equipment_id):
+    """Returns the UsageRate of one equipment item, or None if it has no usage logs."""
+    return get_usage_rates([equipment_id]).get(equipment_id)
+
+
+def invalidate_usage_rates(equipment_ids=None):
+    """Drops cached rates for the given equipment ids, or the whole cache if None."""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        if equipment_ids is None:
+            _cache.clear()
+        else:
+            for eq_id in equipment_ids:
+                _cache.pop(eq_id, None)
+
+
+def _usage_log_equipment_ids(session):
+    """Equipment ids touched by UsageLog rows pending in this flush (old and new owner)."""
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, UsageLog):
+            history = inspect(obj).attrs.equipment_id.history
+            ids.update(v for v in history.sum() if v is not None)
+    return ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_usage_log_changes(session, flush_context, instances):
+    ids = _usage_log_equipment_ids(session)
+    if ids:
+        session.info.setdefault('usage_rate_invalidations', set()).update(ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_after_flush(session, flush_context):
+    # Same-transaction readers (e.g. refresh_task_due_columns after add_usage) see the new rows
+    ids = session.info.get('usage_rate_invalidations')
+    if ids:
+        invalidate_usage_rates(ids)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_after_transaction(session):
+    # Again at the end: another request may have cached uncommitted or rolled-back readings
+    if is_savepoint_rollback(session):
+        ids = session.info.get('usage_rate_invalidations') # Kept for the end of the outer transaction
+    else:
+        ids = session.info.pop('usage_rate_invalidations', None)
+    if ids:
+        invalidate_usage_rates(ids)
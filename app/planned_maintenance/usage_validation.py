@@ -0,0 +1,252 @@
+# tkr_system/app/planned_maintenance/usage_validation.py
+"""
+Validation of usage (hour-meter / km) readings against the readings already
+logged for the same equipment: no duplicate timestamps, values never go
+backwards, no implausible jumps. insert_usage_logs() reports readings that
+collide with a concurrent insert as duplicates.
+"""
+import bisect
+import logging
+from collections import defaultdict
+from sqlalchemy import func, literal, or_, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import UsageLog
+from app.planned_maintenance.loaders import _to_naive_utc
+
+MAX_REASONABLE_DAILY_USAGE_INCREASE = 500
+
+
+class UsageReading:
+    """One reading to validate. `error` is set when it is rejected."""
+    __slots__ = ('index', 'equipment_id', 'usage_value', 'log_date', 'error')
+
+    def __init__(self, index, equipment_id, usage_value, log_date):
+        self.index = index
+        self.equipment_id = equipment_id
+        self.usage_value = usage_value
+        self.log_date = _to_naive_utc(log_date) # Compared with stored naive UTC values
+        self.error = None
+
+    @property
+    def accepted(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'equipment_id': self.equipment_id,
+            'usage_value': self.usage_value,
+            'log_date': self.log_date.isoformat() if self.log_date else None,
+            'status': 'accepted' if self.error is None else 'rejected',
+            'error': self.error,
+        }
+
+
+def duplicate_usage_error(log_date):
+    return f"A usage log already exists at {log_date.strftime('%Y-%m-%d %H:%M:%S')} UTC."
+
+
+def check_usage_step(usage_value, log_date, previous, following):
+    """
+    Applies the chronological rules to one reading.
+
+    Args:
+        usage_value (float): The new reading.
+        log_date (datetime): Its timestamp (naive UTC).
+        previous, following: (log_date, usage_value) of the nearest logged
+            readings before/after it, or None.
+
+    Returns:
+        str or None: Why the reading is rejected, or None if it is valid.
+    """
+    if previous and usage_value < previous[1]:
+        return (f"Usage value ({usage_value:.2f}) cannot be less than the previous log's value "
+                f"({previous[1]:.2f} recorded on {previous[0].strftime('%Y-%m-%d %H:%M UTC')}).")
+    if following and usage_value > following[1]:
+        return (f"Usage value ({usage_value:.2f}) cannot be greater than the next log's value "
+                f"({following[1]:.2f} recorded on {following[0].strftime('%Y-%m-%d %H:%M UTC')}).")
+    if previous:
+        usage_difference = usage_value - previous[1]
+        calendar_days_spanned = (log_date.date() - previous[0].date()).days
+        if calendar_days_spanned == 0 and usage_difference > MAX_REASONABLE_DAILY_USAGE_INCREASE:
+            return (f"Usage increase of {usage_difference:.2f} on the same day ({log_date.strftime('%Y-%m-%d')}) "
+                    f"is too high. Max allowed daily increase is {MAX_REASONABLE_DAILY_USAGE_INCREASE:.2f}.")
+        if calendar_days_spanned > 0:
+            max_allowed_increase = MAX_REASONABLE_DAILY_USAGE_INCREASE * calendar_days_spanned
+            if usage_difference > max_allowed_increase:
+                return (f"Usage increase of {usage_difference:.2f} over {calendar_days_spanned} day(s) "
+                        f"is too high. Max allowed for this period is {max_allowed_increase:.2f}.")
+    return None
+
+
+def find_usage_neighbours(equipment_id, log_date, exclude_id=None):
+    """
+    The logged readings around `log_date` for one equipment, in one round
+    trip: a UNION of two LIMIT 1 index seeks.
+
+    Args:
+        exclude_id (int): A log to ignore (the one being edited).
+
+    Returns:
+        tuple: (previous, following) as (log_date, usage_value) or None.
+            `previous` is at or before log_date, so it equals log_date when
+            the slot is taken; `following` is strictly after it.
+    """
+    log_date = _to_naive_utc(log_date)
+    conditions = [UsageLog.equipment_id == equipment_id]
+    if exclude_id is not None:
+        conditions.append(UsageLog.id != exclude_id)
+    previous = select(literal(0).label('side'), UsageLog.log_date, UsageLog.usage_value).where(
+        *conditions, UsageLog.log_date <= log_date
+    ).order_by(UsageLog.log_date.desc()).limit(1).subquery()
+    following = select(literal(1).label('side'), UsageLog.log_date, UsageLog.usage_value).where(
+        *conditions, UsageLog.log_date > log_date
+    ).order_by(UsageLog.log_date.asc()).limit(1).subquery()
+    neighbours = [None, None]
+    for side, neighbour_date, usage_value in db.session.execute(
+        union_all(select(*previous.c), select(*following.c))
+    ):
+        neighbours[side] = (_to_naive_utc(neighbour_date), usage_value)
+    return neighbours[0], neighbours[1]
+
+
+def validate_usage_reading(reading, exclude_id=None):
+    """
+    Validates one UsageReading against the logged readings (sets and
+    returns `.error`, None if valid). Pass `exclude_id` when re-validating
+    an existing log's new value.
+    """
+    if reading.error is None:
+        previous, following = find_usage_neighbours(reading.equipment_id, reading.log_date, exclude_id=exclude_id)
+        if previous and previous[0] == reading.log_date:
+            reading.error = duplicate_usage_error(reading.log_date)
+        else:
+            reading.error = check_usage_step(reading.usage_value, reading.log_date, previous, following)
+    return reading.error
+
+
+def load_usage_neighbours(bounds):
+    """
+    Loads, in one query, the logged readings that can neighbour a batch:
+    for each equipment, every reading within [first, last] batch timestamp
+    plus the nearest reading before and after that range.
+
+    Args:
+        bounds (dict): {equipment_id: (first_log_date, last_log_date)}, naive UTC.
+
+    Returns:
+        dict: {equipment_id: [(log_date, usage_value), ...]} sorted by log_date.
+    """
+    if not bounds:
+        return {}
+    bounds_cte = union_all(*[
+        select(literal(eq_id).label('equipment_id'), literal(lo, UsageLog.log_date.type).label('lo'),
+               literal(hi, UsageLog.log_date.type).label('hi'))
+        for eq_id, (lo, hi) in bounds.items()
+    ]).cte('bounds')
+
+    before = aliased(UsageLog)
+    after = aliased(UsageLog)
+    nearest_before = select(func.max(before.log_date)).where(
+        before.equipment_id == bounds_cte.c.equipment_id, before.log_date < bounds_cte.c.lo
+    ).scalar_subquery()
+    nearest_after = select(func.min(after.log_date)).where(
+        after.equipment_id == bounds_cte.c.equipment_id, after.log_date > bounds_cte.c.hi
+    ).scalar_subquery()
+
+    rows = db.session.execute(
+        select(UsageLog.equipment_id, UsageLog.log_date, UsageLog.usage_value)
+        .join(bounds_cte, UsageLog.equipment_id == bounds_cte.c.equipment_id)
+        .where(or_(
+            UsageLog.log_date.between(bounds_cte.c.lo, bounds_cte.c.hi),
+            UsageLog.log_date == nearest_before,
+            UsageLog.log_date == nearest_after,
+        ))
+    ).all()
+
+    neighbours = defaultdict(list)
+    for eq_id, log_date, usage_value in rows:
+        neighbours[eq_id].append((_to_naive_utc(log_date), usage_value))
+    for timeline in neighbours.values():
+        timeline.sort()
+    logging.debug(f"Loaded {len(rows)} neighbouring usage log(s) for {len(bounds)} equipment item(s).")
+    return neighbours
+
+
+def validate_usage_readings(readings):
+    """
+    Validates a batch of UsageReading objects in place (sets `.error`).
+
+    Readings are checked per equipment in timestamp order (input order for
+    ties) against the logged readings and the ones already accepted from
+    the batch, so a batch behaves like the same readings logged one by one.
+    Readings that already have an error are skipped.
+
+    Returns:
+        list[UsageReading]: The accepted readings.
+    """
+    pending = [r for r in readings if r.error is None]
+    by_equipment = defaultdict(list)
+    for reading in pending:
+        by_equipment[reading.equipment_id].append(reading)
+
+    bounds = {}
+    for eq_id, eq_readings in by_equipment.items():
+        eq_readings.sort(key=lambda r: (r.log_date, r.index))
+        bounds[eq_id] = (eq_readings[0].log_date, eq_readings[-1].log_date)
+    neighbours = load_usage_neighbours(bounds)
+
+    accepted = []
+    for eq_id, eq_readings in by_equipment.items():
+        timeline = neighbours.get(eq_id, [])
+        dates = [log_date for log_date, _ in timeline]
+        for reading in eq_readings:
+            position = bisect.bisect_left(dates, reading.log_date)
+            if position < len(dates) and dates[position] == reading.log_date:
+                reading.error = duplicate_usage_error(reading.log_date)
+                continue
+            previous = timeline[position - 1] if position > 0 else None
+            following = timeline[position] if position < len(timeline) else None
+            reading.error = check_usage_step(reading.usage_value, reading.log_date, previous, following)
+            if reading.error is None:
+                timeline.insert(position, (reading.log_date, reading.usage_value))
+                dates.insert(position, reading.log_date)
+                accepted.append(reading)
+    return accepted
+
+
+def _new_logs(readings):
+    return [UsageLog(equipment_id=r.equipment_id, usage_value=r.usage_value, log_date=r.log_date) for r in readings]
+
+
+def insert_usage_logs(readings):
+    """
+    Adds a UsageLog for each (validated) reading and flushes them in one
+    savepoint. If a reading's slot was taken since validation, the batch is
+    retried one savepoint per reading, so only the readings that conflicted
+    get an error and the rest are still logged.
+
+    Returns:
+        list[UsageLog]: The new logs, one per reading still accepted.
+    """
+    logs = _new_logs(readings)
+    if not logs:
+        return logs
+    try:
+        with db.session.begin_nested():
+            db.session.add_all(logs) # One flush; SQLAlchemy batches the INSERTs
+        return logs
+    except IntegrityError as e:
+        logging.warning(f"Usage log batch conflicted with a concurrent write, retrying per reading: {e.orig}")
+
+    logs = []
+    for reading, log in zip(readings, _new_logs(readings)): # The rolled-back logs were expunged
+        try:
+            with db.session.begin_nested():
+                db.session.add(log)
+            logs.append(log)
+        except IntegrityError:
+            reading.error = "Not logged: a concurrent request logged usage at the same time. Please submit again."
+    return logs
@@ -0,0 +1,144 @@
+# tkr_system/app/table_versions.py
+"""
+Per-table version counters, bumped once per committed transaction for each
+table it wrote through the ORM. Read by the API ETags (app/api/etags.py).
+"""
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+from app.models import TableVersion
+
+VERSIONS_TABLE = TableVersion.__table__
+_SESSION_KEY = 'changed_tables'
+
+_table_present = {} # {(engine url, table name): bool} - tables are missing until their migration ran
+_table_present_lock = threading.Lock()
+
+
+def table_exists(connection, table_name):
+    """Whether `table_name` exists; checked once per process and database, then cached."""
+    key = (str(connection.engine.url), table_name)
+    with _table_present_lock:
+        present = _table_present.get(key)
+    if present is None:
+        present = inspect(connection).has_table(table_name)
+        if not present:
+            logging.warning(f"Table '{table_name}' does not exist; run 'flask db upgrade' and restart.")
+        with _table_present_lock:
+            _table_present[key] = present
+    return present
+
+
+def _versions_table_exists(connection):
+    return table_exists(connection, VERSIONS_TABLE.name) # API ETags are disabled without it
+
+
+def bump_table_versions(connection, table_names):
+    """Increments the counters of `table_names` (creating missing rows) on `connection`."""
+    if not _versions_table_exists(connection):
+        return
+    now = datetime.utcnow()
+    dialect = connection.dialect.name
+    for name in sorted(set(table_names)):
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            connection.execute(
+                upsert(VERSIONS_TABLE).values(table_name=name, version=1, updated_at=now)
+                .on_conflict_do_update(
+                    index_elements=[VERSIONS_TABLE.c.table_name],
+                    set_={'version': VERSIONS_TABLE.c.version + 1, 'updated_at': now},
+                )
+            )
+        else:
+            result = connection.execute(
+                update(VERSIONS_TABLE).where(VERSIONS_TABLE.c.table_name == name)
+                .values(version=VERSIONS_TABLE.c.version + 1, updated_at=now)
+            )
+            if not result.rowcount:
+                connection.execute(insert(VERSIONS_TABLE).values(table_name=name, version=1, updated_at=now))
+
+
+def get_table_versions(table_names, session=None):
+    """
+    Returns {table_name: (version, updated_at)} in one query, or None if the
+    table_version table does not exist. Tables never written through the ORM
+    since the migration have (0, None).
+    """
+    session = session or _default_session()
+    if not _versions_table_exists(session.connection()):
+        return None
+    table_names = sorted(set(table_names))
+    versions = {name: (0, None) for name in table_names}
+    rows = session.execute(
+        select(VERSIONS_TABLE.c.table_name, VERSIONS_TABLE.c.version, VERSIONS_TABLE.c.updated_at)
+        .where(VERSIONS_TABLE.c.table_name.in_(table_names))
+    )
+    for name, version, updated_at in rows:
+        versions[name] = (version, updated_at)
+    return versions
+
+
+def _default_session():
+    from app import db
+    return db.session
+
+
+# --- Session events ---
+
+def _record(session, table_names):
+    table_names = {name for name in table_names if name != VERSIONS_TABLE.name}
+    if table_names:
+        session.info.setdefault(_SESSION_KEY, set()).update(table_names)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    tables = set()
+    for obj in session.new:
+        tables.update(table.name for table in inspect(obj).mapper.tables)
+    for obj in session.deleted:
+        tables.update(table.name for table in inspect(obj).mapper.tables)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.update(table.name for table in inspect(obj).mapper.tables)
+    _record(session, tables)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_dml_tables(orm_execute_state):
+    # Query.update()/delete() and session.execute(insert(Model), rows) skip the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _record(orm_execute_state.session, [table.name])
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_before_commit(session):
+    session.flush() # Commit would flush after this hook; collect those tables too
+    tables = session.info.pop(_SESSION_KEY, None)
+    if tables:
+        bump_table_versions(session.connection(), tables)
+        logging.debug(f"Bumped table versions: {', '.join(sorted(tables))}")
+
+
+def is_savepoint_rollback(session):
+    """
+    True inside an after_rollback hook fired by a savepoint (begin_nested)
+    rolling back. The outer transaction goes on, so what was recorded for its
+    earlier flushes must be kept; a flush that failed inside the savepoint
+    never reached the after_flush hooks.
+    """
+    return session.get_nested_transaction() is not None
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    if not is_savepoint_rollback(session):
+        session.info.pop(_SESSION_KEY, None)
@@ -14,6 +14,29 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Background jobs (plan generation, PDF rendering) - see app/jobs.py.
+    # By default jobs run inside the submitting request. Set JOBS_ENABLED=1 only when a
+    # worker runs alongside the web server (python manage.py run-worker), or jobs stay queued.
+    JOBS_ENABLED = os.environ.get('JOBS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', 2))
+    JOB_TIMEOUT_SECONDS = int(os.environ.get('JOB_TIMEOUT_SECONDS', 30 * 60))
+    JOB_RESULT_RETENTION_DAYS = int(os.environ.get('JOB_RESULT_RETENTION_DAYS', 7))
+
+    # Rendered plan PDFs are cached under <instance>/pdf_cache; least recently used are evicted beyond this size
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    # PDFs render in child processes (see planned_maintenance/pdf_render.py); 0 renders in-process
+    PDF_RENDER_PROCESSES = int(os.environ.get('PDF_RENDER_PROCESSES', 2))
+    PDF_RENDER_TIMEOUT_SECONDS = int(os.environ.get('PDF_RENDER_TIMEOUT_SECONDS', 300))
+    PDF_RENDER_MEMORY_LIMIT_MB = int(os.environ.get('PDF_RENDER_MEMORY_LIMIT_MB', 1024))
+    PDF_RENDER_CHUNK_ROWS = int(os.environ.get('PDF_RENDER_CHUNK_ROWS', 40)) # Equipment rows per chunk
+
+    # API list endpoints (see app/api/pagination.py): page size for ?limit=, rows per fetch when streaming
+    API_PAGE_DEFAULT_LIMIT = int(os.environ.get('API_PAGE_DEFAULT_LIMIT', 100))
+    API_PAGE_MAX_LIMIT = int(os.environ.get('API_PAGE_MAX_LIMIT', 1000))
+    API_STREAM_BATCH_SIZE = int(os.environ.get('API_STREAM_BATCH_SIZE', 500))
+    # Largest batch accepted by the bulk POST endpoints (e.g. /api/usage_logs/batch)
+    API_BATCH_MAX_ITEMS = int(os.environ.get('API_BATCH_MAX_ITEMS', 5000))
+
     # Optional: If you want to see the SQL queries SQLAlchemy executes (good for debugging)
     # SQLALCHEMY_ECHO = True
 
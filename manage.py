@@ -7,7 +7,7 @@ from flask.cli import FlaskGroup
 from app import create_app, db
 from app.models import User # Import User model
 
-def create_flask_app(info):
+def create_flask_app(info=None): # Flask >= 2.2 calls this without arguments
     return create_app()
 
 @click.group(cls=FlaskGroup, create_app=create_flask_app)
@@ -33,6 +33,96 @@ def create_admin_user(username, email, password):
         db.session.rollback()
         click.echo(click.style(f"Error creating admin user: {e}", fg='red'))
 
+@cli.command("rebuild-task-due-status")
+@click.option('--batch-size', default=500, show_default=True, help='Tasks processed per commit.')
+def rebuild_task_due_status(batch_size):
+    """Recomputes next_due_date, next_due_usage and status_rank for every maintenance task."""
+    from app.planned_maintenance.task_status import rebuild_all_task_due_columns
+    try:
+        count = rebuild_all_task_due_columns(batch_size=batch_size)
+        click.echo(click.style(f"Rebuilt due status for {count} task(s).", fg='green'))
+    except Exception as e:
+        db.session.rollback()
+        click.echo(click.style(f"Error rebuilding task due status: {e}", fg='red'))
+
+@cli.command("link-job-card-tasks")
+@click.option('--batch-size', default=500, show_default=True, help='Job cards processed per commit.')
+def link_job_card_tasks(batch_size):
+    """Links job cards without a task_id to the task with their equipment and description."""
+    from app.planned_maintenance.job_card_tasks import link_job_cards_to_tasks
+    try:
+        result = link_job_cards_to_tasks(batch_size=batch_size)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(click.style(f"Error linking job cards to tasks: {e}", fg='red'))
+        return
+    click.echo(click.style(
+        f"Linked {result['linked']} of {result['scanned']} unlinked job card(s); {result['ambiguous']} ambiguous, "
+        f"{result['unmatched']} without a matching task ({result['seconds']:.2f}s).", fg='green'))
+
+@cli.command("rebuild-usage-daily")
+@click.option('--batch-size', default=1000, show_default=True, help='Rollup rows inserted per statement.')
+def rebuild_usage_daily_command(batch_size):
+    """Rebuilds the usage_daily rollup from usage_log (after bulk imports or raw SQL edits)."""
+    from app.planned_maintenance.usage_daily import USAGE_DAILY_ROLLUP
+    try:
+        written = USAGE_DAILY_ROLLUP.rebuild(batch_size=batch_size)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(click.style(f"Error rebuilding usage_daily: {e}", fg='red'))
+        return
+    click.echo(click.style(f"Rebuilt usage_daily: {written} row(s).", fg='green'))
+
+@cli.command("rebuild-checklist-daily")
+@click.option('--batch-size', default=1000, show_default=True, help='Rollup rows inserted per statement.')
+def rebuild_checklist_daily_command(batch_size):
+    """Rebuilds the checklist_daily rollup from checklist (after bulk imports or raw SQL edits)."""
+    from app.planned_maintenance.checklist_daily import CHECKLIST_DAILY_ROLLUP
+    try:
+        written = CHECKLIST_DAILY_ROLLUP.rebuild(batch_size=batch_size)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(click.style(f"Error rebuilding checklist_daily: {e}", fg='red'))
+        return
+    click.echo(click.style(f"Rebuilt checklist_daily: {written} row(s).", fg='green'))
+
+@cli.command("generate-plan")
+@click.option('--year', type=int, help='First year of the plan (default: current year).')
+@click.option('--month', type=int, help='First month of the plan (default: current month).')
+@click.option('--months', default=12, show_default=True, help='Number of consecutive months to generate.')
+@click.option('--full', is_flag=True, help='Re-predict every task, not only tasks changed since the last generation.')
+def generate_plan(year, month, months, full):
+    """Generates or updates maintenance plan entries for a multi-month horizon."""
+    from datetime import date
+    from app.planned_maintenance.plan_generation import generate_plan_horizon
+    today = date.today()
+    try:
+        result = generate_plan_horizon(year or today.year, month or today.month, months, full=full)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(click.style(f"Error generating maintenance plan: {e}", fg='red'))
+        return
+    for (plan_year, plan_month), count in result['entries_per_month'].items():
+        click.echo(f"  {plan_year}-{plan_month:02d}: {count} entries")
+    click.echo(click.style(
+        f"Plan has {result['entries']} entries over {len(result['months'])} month(s): {result['inserted']} added, "
+        f"{result['updated']} updated, {result['deleted']} removed; {result['tasks_skipped']} of {result['tasks']} "
+        f"tasks unchanged ({result['seconds']:.2f}s).", fg='green'))
+
+@cli.command("run-worker")
+@click.option('--once', is_flag=True, help='Process all queued jobs, then exit instead of polling.')
+@click.option('--poll-interval', type=float, help='Seconds between polls when idle (default: JOB_POLL_INTERVAL_SECONDS).')
+def run_worker_command(once, poll_interval):
+    """Runs queued background jobs (plan generation, PDF rendering)."""
+    from app.jobs import run_worker
+    click.echo(click.style("Background worker started. Press Ctrl+C to stop.", fg='green'))
+    try:
+        processed = run_worker(poll_interval=poll_interval, once=once)
+    except KeyboardInterrupt:
+        click.echo("Worker stopped.")
+        return
+    click.echo(click.style(f"Processed {processed} job(s).", fg='green'))
+
 # You might have other commands here, e.g., for db migrations if you use Flask-Migrate
 # Example for Flask-Migrate (if you set it up):
 # from flask_migrate import Migrate
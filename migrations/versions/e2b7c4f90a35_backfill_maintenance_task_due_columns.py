@@ -0,0 +1,76 @@
+"""Backfill next_due_date, next_due_usage and status_rank of MaintenanceTask
+
+Revision ID: e2b7c4f90a35
+Revises: c7d4a1e8f3b6
+Create Date: 2026-10-18 14:21:09.502817
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+from app.planned_maintenance.task_status import USAGE_INTERVAL_TYPES, calculate_task_statuses
+from app.planned_maintenance.usage_rates import usage_rates_from_readings
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c4f90a35'
+down_revision = 'c7d4a1e8f3b6'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade():
+    # Tasks added before 9c4e1a7d2b10 and not saved since still have NULL due
+    # columns, which keeps them out of every status filter
+    maintenance_task = sa.table('maintenance_task',
+        sa.column('id', sa.Integer), sa.column('equipment_id', sa.Integer),
+        sa.column('description', sa.String), sa.column('interval_type', sa.String),
+        sa.column('interval_value', sa.Integer), sa.column('last_performed', sa.DateTime),
+        sa.column('last_performed_usage_value', sa.Float),
+        sa.column('next_due_date', sa.DateTime), sa.column('next_due_usage', sa.Float),
+        sa.column('status_rank', sa.Integer))
+    usage_log = sa.table('usage_log',
+        sa.column('id', sa.Integer), sa.column('equipment_id', sa.Integer),
+        sa.column('log_date', sa.DateTime), sa.column('usage_value', sa.Float))
+    bind = op.get_bind()
+
+    tasks = bind.execute(
+        sa.select(maintenance_task.c.id, maintenance_task.c.equipment_id, maintenance_task.c.description,
+                  maintenance_task.c.interval_type, maintenance_task.c.interval_value,
+                  maintenance_task.c.last_performed, maintenance_task.c.last_performed_usage_value)
+        .where(maintenance_task.c.status_rank.is_(None))
+        .order_by(maintenance_task.c.id)
+    ).all()
+    if not tasks:
+        return
+
+    usage_equipment_ids = {t.equipment_id for t in tasks if t.interval_type in USAGE_INTERVAL_TYPES}
+    usage_rates = {}
+    if usage_equipment_ids:
+        usage_rates = usage_rates_from_readings(bind.execute(
+            sa.select(usage_log.c.equipment_id, usage_log.c.log_date, usage_log.c.usage_value)
+            .where(usage_log.c.equipment_id.in_(usage_equipment_ids))
+            .order_by(usage_log.c.equipment_id, usage_log.c.log_date.desc(), usage_log.c.id.desc())
+        ))
+
+    statuses = calculate_task_statuses(tasks, datetime.utcnow(), usage_rates=usage_rates)
+    update = (
+        sa.update(maintenance_task)
+        .where(maintenance_task.c.id == sa.bindparam('task_id'))
+        .values(next_due_date=sa.bindparam('due_date'), next_due_usage=sa.bindparam('due_usage'),
+                status_rank=sa.bindparam('rank'))
+    )
+    pending = [
+        {'task_id': task_id, 'due_date': status.due_date, 'due_usage': status.next_due_usage, 'rank': status.priority}
+        for task_id, status in statuses.items()
+    ]
+    for start in range(0, len(pending), BACKFILL_BATCH_SIZE):
+        bind.execute(update, pending[start:start + BACKFILL_BATCH_SIZE])
+
+
+def downgrade():
+    # Data only; the columns are dropped by 9c4e1a7d2b10
+    pass